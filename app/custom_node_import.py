@@ -0,0 +1,231 @@
+from __future__ import annotations
+
+import ast
+import compileall
+import importlib
+import importlib.util
+import json
+import logging
+import os
+import re
+import sys
+import sysconfig
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import folder_paths
+
+def get_module_level_import_statements(source: str) -> list[ast.Import | ast.ImportFrom]:
+    """Imports done when the module is imported: top level ones and the ones in top level if/try blocks."""
+    imports = []
+    statements = list(ast.parse(source).body)
+    while len(statements) > 0:
+        statement = statements.pop()
+        if isinstance(statement, (ast.Import, ast.ImportFrom)):
+            imports.append(statement)
+        elif isinstance(statement, (ast.If, ast.Try)):
+            statements.extend(statement.body)
+            statements.extend(statement.orelse)
+            if isinstance(statement, ast.Try):
+                statements.extend(statement.finalbody)
+                for handler in statement.handlers:
+                    statements.extend(handler.body)
+    return imports
+
+
+def get_module_level_imports(source: str) -> set[str]:
+    """Absolute imports done when the module is imported."""
+    imports = set()
+    for statement in get_module_level_import_statements(source):
+        if isinstance(statement, ast.Import):
+            imports.update(alias.name for alias in statement.names)
+        elif statement.level == 0 and statement.module is not None:
+            imports.add(statement.module)
+    return imports
+
+
+def get_local_module_names(directory: str) -> set[str]:
+    """Top level names that resolve to a module or package in directory once it is on sys.path."""
+    names = set()
+    try:
+        entries = os.listdir(directory)
+    except OSError:
+        return names
+    for name in entries:
+        if name.endswith(".py"):
+            names.add(name[:-3])
+        elif not name.startswith((".", "__")) and os.path.isdir(os.path.join(directory, name)):
+            names.add(name)
+    return names
+
+
+def find_local_module(directory: str, parts: list[str]) -> str | None:
+    path = os.path.join(directory, *parts)
+    if os.path.isfile(path + ".py"):
+        return path + ".py"
+    init = os.path.join(path, "__init__.py")
+    if os.path.isfile(init):
+        return init
+    return None
+
+
+def scan_package(module_path: str) -> tuple[set[str], set[str]]:
+    """
+    Writes the bytecode of a custom node package and returns the modules imported at module level by the files that
+    get imported with the package (followed from its __init__.py), and the top level names local to the package. The
+    package directory is on sys.path when the package is imported, "import utils" can mean its own utils.py.
+    """
+    if os.path.isdir(module_path):
+        root = module_path
+        entry = os.path.join(module_path, "__init__.py")
+    else:
+        root = os.path.dirname(module_path)
+        entry = module_path
+    local_names = get_local_module_names(root)
+
+    imports = set()
+    scanned = set()
+    to_scan = [entry]
+    while len(to_scan) > 0:
+        path = to_scan.pop()
+        if path in scanned:
+            continue
+        scanned.add(path)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                statements = get_module_level_import_statements(f.read())
+        except Exception:
+            continue
+
+        local_modules = []
+        for statement in statements:
+            if isinstance(statement, ast.Import):
+                for alias in statement.names:
+                    parts = alias.name.split(".")
+                    if parts[0] in local_names:
+                        local_modules.append((root, parts))
+                    else:
+                        imports.add(alias.name)
+                continue
+            parts = statement.module.split(".") if statement.module else []
+            if statement.level > 0:
+                base = os.path.dirname(path)
+                for _ in range(statement.level - 1):
+                    base = os.path.dirname(base)
+            elif parts[0] in local_names:
+                base = root
+            else:
+                imports.add(statement.module)
+                continue
+            local_modules.append((base, parts))
+            # from . import nodes imports a submodule
+            local_modules.extend((base, parts + [alias.name]) for alias in statement.names if alias.name != "*")
+
+        for base, parts in local_modules:
+            local_path = find_local_module(base, parts)
+            if local_path is not None:
+                to_scan.append(local_path)
+
+    if os.path.isdir(module_path):
+        compileall.compile_dir(module_path, quiet=2, rx=re.compile(r"[/\\](\.|__pycache__|node_modules)"))
+    else:
+        compileall.compile_file(module_path, quiet=2)
+    return imports, local_names
+
+
+def is_in_dir(path: str, directory: str) -> bool:
+    return path == directory or path.startswith(directory + os.sep)
+
+
+def is_stdlib(module_name: str, spec) -> bool:
+    if hasattr(sys, "stdlib_module_names"):
+        return module_name in sys.stdlib_module_names
+    # python < 3.10, tell by the location of the module
+    if spec.origin is None or spec.origin in ("built-in", "frozen"):
+        return True
+    paths = sysconfig.get_paths()
+    origin = os.path.abspath(spec.origin)
+    if any(is_in_dir(origin, os.path.abspath(paths[name])) for name in ("purelib", "platlib")):
+        return False
+    return any(is_in_dir(origin, os.path.abspath(paths[name])) for name in ("stdlib", "platstdlib"))
+
+
+def is_third_party(module_name: str, local_dirs: list[str]) -> bool:
+    top_level = module_name.split(".")[0]
+    if top_level in sys.builtin_module_names:
+        return False
+    try:
+        spec = importlib.util.find_spec(top_level)
+    except Exception:
+        return False
+    if spec is None or is_stdlib(top_level, spec):
+        return False
+    locations = list(spec.submodule_search_locations or []) + ([spec.origin] if spec.origin else [])
+    for location in locations:
+        location = os.path.abspath(location)
+        if any(is_in_dir(location, d) for d in local_dirs):
+            return False
+    return True
+
+
+def import_module(module_name: str) -> tuple[str, float, str | None]:
+    start = time.perf_counter()
+    try:
+        importlib.import_module(module_name)
+        error = None
+    except BaseException as e:
+        error = "{}: {}".format(type(e).__name__, e)
+    return module_name, time.perf_counter() - start, error
+
+
+def prefetch_custom_node_imports(module_paths: list[str], workers: int) -> dict:
+    """
+    Compiles the custom node packages and imports the third party modules they import at module level, in parallel,
+    so the following sequential import of the packages (which registers the node classes in a deterministic order)
+    mostly finds them in sys.modules. Failures are ignored, the package import will report them.
+    """
+    start = time.perf_counter()
+    comfy_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    local_dirs = [comfy_dir] + [os.path.abspath(p) for p in folder_paths.get_folder_paths("custom_nodes")]
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="custom_node_import") as executor:
+        imports = set()
+        # a module of a custom node shadows an installed one of the same name once the node is on sys.path, it must
+        # not be imported before
+        local_names = set()
+        for custom_nodes_dir in local_dirs[1:]:
+            local_names.update(get_local_module_names(custom_nodes_dir))
+        for package_imports, package_local_names in executor.map(scan_package, module_paths):
+            imports.update(package_imports)
+            local_names.update(package_local_names)
+        scan_time = time.perf_counter() - start
+
+        modules = sorted(m for m in imports if m.split(".")[0] not in local_names and m not in sys.modules and is_third_party(m, local_dirs))
+        results = list(executor.map(import_module, modules))
+
+    failed = [r for r in results if r[2] is not None]
+    for module_name, _, error in failed:
+        logging.debug("Prefetching {} for custom nodes failed: {}".format(module_name, error))
+    total = time.perf_counter() - start
+    logging.info("Prefetched {} modules for custom nodes in {:.1f} seconds with {} workers".format(len(results) - len(failed), total, workers))
+    return {"workers": workers,
+            "seconds": total,
+            "scan_seconds": scan_time,
+            "modules": [{"module": m, "seconds": s, "error": e} for m, s, e in sorted(results, key=lambda a: a[1], reverse=True)],
+            }
+
+
+def write_import_time_report(node_import_times: list[tuple[float, str, bool, int]], prefetch: dict | None = None) -> None:
+    """Writes the import times of the custom nodes to custom_node_import_times.json in the user directory."""
+    report = {"time": time.time(),
+              "total_seconds": sum(n[0] for n in node_import_times),
+              "prefetch": prefetch,
+              "custom_nodes": [{"path": path, "seconds": seconds, "success": success, "node_count": node_count} for seconds, path, success, node_count in node_import_times],
+              }
+    path = os.path.join(folder_paths.get_user_directory(), "custom_node_import_times.json")
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    except Exception as e:
+        logging.warning("Could not write the custom node import time report {}: {}".format(path, e))
@@ -1,4 +1,6 @@
+from sqlalchemy import BigInteger, Column, DateTime, Text
 from sqlalchemy.orm import declarative_base
+from sqlalchemy.sql import func
 
 Base = declarative_base()
 
@@ -11,4 +13,38 @@ def to_dict(obj):
         if (val := getattr(obj, field))
     }
 
-# TODO: Define models here
+
+class Model(Base):
+    """
+    A model file in one of the model folders, identified by its folder type and its path relative to the folder.
+
+    The row is valid as long as file_size and mtime_ns match the file. hash is computed in the background, header_metadata
+    is the __metadata__ of a safetensors header and architecture the supported model detected from the tensor shapes.
+    """
+    __tablename__ = "model"
+
+    type = Column(Text, primary_key=True)
+    path = Column(Text, primary_key=True)
+    file_name = Column(Text)
+    file_size = Column(BigInteger)
+    mtime_ns = Column(BigInteger)
+    hash = Column(Text, index=True)
+    hash_algorithm = Column(Text)
+    header_metadata = Column(Text)
+    architecture = Column(Text)
+    date_added = Column(DateTime, server_default=func.now())
+    date_indexed = Column(DateTime, server_default=func.now(), onupdate=func.now())
+
+    def to_dict(self):
+        return {
+            "type": self.type,
+            "path": self.path,
+            "file_name": self.file_name,
+            "file_size": self.file_size,
+            "mtime_ns": self.mtime_ns,
+            "hash": self.hash,
+            "hash_algorithm": self.hash_algorithm,
+            "architecture": self.architecture,
+            "date_added": self.date_added.isoformat() if self.date_added else None,
+            "date_indexed": self.date_indexed.isoformat() if self.date_indexed else None,
+        }
@@ -0,0 +1,210 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable
+
+import folder_paths
+import comfy.utils
+from comfy.cli_args import args
+from app.database.db import can_create_session, create_session
+
+HASH_ALGORITHM = "sha256"
+HASH_CHUNK_SIZE = 4 * 1024 * 1024
+SAFETENSORS_EXTENSIONS = (".safetensors", ".sft")
+SAFETENSORS_DTYPES = {
+    "F64": "float64", "F32": "float32", "F16": "float16", "BF16": "bfloat16",
+    "F8_E4M3": "float8_e4m3fn", "F8_E5M2": "float8_e5m2",
+    "I64": "int64", "I32": "int32", "I16": "int16", "I8": "int8", "U8": "uint8", "BOOL": "bool",
+}
+
+
+def hash_file(path: str, bytes_per_second: float | None = None) -> str:
+    """sha256 of a file, reading it at bytes_per_second at most so it doesn't starve model loading."""
+    m = hashlib.sha256()
+    start = time.monotonic()
+    read = 0
+    with open(path, "rb") as f:
+        while True:
+            chunk = f.read(HASH_CHUNK_SIZE)
+            if not chunk:
+                break
+            m.update(chunk)
+            read += len(chunk)
+            if bytes_per_second:
+                ahead = read / bytes_per_second - (time.monotonic() - start)
+                if ahead > 0:
+                    time.sleep(ahead)
+    return m.hexdigest()
+
+
+def read_safetensors_header(path: str) -> dict | None:
+    try:
+        header = comfy.utils.safetensors_header(path)
+        return None if header is None else json.loads(header)
+    except Exception as e:
+        logging.warning("Could not read the safetensors header of {}: {}".format(path, e))
+        return None
+
+
+def detect_architecture(header: dict) -> str | None:
+    """Name of the supported model detected from the tensor shapes of a safetensors header, without loading it."""
+    import torch
+    import comfy.model_detection
+
+    state_dict = {}
+    for key, value in header.items():
+        if key == "__metadata__":
+            continue
+        dtype = getattr(torch, SAFETENSORS_DTYPES.get(value.get("dtype"), "float32"), torch.float32)
+        state_dict[key] = torch.empty(value["shape"], dtype=dtype, device="meta")
+
+    # full checkpoints, then diffusion models saved on their own
+    for prefix in (comfy.model_detection.unet_prefix_from_state_dict(state_dict), ""):
+        try:
+            model_config = comfy.model_detection.model_config_from_unet(state_dict, prefix, metadata=header.get("__metadata__"))
+        except Exception:
+            model_config = None
+        if model_config is not None:
+            return type(model_config).__name__
+    return None
+
+
+class ModelIndex:
+    """
+    Index of the model files in the database: size, mtime, safetensors metadata and detected architecture, read when a
+    file is first requested or changed, and the sha256 hash, computed on demand by a throttled background pool.
+    """
+
+    def __init__(self, session_factory: Callable | None = None):
+        self.session_factory = session_factory
+        self.executor = None
+        self.pending: set[tuple[str, str]] = set()
+        self.lock = threading.Lock()
+        self.index_lock = threading.Lock()
+
+    def available(self) -> bool:
+        return self.session_factory is not None or can_create_session()
+
+    def create_session(self):
+        if self.session_factory is not None:
+            return self.session_factory()
+        return create_session()
+
+    def entry(self, row) -> dict:
+        out = row.to_dict()
+        out["metadata"] = json.loads(row.header_metadata) if row.header_metadata else None
+        out["hash_pending"] = (row.type, row.path) in self.pending
+        return out
+
+    def update_row(self, session, row, folder_name: str, filename: str, full_path: str, stat: os.stat_result):
+        from app.database.models import Model
+
+        if row is None:
+            row = Model(type=folder_name, path=filename)
+            session.add(row)
+        row.file_name = os.path.basename(filename)
+        row.file_size = stat.st_size
+        row.mtime_ns = stat.st_mtime_ns
+        row.hash = None
+        row.hash_algorithm = None
+        header = read_safetensors_header(full_path) if full_path.lower().endswith(SAFETENSORS_EXTENSIONS) else None
+        row.header_metadata = json.dumps(header["__metadata__"]) if header is not None and "__metadata__" in header else None
+        row.architecture = None
+        if header is not None:
+            try:
+                row.architecture = detect_architecture(header)
+            except Exception as e:
+                logging.debug("Could not detect the architecture of {}: {}".format(full_path, e))
+        return row
+
+    def get(self, folder_name: str, filename: str) -> dict | None:
+        """Returns the index entry of a model file, reindexing it if it changed. None if the file doesn't exist."""
+        from app.database.models import Model
+
+        full_path = folder_paths.get_full_path(folder_name, filename)
+        if full_path is None:
+            return None
+        stat = os.stat(full_path)
+        with self.create_session() as session:
+            row = session.get(Model, (folder_name, filename))
+            if row is None or row.file_size != stat.st_size or row.mtime_ns != stat.st_mtime_ns:
+                with self.index_lock:
+                    row = session.get(Model, (folder_name, filename))
+                    if row is None or row.file_size != stat.st_size or row.mtime_ns != stat.st_mtime_ns:
+                        row = self.update_row(session, row, folder_name, filename, full_path, stat)
+                        session.commit()
+            return self.entry(row)
+
+    def list(self, folder_name: str) -> list[dict]:
+        """Returns the entries of all the files of a model folder type, updating the index of the folder."""
+        from app.database.models import Model
+
+        filenames = folder_paths.get_filename_list(folder_name)
+        with self.index_lock, self.create_session() as session:
+            rows = {row.path: row for row in session.query(Model).filter(Model.type == folder_name)}
+            out = []
+            for filename in filenames:
+                row = rows.pop(filename, None)
+                full_path = folder_paths.get_full_path(folder_name, filename)
+                if full_path is None:
+                    continue
+                stat = os.stat(full_path)
+                if row is None or row.file_size != stat.st_size or row.mtime_ns != stat.st_mtime_ns:
+                    row = self.update_row(session, row, folder_name, filename, full_path, stat)
+                out.append(row)
+            # files that were deleted
+            for row in rows.values():
+                session.delete(row)
+            session.commit()
+            return [self.entry(row) for row in out]
+
+    def find_by_hash(self, hash: str) -> list[dict]:
+        from app.database.models import Model
+
+        with self.create_session() as session:
+            return [self.entry(row) for row in session.query(Model).filter(Model.hash == hash.lower())]
+
+    def queue_hash(self, folder_name: str, filename: str):
+        """Computes the hash of a model file in the background."""
+        key = (folder_name, filename)
+        with self.lock:
+            if key in self.pending:
+                return
+            self.pending.add(key)
+            if self.executor is None:
+                self.executor = ThreadPoolExecutor(max_workers=max(1, args.model_hash_workers), thread_name_prefix="model_hash")
+        self.executor.submit(self.hash_model, folder_name, filename)
+
+    def hash_model(self, folder_name: str, filename: str):
+        from app.database.models import Model
+
+        try:
+            full_path = folder_paths.get_full_path(folder_name, filename)
+            if full_path is None:
+                return
+            stat = os.stat(full_path)
+            start = time.perf_counter()
+            digest = hash_file(full_path, args.model_hash_io_limit * 1024 * 1024)
+            logging.debug("Hashed {} in {:.1f} seconds".format(full_path, time.perf_counter() - start))
+            with self.create_session() as session:
+                row = session.get(Model, (folder_name, filename))
+                # the file changed while it was being hashed, it will be hashed again on the next request
+                if row is None or row.file_size != stat.st_size or row.mtime_ns != stat.st_mtime_ns or os.stat(full_path).st_mtime_ns != stat.st_mtime_ns:
+                    return
+                row.hash = digest
+                row.hash_algorithm = HASH_ALGORITHM
+                session.commit()
+        except Exception as e:
+            logging.warning("Could not hash model {} {}: {}".format(folder_name, filename, e))
+        finally:
+            with self.lock:
+                self.pending.discard((folder_name, filename))
+
+
+model_index = ModelIndex()
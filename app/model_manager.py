@@ -1,6 +1,7 @@
 from __future__ import annotations
 
 import os
+import asyncio
 import base64
 import json
 import time
@@ -12,16 +13,18 @@ from aiohttp import web
 from PIL import Image
 from io import BytesIO
 from folder_paths import map_legacy, filter_files_extensions, filter_files_content_types
+from app.thumbnail_cache import thumbnail_cache
+from app.model_index import model_index
 
 
 class ModelFileManager:
     def __init__(self) -> None:
-        self.cache: dict[str, tuple[list[dict], dict[str, float], float]] = {}
+        self.cache: dict[str, tuple[list[dict], dict[str, int], float]] = {}
 
-    def get_cache(self, key: str, default=None) -> tuple[list[dict], dict[str, float], float] | None:
+    def get_cache(self, key: str, default=None) -> tuple[list[dict], dict[str, int], float] | None:
         return self.cache.get(key, default)
 
-    def set_cache(self, key: str, value: tuple[list[dict], dict[str, float], float]):
+    def set_cache(self, key: str, value: tuple[list[dict], dict[str, int], float]):
         self.cache[key] = value
 
     def clear_cache(self):
@@ -49,6 +52,44 @@ class ModelFileManager:
             files = self.get_model_file_list(folder)
             return web.json_response(files)
 
+        @routes.get("/experiment/models/index/{folder}")
+        async def get_model_index(request):
+            folder = request.match_info.get("folder", None)
+            if not folder in folder_paths.folder_names_and_paths:
+                return web.Response(status=404)
+            if not model_index.available():
+                return web.json_response({"error": "The database is not available."}, status=503)
+            entries = await asyncio.get_running_loop().run_in_executor(None, model_index.list, folder)
+            if request.rel_url.query.get("hash", "false") == "true":
+                for entry in entries:
+                    if entry["hash"] is None:
+                        model_index.queue_hash(folder, entry["path"])
+                        entry["hash_pending"] = True
+            return web.json_response(entries)
+
+        @routes.get("/experiment/models/index/{folder}/{filename:.*}")
+        async def get_model_index_entry(request):
+            folder = request.match_info.get("folder", None)
+            filename = request.match_info.get("filename", None)
+            if not folder in folder_paths.folder_names_and_paths:
+                return web.Response(status=404)
+            if not model_index.available():
+                return web.json_response({"error": "The database is not available."}, status=503)
+            entry = await asyncio.get_running_loop().run_in_executor(None, model_index.get, folder, filename)
+            if entry is None:
+                return web.Response(status=404)
+            if entry["hash"] is None and request.rel_url.query.get("hash", "false") == "true":
+                model_index.queue_hash(folder, filename)
+                entry["hash_pending"] = True
+            return web.json_response(entry)
+
+        @routes.get("/experiment/models/hash/{hash}")
+        async def get_models_by_hash(request):
+            if not model_index.available():
+                return web.json_response({"error": "The database is not available."}, status=503)
+            entries = await asyncio.get_running_loop().run_in_executor(None, model_index.find_by_hash, request.match_info["hash"])
+            return web.json_response(entries)
+
         @routes.get("/experiment/models/preview/{folder}/{path_index}/{filename:.*}")
         async def get_model_preview(request):
             folder_name = request.match_info.get("folder", None)
@@ -67,8 +108,30 @@ class ModelFileManager:
             if default_preview is None or (isinstance(default_preview, str) and not os.path.isfile(default_preview)):
                 return web.Response(status=404)
 
+            max_size = None
+            if request.rel_url.query.get("max_size", "").isdigit():
+                max_size = max(1, int(request.rel_url.query["max_size"]))
+
+            if thumbnail_cache.enabled:
+                try:
+                    if isinstance(default_preview, str):
+                        thumbnail = await asyncio.get_running_loop().run_in_executor(None, thumbnail_cache.get_file_thumbnail, default_preview, "webp", 80, max_size)
+                    else:
+                        # cover image embedded in the safetensors metadata
+                        stat = os.stat(full_filename)
+                        thumbnail = await asyncio.get_running_loop().run_in_executor(None, thumbnail_cache.get_thumbnail, os.path.abspath(full_filename) + "#cover",
+                                                                                      stat.st_mtime_ns, stat.st_size, lambda: Image.open(default_preview), "webp", 80, max_size)
+                    return web.FileResponse(thumbnail, headers={"Content-Type": "image/webp"})
+                except FileNotFoundError:
+                    return web.Response(status=404)
+                except Exception as e:
+                    logging.error("Could not create the preview thumbnail of {}: {}".format(full_filename, e))
+                    return web.Response(status=500)
+
             try:
                 with Image.open(default_preview) as img:
+                    if max_size is not None:
+                        img.thumbnail((max_size, max_size))
                     img_bytes = BytesIO()
                     img.save(img_bytes, format="WEBP")
                     img_bytes.seek(0)
@@ -97,54 +160,27 @@ class ModelFileManager:
 
         if model_file_list_cache is None:
             return None
-        if not os.path.isdir(folder):
-            return None
-        if os.path.getmtime(folder) != model_file_list_cache[1]:
+        if folder_paths.get_folder_index(folder).refresh() != model_file_list_cache[1].get(folder):
             return None
-        for x in model_file_list_cache[1]:
-            time_modified = model_file_list_cache[1][x]
-            folder = x
-            if os.path.getmtime(folder) != time_modified:
-                return None
 
         return model_file_list_cache
 
-    def recursive_search_models_(self, directory: str, pathIndex: int) -> tuple[list[str], dict[str, float], float]:
+    def recursive_search_models_(self, directory: str, pathIndex: int) -> tuple[list[dict], dict[str, int], float]:
         if not os.path.isdir(directory):
             return [], {}, time.perf_counter()
 
-        excluded_dir_names = [".git"]
         # TODO use settings
         include_hidden_files = False
 
-        result: list[str] = []
-        dirs: dict[str, float] = {}
-
-        for dirpath, subdirs, filenames in os.walk(directory, followlinks=True, topdown=True):
-            subdirs[:] = [d for d in subdirs if d not in excluded_dir_names]
-            if not include_hidden_files:
-                subdirs[:] = [d for d in subdirs if not d.startswith(".")]
-                filenames = [f for f in filenames if not f.startswith(".")]
-
-            filenames = filter_files_extensions(filenames, folder_paths.supported_pt_extensions)
-
-            for file_name in filenames:
-                try:
-                    relative_path = os.path.relpath(os.path.join(dirpath, file_name), directory)
-                    result.append(relative_path)
-                except:
-                    logging.warning(f"Warning: Unable to access {file_name}. Skipping this file.")
-                    continue
-
-            for d in subdirs:
-                path: str = os.path.join(dirpath, d)
-                try:
-                    dirs[path] = os.path.getmtime(path)
-                except FileNotFoundError:
-                    logging.warning(f"Warning: Unable to access {path}. Skipping this path.")
-                    continue
+        # the listing is shared with folder_paths.get_filename_list, which doesn't skip hidden files
+        index = folder_paths.get_folder_index(directory)
+        files = index.get_files()
+        version = index.version
+        if not include_hidden_files:
+            files = [f for f in files if not any(p.startswith(".") for p in f.split(os.sep))]
 
-        return [{"name": f, "pathIndex": pathIndex} for f in result], dirs, time.perf_counter()
+        result = filter_files_extensions(files, folder_paths.supported_pt_extensions)
+        return [{"name": f, "pathIndex": pathIndex} for f in result], {directory: version}, time.perf_counter()
 
     def get_model_previews(self, filepath: str) -> list[str | BytesIO]:
         dirname = os.path.dirname(filepath)
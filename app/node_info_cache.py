@@ -0,0 +1,138 @@
+from __future__ import annotations
+
+import gzip
+import hashlib
+import json
+import logging
+import threading
+import time
+import traceback
+from typing import Callable
+
+import folder_paths
+
+# INPUT_TYPES slower than this get logged when the /object_info response is rebuilt
+SLOW_NODE_INFO_SECONDS = 0.05
+
+
+class NodeInfoEntry:
+    def __init__(self, info: dict | None, dependencies: dict, seconds: float):
+        self.info = info
+        self.dependencies = dependencies
+        self.seconds = seconds
+
+
+class NodeInfoCache:
+    """
+    Keeps the /object_info info of every node class together with the folders its INPUT_TYPES read (recorded through
+    folder_paths). An entry is only rebuilt when one of those folders changed or on a refresh: INPUT_TYPES that list
+    files another way are only seen again then, a node class that needs fresh info on every request can record a
+    ("volatile", None) dependency. The full response is only serialized and compressed again when an entry or the set
+    of node classes changed.
+    """
+
+    def __init__(self, node_info: Callable[[str], dict], get_node_classes: Callable[[], dict]):
+        self.node_info = node_info
+        self.get_node_classes = get_node_classes
+        self.entries: dict[str, NodeInfoEntry] = {}
+        self.lock = threading.RLock()
+        self.response_classes = None
+        self.body = None
+        self.gzip_body = None
+        self.etag = None
+
+    def build_entry(self, node_class: str) -> NodeInfoEntry:
+        folder_paths.dependency_recorder.dependencies = set()
+        start = time.perf_counter()
+        try:
+            info = self.node_info(node_class)
+        except Exception:
+            logging.error(f"[ERROR] An error occurred while retrieving information for the '{node_class}' node.")
+            logging.error(traceback.format_exc())
+            info = None
+        finally:
+            seconds = time.perf_counter() - start
+            dependencies = folder_paths.dependency_recorder.dependencies
+            folder_paths.dependency_recorder.dependencies = None
+        if info is None:
+            # retry on the next request
+            dependencies.add(("volatile", None))
+        return NodeInfoEntry(info, {d: folder_paths.get_dependency_fingerprint(d) for d in dependencies}, seconds)
+
+    def get_entry(self, node_class: str, fingerprints: dict, refresh: bool = False) -> tuple[NodeInfoEntry, bool]:
+        """Returns the entry of a node class, rebuilding it if needed, and whether its info changed."""
+        old_entry = self.entries.get(node_class)
+        entry = old_entry
+        if refresh:
+            entry = None
+        if entry is not None:
+            for dependency, fingerprint in entry.dependencies.items():
+                if dependency not in fingerprints:
+                    fingerprints[dependency] = folder_paths.get_dependency_fingerprint(dependency)
+                if fingerprints[dependency] != fingerprint:
+                    entry = None
+                    break
+        if entry is not None:
+            return entry, False
+        entry = self.build_entry(node_class)
+        self.entries[node_class] = entry
+        return entry, old_entry is None or old_entry.info != entry.info
+
+    def get_info(self, node_class: str, refresh: bool = False) -> dict | None:
+        with self.lock, folder_paths.cache_helper:
+            return self.get_entry(node_class, {}, refresh)[0].info
+
+    def get_cached(self, node_class: str) -> tuple[dict | None, list[tuple[str, str | None]]] | None:
+        """Returns the info last built for a node class and the dependencies recorded while building it."""
+        with self.lock:
+            entry = self.entries.get(node_class)
+            if entry is None:
+                return None
+            return entry.info, list(entry.dependencies.keys())
+
+    def get_response(self, refresh: bool = False) -> tuple[bytes, bytes, str]:
+        """Returns the /object_info json body, its gzip compressed version and its ETag. refresh rebuilds every entry."""
+        with self.lock, folder_paths.cache_helper:
+            node_classes = tuple(self.get_node_classes())
+            fingerprints = {}
+            changed = node_classes != self.response_classes
+            rebuilt = []
+            for node_class in node_classes:
+                entry, built = self.get_entry(node_class, fingerprints, refresh)
+                if built:
+                    changed = True
+                    rebuilt.append((node_class, entry.seconds))
+
+            current = set(node_classes)
+            for node_class in list(self.entries.keys()):
+                if node_class not in current:
+                    del self.entries[node_class]
+
+            if changed or self.body is None:
+                out = {}
+                for node_class in node_classes:
+                    info = self.entries[node_class].info
+                    if info is not None:
+                        out[node_class] = info
+                self.body = json.dumps(out).encode("utf-8")
+                self.gzip_body = gzip.compress(self.body, compresslevel=6)
+                self.etag = '"{}"'.format(hashlib.sha256(self.body).hexdigest()[:32])
+                self.response_classes = node_classes
+                self.log_slow(rebuilt)
+            return self.body, self.gzip_body, self.etag
+
+    def log_slow(self, rebuilt: list[tuple[str, float]]):
+        slow = sorted(filter(lambda a: a[1] >= SLOW_NODE_INFO_SECONDS, rebuilt), key=lambda a: a[1], reverse=True)
+        if len(slow) > 0:
+            logging.info("Slow node info (INPUT_TYPES) for {} node classes: {}".format(len(slow), ", ".join("{} {:.3f}s".format(n, s) for n, s in slow[:10])))
+
+    def timing_report(self) -> list[dict]:
+        """Time spent building the info of each node class the last time it was built, slowest first."""
+        with self.lock:
+            report = []
+            for node_class, entry in self.entries.items():
+                report.append({"node_class": node_class,
+                               "seconds": entry.seconds,
+                               "dependencies": sorted("{}:{}".format(kind, name) for kind, name in entry.dependencies),
+                               })
+            return sorted(report, key=lambda a: a["seconds"], reverse=True)
@@ -0,0 +1,130 @@
+from __future__ import annotations
+
+import hashlib
+import logging
+import os
+import threading
+import uuid
+from typing import Callable
+
+from PIL import Image, ImageOps
+
+import folder_paths
+from comfy.cli_args import args
+
+THUMBNAIL_FORMATS = {"webp": "WEBP", "jpeg": "JPEG", "png": "PNG"}
+
+
+class ThumbnailCache:
+    """
+    Disk cache of resized and re-encoded images, keyed by (source, mtime, size, format, quality, max dimension, mode).
+
+    Cache hits only cost a stat of the source and of the cached file. The total size of the cache is kept under
+    max_bytes by deleting the least recently used thumbnails (their mtime is updated on every hit).
+    """
+
+    def __init__(self, cache_dir: str | None = None, max_bytes: int | None = None):
+        self._cache_dir = cache_dir
+        if max_bytes is None:
+            max_bytes = round(args.thumbnail_cache_size * 1024 * 1024)
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.total_bytes = None
+
+    @property
+    def cache_dir(self) -> str:
+        if self._cache_dir is None:
+            self._cache_dir = os.path.join(folder_paths.get_user_directory(), "thumbnail_cache")
+        return self._cache_dir
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    def get_cache_path(self, source: str, mtime_ns: int, size: int, image_format: str, quality: int, max_size: int | None, mode: str) -> str:
+        key = "{}|{}|{}|{}|{}|{}|{}".format(source, mtime_ns, size, image_format, quality, max_size, mode)
+        digest = hashlib.sha256(key.encode("utf-8")).hexdigest()
+        return os.path.join(self.cache_dir, digest[:2], "{}.{}".format(digest, image_format))
+
+    def get_file_thumbnail(self, path: str, image_format: str = "webp", quality: int = 90, max_size: int | None = None, mode: str | None = None) -> str:
+        """Returns the path of the cached thumbnail of the image file at path, creating it if needed."""
+        stat = os.stat(path)
+        return self.get_thumbnail(os.path.abspath(path), stat.st_mtime_ns, stat.st_size, lambda: Image.open(path), image_format, quality, max_size, mode)
+
+    def get_thumbnail(self, source: str, mtime_ns: int, size: int, open_image: Callable[[], Image.Image], image_format: str = "webp",
+                      quality: int = 90, max_size: int | None = None, mode: str | None = None) -> str:
+        """
+        Returns the path of the cached thumbnail of an image identified by source, mtime_ns and size.
+        open_image is only called on a cache miss. mode is the PIL mode the image is converted to, None keeps it.
+        """
+        cache_path = self.get_cache_path(source, mtime_ns, size, image_format, quality, max_size, mode)
+        try:
+            os.utime(cache_path)
+            return cache_path
+        except FileNotFoundError:
+            pass
+
+        with open_image() as img:
+            if mode is not None and img.mode != mode:
+                img = img.convert(mode)
+            if max_size is not None and (img.width > max_size or img.height > max_size):
+                img = ImageOps.contain(img, (max_size, max_size), Image.Resampling.BILINEAR)
+            os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+            tmp_path = "{}.{}.tmp".format(cache_path, uuid.uuid4().hex)
+            try:
+                img.save(tmp_path, format=THUMBNAIL_FORMATS[image_format], quality=quality)
+                os.replace(tmp_path, cache_path)
+            finally:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+
+        self.added(os.path.getsize(cache_path), cache_path)
+        return cache_path
+
+    def scan(self) -> list[tuple[float, int, str]]:
+        files = []
+        for root, _, filenames in os.walk(self.cache_dir):
+            for filename in filenames:
+                path = os.path.join(root, filename)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                files.append((stat.st_mtime, stat.st_size, path))
+        return files
+
+    def added(self, size: int, keep: str):
+        """Accounts for a new thumbnail, evicting older ones if the cache is over max_bytes. keep is never evicted."""
+        with self.lock:
+            if self.total_bytes is None:
+                self.total_bytes = sum(f[1] for f in self.scan())
+            else:
+                self.total_bytes += size
+            if self.total_bytes > self.max_bytes:
+                self.evict(keep)
+
+    def evict(self, keep: str | None = None):
+        """
+        Deletes the least recently used thumbnails until the cache is under 90% of max_bytes. The thumbnail at keep, the
+        one about to be returned, is never deleted even if it is bigger than the cap on its own.
+        """
+        files = sorted(self.scan())
+        total = sum(f[1] for f in files)
+        target = self.max_bytes * 0.9
+        removed = 0
+        for _, size, path in files:
+            if total <= target:
+                break
+            if keep is not None and os.path.normpath(path) == os.path.normpath(keep):
+                continue
+            try:
+                os.remove(path)
+                total -= size
+                removed += 1
+            except OSError:
+                pass
+        self.total_bytes = total
+        logging.debug("thumbnail cache: removed {} files, {} bytes left".format(removed, total))
+
+
+thumbnail_cache = ThumbnailCache()
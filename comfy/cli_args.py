@@ -99,11 +99,15 @@ class LatentPreviewMethod(enum.Enum):
 parser.add_argument("--preview-method", type=LatentPreviewMethod, default=LatentPreviewMethod.NoPreviews, help="Default preview method for sampler nodes.", action=EnumAction)
 
 parser.add_argument("--preview-size", type=int, default=512, help="Sets the maximum preview size for sampler nodes.")
+parser.add_argument("--async-preview-decode", action="store_true", help="Decode the sampler previews on a separate thread (and CUDA stream) so they don't add to the sampling step time, the previews lag one step behind.")
+parser.add_argument("--preview-max-fps", type=float, default=10.0, help="Maximum number of sampler previews sent to each client per second, only the latest preview is sent when a client falls behind. 0 means no limit.")
 
 cache_group = parser.add_mutually_exclusive_group()
 cache_group.add_argument("--cache-classic", action="store_true", help="Use the old style (aggressive) caching.")
 cache_group.add_argument("--cache-lru", type=int, default=0, help="Use LRU caching with a maximum of N node results cached. May use more RAM/VRAM.")
 cache_group.add_argument("--cache-none", action="store_true", help="Reduced RAM/VRAM usage at the expense of executing every node for each run.")
+parser.add_argument("--disable-graph-optimization", action="store_true", help="Execute prompts as they are submitted instead of merging the identical nodes and removing the nodes no output depends on first.")
+parser.add_argument("--disable-validation-cache", action="store_true", help="Validate every prompt from scratch instead of reusing the validation of the prompts with the same graph that only differ by values like seeds or text.")
 
 attn_group = parser.add_mutually_exclusive_group()
 attn_group.add_argument("--use-split-cross-attention", action="store_true", help="Use the split cross attention optimization. Ignored when xformers is used.")
@@ -131,7 +135,13 @@ parser.add_argument("--reserve-vram", type=float, default=None, help="Set the am
 
 parser.add_argument("--async-offload", action="store_true", help="Use async weight offloading.")
 
-parser.add_argument("--default-hashing-function", type=str, choices=['md5', 'sha1', 'sha256', 'sha512'], default='sha256', help="Allows you to choose the hash function to use for duplicate filename / contents comparison. Default is sha256.")
+parser.add_argument("--default-hashing-function", type=str, choices=['md5', 'sha1', 'sha256', 'sha512', 'blake2b', 'xxh3'], default='sha256', help="Allows you to choose the hash function to use for duplicate filename / contents comparison and to detect changes of the files loaded by nodes. Default is sha256. xxh3 is a much faster non cryptographic hash, it needs the xxhash package.")
+
+class BatchNoiseMode(enum.Enum):
+    Legacy = "legacy"
+    Philox = "philox"
+
+parser.add_argument("--batch-noise", type=BatchNoiseMode, default=BatchNoiseMode.Legacy, help="How the initial noise of each batch item is generated. legacy keeps the noise of existing seeds, philox generates the noise of any batch_index directly which is much faster for latents picked from large batches but gives different images for the same seed.", action=EnumAction)
 
 parser.add_argument("--disable-smart-memory", action="store_true", help="Force ComfyUI to agressively offload to regular ram instead of keeping models in vram when it can.")
 parser.add_argument("--deterministic", action="store_true", help="Make pytorch use slower deterministic algorithms when it can. Note that this might not make images deterministic in all cases.")
@@ -143,13 +153,21 @@ class PerformanceFeature(enum.Enum):
 
 parser.add_argument("--fast", nargs="*", type=PerformanceFeature, help="Enable some untested and potentially quality deteriorating optimizations. --fast with no arguments enables everything. You can pass a list specific optimizations if you only want to enable specific ones. Current valid optimizations: fp16_accumulation fp8_matrix_mult cublas_ops")
 
+parser.add_argument("--torch-compile-cache", action="store_true", help="Persist the torch.compile artifacts of the TorchCompileModel node to the user directory and load them at startup so restarts don't pay the full compile cost again.")
+
 parser.add_argument("--mmap-torch-files", action="store_true", help="Use mmap when loading ckpt/pt files.")
 
 parser.add_argument("--dont-print-server", action="store_true", help="Don't print server output.")
 parser.add_argument("--quick-test-for-ci", action="store_true", help="Quick test for CI.")
 parser.add_argument("--windows-standalone-build", action="store_true", help="Windows standalone build: Enable convenient things that most people using the standalone windows build will probably enjoy (like auto opening the page on startup).")
 
+parser.add_argument("--watch-model-folders", action="store_true", help="Watch the model folders for changes (needs the watchdog package) instead of checking the mtime of all their subfolders every time a list of models is requested. Folders containing symlinked subfolders are still polled.")
+parser.add_argument("--model-folder-poll-interval", type=float, default=0, help="Minimum number of seconds between two checks of a model folder for new or removed files when it isn't watched. Default 0 checks every time a list of models is requested.")
+parser.add_argument("--thumbnail-cache-size", type=float, default=512, help="Maximum size in MB of the disk cache of the image previews and model preview thumbnails served by the /view and /experiment/models/preview routes. 0 disables the cache.")
 parser.add_argument("--disable-metadata", action="store_true", help="Disable saving prompt metadata in files.")
+parser.add_argument("--image-save-workers", type=int, default=4, help="Number of background threads that encode and write the images of the save and preview image nodes. 0 writes them on the execution thread.")
+parser.add_argument("--custom-node-import-workers", type=int, default=0, help="Before importing the custom nodes one by one, compile them and import the third party modules they use with this many threads. 0 (default) disables it. A report of the import times is written to custom_node_import_times.json in the user directory either way.")
+parser.add_argument("--lazy-node-loading", action="store_true", help="Don't import the built-in comfy_extras and comfy_api_nodes node modules that didn't change since the last start until one of their nodes is used. Their node definitions are served from a cache in the user directory.")
 parser.add_argument("--disable-all-custom-nodes", action="store_true", help="Disable loading all custom nodes.")
 parser.add_argument("--disable-api-nodes", action="store_true", help="Disable loading all api nodes.")
 
@@ -207,6 +225,8 @@ database_default_path = os.path.abspath(
     os.path.join(os.path.dirname(__file__), "..", "user", "comfyui.db")
 )
 parser.add_argument("--database-url", type=str, default=f"sqlite:///{database_default_path}", help="Specify the database URL, e.g. for an in-memory database you can use 'sqlite:///:memory:'.")
+parser.add_argument("--model-hash-workers", type=int, default=1, help="Number of threads computing the sha256 hash of model files for the model index.")
+parser.add_argument("--model-hash-io-limit", type=float, default=100, help="Maximum speed in MB/s at which each thread reads model files to hash them. 0 means no limit.")
 
 if comfy.options.args_parsing:
     args = parser.parse_args()
@@ -31,11 +31,13 @@ import comfy.latent_formats
 
 import comfy.cldm.cldm
 import comfy.t2i_adapter.adapter
-import comfy.ldm.cascade.controlnet
-import comfy.cldm.mmdit
-import comfy.ldm.hydit.controlnet
-import comfy.ldm.flux.controlnet
-import comfy.cldm.dit_embedder
+from comfy.lazy_import import lazy_import
+# the controlnets of the model families are only imported when one is loaded
+lazy_import("comfy.ldm.cascade.controlnet")
+lazy_import("comfy.cldm.mmdit")
+lazy_import("comfy.ldm.hydit.controlnet")
+lazy_import("comfy.ldm.flux.controlnet")
+lazy_import("comfy.cldm.dit_embedder")
 from typing import TYPE_CHECKING
 if TYPE_CHECKING:
     from comfy.hooks import HookGroup
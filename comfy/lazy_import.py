@@ -0,0 +1,43 @@
+import importlib
+import sys
+import types
+
+
+class LazyModule(types.ModuleType):
+    """
+    Placeholder set as the attribute of a not yet imported module on its parent package. The first attribute access
+    imports the real module, which replaces the placeholder on the parent package. Assignments are forwarded too so
+    patches made through a reference to the placeholder are seen by the real module.
+    """
+    def load(self) -> types.ModuleType:
+        return importlib.import_module(self.__name__)
+
+    def __getattr__(self, name):
+        return getattr(self.load(), name)
+
+    def __setattr__(self, name, value):
+        setattr(self.load(), name, value)
+
+    def __delattr__(self, name):
+        delattr(self.load(), name)
+
+    def __dir__(self):
+        return dir(self.load())
+
+
+def lazy_import(name: str) -> types.ModuleType:
+    """
+    Makes name reachable as an attribute of its parent packages (so comfy.ldm.wan.model.WanModel works in code that
+    only did lazy_import("comfy.ldm.wan.model")) without importing it until it is used. Only the parent packages are
+    imported, they should be cheap.
+    """
+    module = sys.modules.get(name)
+    if module is not None:
+        return module
+    parent, _, child = name.rpartition(".")
+    parent_module = importlib.import_module(parent)
+    module = getattr(parent_module, child, None)
+    if not isinstance(module, types.ModuleType):
+        module = LazyModule(name)
+        setattr(parent_module, child, module)
+    return module
@@ -19,28 +19,30 @@
 import torch
 import logging
 from comfy.ldm.modules.diffusionmodules.openaimodel import UNetModel, Timestep
-from comfy.ldm.cascade.stage_c import StageC
-from comfy.ldm.cascade.stage_b import StageB
 from comfy.ldm.modules.encoders.noise_aug_modules import CLIPEmbeddingNoiseAugmentation
 from comfy.ldm.modules.diffusionmodules.upscaling import ImageConcatWithNoiseAugmentation
-from comfy.ldm.modules.diffusionmodules.mmdit import OpenAISignatureMMDITWrapper
-import comfy.ldm.genmo.joint_model.asymm_models_joint
-import comfy.ldm.aura.mmdit
-import comfy.ldm.pixart.pixartms
-import comfy.ldm.hydit.models
-import comfy.ldm.audio.dit
-import comfy.ldm.audio.embedders
-import comfy.ldm.flux.model
-import comfy.ldm.lightricks.model
-import comfy.ldm.hunyuan_video.model
-import comfy.ldm.cosmos.model
-import comfy.ldm.cosmos.predict2
-import comfy.ldm.lumina.model
-import comfy.ldm.wan.model
-import comfy.ldm.hunyuan3d.model
-import comfy.ldm.hidream.model
-import comfy.ldm.chroma.model
-import comfy.ldm.ace.model
+from comfy.lazy_import import lazy_import
+# the model families are only imported when a model using them is created
+lazy_import("comfy.ldm.cascade.stage_c")
+lazy_import("comfy.ldm.cascade.stage_b")
+lazy_import("comfy.ldm.modules.diffusionmodules.mmdit")
+lazy_import("comfy.ldm.genmo.joint_model.asymm_models_joint")
+lazy_import("comfy.ldm.aura.mmdit")
+lazy_import("comfy.ldm.pixart.pixartms")
+lazy_import("comfy.ldm.hydit.models")
+lazy_import("comfy.ldm.audio.dit")
+lazy_import("comfy.ldm.audio.embedders")
+lazy_import("comfy.ldm.flux.model")
+lazy_import("comfy.ldm.lightricks.model")
+lazy_import("comfy.ldm.hunyuan_video.model")
+lazy_import("comfy.ldm.cosmos.model")
+lazy_import("comfy.ldm.cosmos.predict2")
+lazy_import("comfy.ldm.lumina.model")
+lazy_import("comfy.ldm.wan.model")
+lazy_import("comfy.ldm.hunyuan3d.model")
+lazy_import("comfy.ldm.hidream.model")
+lazy_import("comfy.ldm.chroma.model")
+lazy_import("comfy.ldm.ace.model")
 
 import comfy.model_management
 import comfy.patcher_extension
@@ -649,7 +651,7 @@ class Lotus(BaseModel):
 
 class StableCascade_C(BaseModel):
     def __init__(self, model_config, model_type=ModelType.STABLE_CASCADE, device=None):
-        super().__init__(model_config, model_type, device=device, unet_model=StageC)
+        super().__init__(model_config, model_type, device=device, unet_model=comfy.ldm.cascade.stage_c.StageC)
         self.diffusion_model.eval().requires_grad_(False)
 
     def extra_conds(self, **kwargs):
@@ -678,7 +680,7 @@ class StableCascade_C(BaseModel):
 
 class StableCascade_B(BaseModel):
     def __init__(self, model_config, model_type=ModelType.STABLE_CASCADE, device=None):
-        super().__init__(model_config, model_type, device=device, unet_model=StageB)
+        super().__init__(model_config, model_type, device=device, unet_model=comfy.ldm.cascade.stage_b.StageB)
         self.diffusion_model.eval().requires_grad_(False)
 
     def extra_conds(self, **kwargs):
@@ -699,7 +701,7 @@ class StableCascade_B(BaseModel):
 
 class SD3(BaseModel):
     def __init__(self, model_config, model_type=ModelType.FLOW, device=None):
-        super().__init__(model_config, model_type, device=device, unet_model=OpenAISignatureMMDITWrapper)
+        super().__init__(model_config, model_type, device=device, unet_model=comfy.ldm.modules.diffusionmodules.mmdit.OpenAISignatureMMDITWrapper)
 
     def encode_adm(self, **kwargs):
         return kwargs["pooled_output"]
@@ -813,7 +815,9 @@ class PixArt(BaseModel):
         return out
 
 class Flux(BaseModel):
-    def __init__(self, model_config, model_type=ModelType.FLUX, device=None, unet_model=comfy.ldm.flux.model.Flux):
+    def __init__(self, model_config, model_type=ModelType.FLUX, device=None, unet_model=None):
+        if unet_model is None:
+            unet_model = comfy.ldm.flux.model.Flux
         super().__init__(model_config, model_type, device=device, unet_model=unet_model)
 
     def concat_cond(self, **kwargs):
@@ -385,6 +385,9 @@ class ModelPatcher:
     def set_model_denoise_mask_function(self, denoise_mask_function):
         self.model_options["denoise_mask_function"] = denoise_mask_function
 
+    def set_model_area_cond_batching(self, granularity=8, min_fill=0.5):
+        self.model_options["area_cond_batching"] = {"granularity": granularity, "min_fill": min_fill}
+
     def set_model_patch(self, patch, name):
         to = self.model_options["transformer_options"]
         if "patches" not in to:
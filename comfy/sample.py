@@ -4,12 +4,73 @@ import comfy.samplers
 import comfy.utils
 import numpy as np
 import logging
+import math
+from comfy.cli_args import args, BatchNoiseMode
 
-def prepare_noise(latent_image, seed, noise_inds=None):
+PHILOX_M0 = 0xD2511F53
+PHILOX_M1 = 0xCD9E8D57
+PHILOX_W0 = 0x9E3779B9
+PHILOX_W1 = 0xBB67AE85
+MASK32 = 0xFFFFFFFF
+
+def _mulhilo32(a, b):
+    # uint32 * uint32 without overflowing int64: split the constant into 16 bit halves.
+    p = a * (b >> 16)
+    r = (p & 0xFFFF) * 65536 + a * (b & 0xFFFF)
+    return (p >> 16) + (r >> 32), r & MASK32
+
+def philox4x32(counter, key, rounds=10):
+    """
+    Philox4x32 counter based random number generator.
+    counter is a list of 4 int64 tensors holding uint32 values, key is a tuple of 2 python ints.
+    returns a list of 4 int64 tensors of random uint32 values.
+    """
+    c0, c1, c2, c3 = counter
+    k0, k1 = key
+    for i in range(rounds):
+        hi0, lo0 = _mulhilo32(c0, PHILOX_M0)
+        hi1, lo1 = _mulhilo32(c2, PHILOX_M1)
+        c0, c1, c2, c3 = hi1 ^ c1 ^ k0, lo1, hi0 ^ c3 ^ k1, lo0
+        k0 = (k0 + PHILOX_W0) & MASK32
+        k1 = (k1 + PHILOX_W1) & MASK32
+    return [c0, c1, c2, c3]
+
+def philox_randn(seed, noise_inds, shape, dtype=torch.float32, layout=torch.strided):
+    """
+    generates gaussian noise for each batch index in noise_inds in a single vectorized call.
+    The noise for a batch index only depends on the seed and the index so any index can be generated directly.
+    """
+    inds = torch.as_tensor(noise_inds, dtype=torch.int64, device="cpu").reshape(-1, 1)
+    numel = math.prod(shape)
+    blocks = (numel + 3) // 4
+    block = torch.arange(blocks, dtype=torch.int64, device="cpu").unsqueeze(0)
+    size = (inds.shape[0], blocks)
+    counter = [(block & MASK32).expand(size), (block >> 32).expand(size), (inds & MASK32).expand(size), (inds >> 32).expand(size)]
+    seed = seed & 0xFFFFFFFFFFFFFFFF
+    r = philox4x32(counter, (seed & MASK32, seed >> 32))
+
+    # Box-Muller, each block of 4 uint32 becomes 4 normally distributed values.
+    u = [(x.to(torch.float64) + 0.5) * (1.0 / 4294967296.0) for x in r]
+    radius = [torch.sqrt(-2.0 * torch.log(u[0])), torch.sqrt(-2.0 * torch.log(u[2]))]
+    theta = [(2.0 * math.pi) * u[1], (2.0 * math.pi) * u[3]]
+    noise = torch.stack([radius[0] * torch.cos(theta[0]), radius[0] * torch.sin(theta[0]), radius[1] * torch.cos(theta[1]), radius[1] * torch.sin(theta[1])], dim=-1)
+    noise = noise.reshape(inds.shape[0], -1)[:, :numel]
+    return noise.reshape([inds.shape[0]] + list(shape)).to(dtype=dtype, layout=layout)
+
+def prepare_noise(latent_image, seed, noise_inds=None, noise_mode=None):
     """
     creates random noise given a latent image and a seed.
-    optional arg skip can be used to skip and discard x number of noise generations for a given seed
+    optional arg noise_inds can be used to generate the noise of specific batch indexes for a given seed.
+    noise_mode selects the generator: legacy draws the batch items sequentially from a seeded torch generator,
+    philox derives each batch item from (seed, index) so arbitrary indexes don't need the previous ones to be generated.
     """
+    if noise_mode is None:
+        noise_mode = args.batch_noise
+    if noise_mode == BatchNoiseMode.Philox:
+        if noise_inds is None:
+            noise_inds = list(range(latent_image.shape[0]))
+        return philox_randn(seed, noise_inds, list(latent_image.size())[1:], dtype=latent_image.dtype, layout=latent_image.layout)
+
     generator = torch.manual_seed(seed)
     if noise_inds is None:
         return torch.randn(latent_image.size(), dtype=latent_image.dtype, layout=latent_image.layout, generator=generator, device="cpu")
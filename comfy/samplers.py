@@ -25,7 +25,7 @@ def add_area_dims(area, num_dims):
         area = [2147483648] + area[:len(area) // 2] + [0] + area[len(area) // 2:]
     return area
 
-def get_area_and_mult(conds, x_in, timestep_in):
+def get_area_and_mult(conds, x_in, timestep_in, bucket_area=None):
     dims = tuple(x_in.shape[2:])
     area = None
     strength = 1.0
@@ -86,6 +86,20 @@ def get_area_and_mult(conds, x_in, timestep_in):
                     m = mult.narrow(i + 2, area[i] - 1 - t, 1)
                     m *= ((1.0 / rr) * (t + 1))
 
+    if bucket_area is not None and area is not None and list(bucket_area) != area:
+        # grow the area to the bucket size so it can be batched with other areas of that size,
+        # the mult is zero outside of the original area so the result gets scattered back the same way.
+        bucket_mult = mult.new_zeros(list(mult.shape[:2]) + list(bucket_area[:len(dims)]))
+        inner = bucket_mult
+        for i in range(len(dims)):
+            inner = inner.narrow(i + 2, area[len(dims) + i] - bucket_area[len(dims) + i], area[i])
+        inner.copy_(mult)
+        mult = bucket_mult
+        area = list(bucket_area)
+        input_x = x_in
+        for i in range(len(dims)):
+            input_x = input_x.narrow(i + 2, area[len(dims) + i], area[i])
+
     conditioning = {}
     model_conds = conds["model_conds"]
     for c in model_conds:
@@ -155,6 +169,40 @@ def cond_cat(c_list):
 
     return out
 
+def bucket_cond_areas(area_conds, x_in, timestep, granularity=8, min_fill=0.5):
+    """
+    Grows the areas of differently sized area/mask conds into a few shared bucket sizes so they can be
+    run in the same model call. area_conds is a list of (cond dict, cond_obj, cond index), returns a list of (cond_obj, cond index).
+    An area is only put in a bucket if it fills at least min_fill of it to avoid wasting too much compute on padding.
+    """
+    dims = tuple(x_in.shape[2:])
+    nd = len(dims)
+    buckets = []
+    assigned = {}
+    order = sorted(range(len(area_conds)), key=lambda a: math.prod(area_conds[a][1].area[:nd]), reverse=True)
+    for idx in order:
+        area = area_conds[idx][1].area
+        size = [min(dims[d], -(-area[d] // granularity) * granularity) for d in range(nd)]
+        bucket = None
+        for b in buckets:
+            if all(b[d] >= size[d] for d in range(nd)) and math.prod(area[:nd]) >= min_fill * math.prod(b):
+                bucket = b
+                break
+        if bucket is None:
+            bucket = size
+            buckets.append(bucket)
+        assigned[idx] = bucket
+
+    out = []
+    for idx, (x, p, i) in enumerate(area_conds):
+        bucket = assigned[idx]
+        offset = [min(p.area[nd + d], dims[d] - bucket[d]) for d in range(nd)]
+        bucket_area = bucket + offset
+        if bucket_area != p.area:
+            p = get_area_and_mult(x, x_in, timestep, bucket_area=bucket_area)
+        out.append((p, i))
+    return out
+
 def finalize_default_conds(model: 'BaseModel', hooked_to_run: dict[comfy.hooks.HookGroup,list[tuple[tuple,int]]], default_conds: list[list[dict]], x_in, timestep, model_options):
     # need to figure out remaining unmasked area for conds
     default_mults = []
@@ -212,6 +260,8 @@ def _calc_cond_batch(model: 'BaseModel', conds: list[list[dict]], x_in: torch.Te
     hooked_to_run: dict[comfy.hooks.HookGroup,list[tuple[tuple,int]]] = {}
     default_conds = []
     has_default_conds = False
+    area_batching = model_options.get("area_cond_batching", None)
+    area_conds = []
 
     for i in range(len(conds)):
         out_conds.append(torch.zeros_like(x_in))
@@ -228,12 +278,22 @@ def _calc_cond_batch(model: 'BaseModel', conds: list[list[dict]], x_in: torch.Te
                 p = get_area_and_mult(x, x_in, timestep)
                 if p is None:
                     continue
+                if area_batching is not None and p.area is not None:
+                    area_conds.append((x, p, i))
+                    continue
                 if p.hooks is not None:
                     model.current_patcher.prepare_hook_patches_current_keyframe(timestep, p.hooks, model_options)
                 hooked_to_run.setdefault(p.hooks, list())
                 hooked_to_run[p.hooks] += [(p, i)]
         default_conds.append(default_c)
 
+    if len(area_conds) > 0:
+        for p, i in bucket_cond_areas(area_conds, x_in, timestep, **area_batching):
+            if p.hooks is not None:
+                model.current_patcher.prepare_hook_patches_current_keyframe(timestep, p.hooks, model_options)
+            hooked_to_run.setdefault(p.hooks, list())
+            hooked_to_run[p.hooks] += [(p, i)]
+
     if has_default_conds:
         finalize_default_conds(model, hooked_to_run, default_conds, x_in, timestep, model_options)
 
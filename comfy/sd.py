@@ -7,15 +7,17 @@ import logging
 from comfy import model_management
 from comfy.utils import ProgressBar
 from .ldm.models.autoencoder import AutoencoderKL, AutoencodingEngine
-from .ldm.cascade.stage_a import StageA
-from .ldm.cascade.stage_c_coder import StageC_coder
-from .ldm.audio.autoencoder import AudioOobleckVAE
-import comfy.ldm.genmo.vae.model
-import comfy.ldm.lightricks.vae.causal_video_autoencoder
-import comfy.ldm.cosmos.vae
-import comfy.ldm.wan.vae
-import comfy.ldm.hunyuan3d.vae
-import comfy.ldm.ace.vae.music_dcae_pipeline
+from comfy.lazy_import import lazy_import
+# the VAEs and text encoders of the model families are only imported when a model using them is loaded
+lazy_import("comfy.ldm.cascade.stage_a")
+lazy_import("comfy.ldm.cascade.stage_c_coder")
+lazy_import("comfy.ldm.audio.autoencoder")
+lazy_import("comfy.ldm.genmo.vae.model")
+lazy_import("comfy.ldm.lightricks.vae.causal_video_autoencoder")
+lazy_import("comfy.ldm.cosmos.vae")
+lazy_import("comfy.ldm.wan.vae")
+lazy_import("comfy.ldm.hunyuan3d.vae")
+lazy_import("comfy.ldm.ace.vae.music_dcae_pipeline")
 import yaml
 import math
 
@@ -28,22 +30,22 @@ from . import model_detection
 
 from . import sd1_clip
 from . import sdxl_clip
-import comfy.text_encoders.sd2_clip
-import comfy.text_encoders.sd3_clip
-import comfy.text_encoders.sa_t5
-import comfy.text_encoders.aura_t5
-import comfy.text_encoders.pixart_t5
-import comfy.text_encoders.hydit
-import comfy.text_encoders.flux
-import comfy.text_encoders.long_clipl
-import comfy.text_encoders.genmo
-import comfy.text_encoders.lt
-import comfy.text_encoders.hunyuan_video
-import comfy.text_encoders.cosmos
-import comfy.text_encoders.lumina2
-import comfy.text_encoders.wan
-import comfy.text_encoders.hidream
-import comfy.text_encoders.ace
+lazy_import("comfy.text_encoders.sd2_clip")
+lazy_import("comfy.text_encoders.sd3_clip")
+lazy_import("comfy.text_encoders.sa_t5")
+lazy_import("comfy.text_encoders.aura_t5")
+lazy_import("comfy.text_encoders.pixart_t5")
+lazy_import("comfy.text_encoders.hydit")
+lazy_import("comfy.text_encoders.flux")
+lazy_import("comfy.text_encoders.long_clipl")
+lazy_import("comfy.text_encoders.genmo")
+lazy_import("comfy.text_encoders.lt")
+lazy_import("comfy.text_encoders.hunyuan_video")
+lazy_import("comfy.text_encoders.cosmos")
+lazy_import("comfy.text_encoders.lumina2")
+lazy_import("comfy.text_encoders.wan")
+lazy_import("comfy.text_encoders.hidream")
+lazy_import("comfy.text_encoders.ace")
 
 import comfy.model_patcher
 import comfy.lora
@@ -52,7 +54,7 @@ import comfy.hooks
 import comfy.t2i_adapter.adapter
 import comfy.taesd.taesd
 
-import comfy.ldm.flux.redux
+lazy_import("comfy.ldm.flux.redux")
 
 def load_lora_for_models(model, clip, lora, strength_model, strength_clip):
     key_map = {}
@@ -297,7 +299,7 @@ class VAE:
                 self.latent_channels = sd["taesd_decoder.1.weight"].shape[1]
                 self.first_stage_model = comfy.taesd.taesd.TAESD(latent_channels=self.latent_channels)
             elif "vquantizer.codebook.weight" in sd: #VQGan: stage a of stable cascade
-                self.first_stage_model = StageA()
+                self.first_stage_model = comfy.ldm.cascade.stage_a.StageA()
                 self.downscale_ratio = 4
                 self.upscale_ratio = 4
                 #TODO
@@ -306,7 +308,7 @@ class VAE:
                 self.process_input = lambda image: image
                 self.process_output = lambda image: image
             elif "backbone.1.0.block.0.1.num_batches_tracked" in sd: #effnet: encoder for stage c latent of stable cascade
-                self.first_stage_model = StageC_coder()
+                self.first_stage_model = comfy.ldm.cascade.stage_c_coder.StageC_coder()
                 self.downscale_ratio = 32
                 self.latent_channels = 16
                 new_sd = {}
@@ -314,14 +316,14 @@ class VAE:
                     new_sd["encoder.{}".format(k)] = sd[k]
                 sd = new_sd
             elif "blocks.11.num_batches_tracked" in sd: #previewer: decoder for stage c latent of stable cascade
-                self.first_stage_model = StageC_coder()
+                self.first_stage_model = comfy.ldm.cascade.stage_c_coder.StageC_coder()
                 self.latent_channels = 16
                 new_sd = {}
                 for k in sd:
                     new_sd["previewer.{}".format(k)] = sd[k]
                 sd = new_sd
             elif "encoder.backbone.1.0.block.0.1.num_batches_tracked" in sd: #combined effnet and previewer for stable cascade
-                self.first_stage_model = StageC_coder()
+                self.first_stage_model = comfy.ldm.cascade.stage_c_coder.StageC_coder()
                 self.downscale_ratio = 32
                 self.latent_channels = 16
             elif "decoder.conv_in.weight" in sd:
@@ -341,7 +343,7 @@ class VAE:
                                                                 encoder_config={'target': "comfy.ldm.modules.diffusionmodules.model.Encoder", 'params': ddconfig},
                                                                 decoder_config={'target': "comfy.ldm.modules.diffusionmodules.model.Decoder", 'params': ddconfig})
             elif "decoder.layers.1.layers.0.beta" in sd:
-                self.first_stage_model = AudioOobleckVAE()
+                self.first_stage_model = comfy.ldm.audio.autoencoder.AudioOobleckVAE()
                 self.memory_used_encode = lambda shape, dtype: (1000 * shape[2]) * model_management.dtype_size(dtype)
                 self.memory_used_decode = lambda shape, dtype: (1000 * shape[2] * 2048) * model_management.dtype_size(dtype)
                 self.latent_channels = 64
@@ -497,6 +499,13 @@ class VAE:
                 pixels = pixels.narrow(d + 1, x_offset, x)
         return pixels
 
+    def tile_batch_size(self, memory_used_fn):
+        def batch_size(tile_shape):
+            memory_used = memory_used_fn(tile_shape, self.vae_dtype)
+            free_memory = model_management.get_free_memory(self.device)
+            return max(1, int(free_memory * 0.5 / max(1, memory_used)))
+        return batch_size
+
     def decode_tiled_(self, samples, tile_x=64, tile_y=64, overlap = 16):
         steps = samples.shape[0] * comfy.utils.get_tiled_scale_steps(samples.shape[3], samples.shape[2], tile_x, tile_y, overlap)
         steps += samples.shape[0] * comfy.utils.get_tiled_scale_steps(samples.shape[3], samples.shape[2], tile_x // 2, tile_y * 2, overlap)
@@ -504,10 +513,11 @@ class VAE:
         pbar = comfy.utils.ProgressBar(steps)
 
         decode_fn = lambda a: self.first_stage_model.decode(a.to(self.vae_dtype).to(self.device)).float()
+        tile_batch_size = self.tile_batch_size(self.memory_used_decode)
         output = self.process_output(
-            (comfy.utils.tiled_scale(samples, decode_fn, tile_x // 2, tile_y * 2, overlap, upscale_amount = self.upscale_ratio, output_device=self.output_device, pbar = pbar) +
-            comfy.utils.tiled_scale(samples, decode_fn, tile_x * 2, tile_y // 2, overlap, upscale_amount = self.upscale_ratio, output_device=self.output_device, pbar = pbar) +
-             comfy.utils.tiled_scale(samples, decode_fn, tile_x, tile_y, overlap, upscale_amount = self.upscale_ratio, output_device=self.output_device, pbar = pbar))
+            (comfy.utils.tiled_scale(samples, decode_fn, tile_x // 2, tile_y * 2, overlap, upscale_amount = self.upscale_ratio, output_device=self.output_device, pbar = pbar, tile_batch_size=tile_batch_size) +
+            comfy.utils.tiled_scale(samples, decode_fn, tile_x * 2, tile_y // 2, overlap, upscale_amount = self.upscale_ratio, output_device=self.output_device, pbar = pbar, tile_batch_size=tile_batch_size) +
+             comfy.utils.tiled_scale(samples, decode_fn, tile_x, tile_y, overlap, upscale_amount = self.upscale_ratio, output_device=self.output_device, pbar = pbar, tile_batch_size=tile_batch_size))
             / 3.0)
         return output
 
@@ -523,7 +533,7 @@ class VAE:
 
     def decode_tiled_3d(self, samples, tile_t=999, tile_x=32, tile_y=32, overlap=(1, 8, 8)):
         decode_fn = lambda a: self.first_stage_model.decode(a.to(self.vae_dtype).to(self.device)).float()
-        return self.process_output(comfy.utils.tiled_scale_multidim(samples, decode_fn, tile=(tile_t, tile_x, tile_y), overlap=overlap, upscale_amount=self.upscale_ratio, out_channels=self.output_channels, index_formulas=self.upscale_index_formula, output_device=self.output_device))
+        return self.process_output(comfy.utils.tiled_scale_multidim(samples, decode_fn, tile=(tile_t, tile_x, tile_y), overlap=overlap, upscale_amount=self.upscale_ratio, out_channels=self.output_channels, index_formulas=self.upscale_index_formula, output_device=self.output_device, tile_batch_size=self.tile_batch_size(self.memory_used_decode)))
 
     def encode_tiled_(self, pixel_samples, tile_x=512, tile_y=512, overlap = 64):
         steps = pixel_samples.shape[0] * comfy.utils.get_tiled_scale_steps(pixel_samples.shape[3], pixel_samples.shape[2], tile_x, tile_y, overlap)
@@ -532,9 +542,10 @@ class VAE:
         pbar = comfy.utils.ProgressBar(steps)
 
         encode_fn = lambda a: self.first_stage_model.encode((self.process_input(a)).to(self.vae_dtype).to(self.device)).float()
-        samples = comfy.utils.tiled_scale(pixel_samples, encode_fn, tile_x, tile_y, overlap, upscale_amount = (1/self.downscale_ratio), out_channels=self.latent_channels, output_device=self.output_device, pbar=pbar)
-        samples += comfy.utils.tiled_scale(pixel_samples, encode_fn, tile_x * 2, tile_y // 2, overlap, upscale_amount = (1/self.downscale_ratio), out_channels=self.latent_channels, output_device=self.output_device, pbar=pbar)
-        samples += comfy.utils.tiled_scale(pixel_samples, encode_fn, tile_x // 2, tile_y * 2, overlap, upscale_amount = (1/self.downscale_ratio), out_channels=self.latent_channels, output_device=self.output_device, pbar=pbar)
+        tile_batch_size = self.tile_batch_size(self.memory_used_encode)
+        samples = comfy.utils.tiled_scale(pixel_samples, encode_fn, tile_x, tile_y, overlap, upscale_amount = (1/self.downscale_ratio), out_channels=self.latent_channels, output_device=self.output_device, pbar=pbar, tile_batch_size=tile_batch_size)
+        samples += comfy.utils.tiled_scale(pixel_samples, encode_fn, tile_x * 2, tile_y // 2, overlap, upscale_amount = (1/self.downscale_ratio), out_channels=self.latent_channels, output_device=self.output_device, pbar=pbar, tile_batch_size=tile_batch_size)
+        samples += comfy.utils.tiled_scale(pixel_samples, encode_fn, tile_x // 2, tile_y * 2, overlap, upscale_amount = (1/self.downscale_ratio), out_channels=self.latent_channels, output_device=self.output_device, pbar=pbar, tile_batch_size=tile_batch_size)
         samples /= 3.0
         return samples
 
@@ -559,7 +570,7 @@ class VAE:
 
     def encode_tiled_3d(self, samples, tile_t=9999, tile_x=512, tile_y=512, overlap=(1, 64, 64)):
         encode_fn = lambda a: self.first_stage_model.encode((self.process_input(a)).to(self.vae_dtype).to(self.device)).float()
-        return comfy.utils.tiled_scale_multidim(samples, encode_fn, tile=(tile_t, tile_x, tile_y), overlap=overlap, upscale_amount=self.downscale_ratio, out_channels=self.latent_channels, downscale=True, index_formulas=self.downscale_index_formula, output_device=self.output_device)
+        return comfy.utils.tiled_scale_multidim(samples, encode_fn, tile=(tile_t, tile_x, tile_y), overlap=overlap, upscale_amount=self.downscale_ratio, out_channels=self.latent_channels, downscale=True, index_formulas=self.downscale_index_formula, output_device=self.output_device, tile_batch_size=self.tile_batch_size(self.memory_used_encode))
 
     def decode(self, samples_in, vae_options={}):
         self.throw_exception_if_invalid()
@@ -621,6 +632,85 @@ class VAE:
             output = self.decode_tiled_3d(samples, **args)
         return output.movedim(1, -1)
 
+    def decode_temporal_chunks(self, samples_in, tile_t=16, overlap_t=2, uint8=False):
+        """
+        Generator that decodes a video latent in overlapping temporal windows and yields the frames ([frames, H, W, C])
+        as soon as no later window overlaps them, so the memory used is bounded by the window size instead of the
+        length of the video. The windows are blended like decode_tiled_3d blends its temporal tiles.
+        Image latents are decoded tile_t images at a time. With uint8 the frames are converted on the VAE device.
+        """
+        self.throw_exception_if_invalid()
+
+        def output(pixels):
+            if uint8:
+                pixels = (pixels * 255).clamp(0, 255).byte()
+            return pixels.to(self.output_device)
+
+        if samples_in.ndim != 5:
+            for x in range(0, samples_in.shape[0], tile_t):
+                yield output(self.decode(samples_in[x:x + tile_t]))
+            return
+
+        tile_t = max(2, tile_t)
+        overlap_t = max(1, min(tile_t // 2, overlap_t))
+        scale_t = self.upscale_ratio[0]
+        index_t = self.upscale_index_formula[0]
+        decode_fn = lambda a: self.first_stage_model.decode(a.to(self.vae_dtype).to(self.device)).float()
+
+        def decode_window(s):
+            try:
+                return decode_fn(s)
+            except model_management.OOM_EXCEPTION:
+                logging.warning("Warning: Ran out of memory when decoding a video chunk, retrying with tiled VAE decoding.")
+                tile = 256 // self.spacial_compression_decode()
+                return comfy.utils.tiled_scale_multidim(s, decode_fn, tile=(s.shape[2], tile, tile), overlap=(1, tile // 4, tile // 4), upscale_amount=self.upscale_ratio,
+                                                        out_channels=self.output_channels, index_formulas=self.upscale_index_formula, output_device=self.device)
+
+        window_shape = list(samples_in.shape)
+        window_shape[0] = 1
+        window_shape[2] = min(tile_t, window_shape[2])
+        model_management.load_models_gpu([self.patcher], memory_required=self.memory_used_decode(window_shape, self.vae_dtype), force_full_load=self.disable_offload)
+        feather = round(scale_t(overlap_t))
+
+        for b in range(samples_in.shape[0]):
+            s = samples_in[b:b + 1]
+            frames = s.shape[2]
+            if frames > tile_t:
+                positions = [max(0, min(frames - overlap_t, p)) for p in range(0, frames - overlap_t, tile_t - overlap_t)]
+            else:
+                positions = [0]
+
+            pixels = None
+            weight = None
+            pixels_start = 0
+            for i, pos in enumerate(positions):
+                out = decode_window(s[:, :, pos:pos + min(tile_t, frames - pos)])
+                mask = comfy.utils.get_feather_mask([out.shape[2]], [feather], device=out.device, dtype=out.dtype).reshape(1, 1, -1, 1, 1)
+                start = round(index_t * pos)
+                if pixels is None:
+                    pixels = out * mask
+                    weight = mask
+                    pixels_start = start
+                else:
+                    grow = start + out.shape[2] - (pixels_start + pixels.shape[2])
+                    if grow > 0:
+                        pixels = torch.cat((pixels, pixels.new_zeros(pixels.shape[:2] + (grow,) + pixels.shape[3:])), dim=2)
+                        weight = torch.cat((weight, weight.new_zeros(weight.shape[:2] + (grow,) + weight.shape[3:])), dim=2)
+                    o = start - pixels_start
+                    pixels[:, :, o:o + out.shape[2]] += out * mask
+                    weight[:, :, o:o + out.shape[2]] += mask
+                del out
+
+                if i + 1 < len(positions):
+                    done = round(index_t * positions[i + 1]) - pixels_start
+                else:
+                    done = pixels.shape[2]
+                if done > 0:
+                    yield output(self.process_output(pixels[:, :, :done] / weight[:, :, :done]).movedim(1, -1)[0])
+                    pixels = pixels[:, :, done:]
+                    weight = weight[:, :, done:]
+                    pixels_start += done
+
     def encode(self, pixel_samples):
         self.throw_exception_if_invalid()
         pixel_samples = self.vae_encode_crop_pixels(pixel_samples)
@@ -4,20 +4,22 @@ from . import utils
 
 from . import sd1_clip
 from . import sdxl_clip
-import comfy.text_encoders.sd2_clip
-import comfy.text_encoders.sd3_clip
-import comfy.text_encoders.sa_t5
-import comfy.text_encoders.aura_t5
-import comfy.text_encoders.pixart_t5
-import comfy.text_encoders.hydit
-import comfy.text_encoders.flux
-import comfy.text_encoders.genmo
-import comfy.text_encoders.lt
-import comfy.text_encoders.hunyuan_video
-import comfy.text_encoders.cosmos
-import comfy.text_encoders.lumina2
-import comfy.text_encoders.wan
-import comfy.text_encoders.ace
+from comfy.lazy_import import lazy_import
+# the text encoders are only imported when a model using them is loaded
+lazy_import("comfy.text_encoders.sd2_clip")
+lazy_import("comfy.text_encoders.sd3_clip")
+lazy_import("comfy.text_encoders.sa_t5")
+lazy_import("comfy.text_encoders.aura_t5")
+lazy_import("comfy.text_encoders.pixart_t5")
+lazy_import("comfy.text_encoders.hydit")
+lazy_import("comfy.text_encoders.flux")
+lazy_import("comfy.text_encoders.genmo")
+lazy_import("comfy.text_encoders.lt")
+lazy_import("comfy.text_encoders.hunyuan_video")
+lazy_import("comfy.text_encoders.cosmos")
+lazy_import("comfy.text_encoders.lumina2")
+lazy_import("comfy.text_encoders.wan")
+lazy_import("comfy.text_encoders.ace")
 
 from . import supported_models_base
 from . import latent_formats
@@ -872,8 +872,29 @@ def get_tiled_scale_steps(width, height, tile_x, tile_y, overlap):
     cols = 1 if width <= tile_x else math.ceil((width - overlap) / (tile_x - overlap))
     return rows * cols
 
+def get_feather_mask(shape, feathers, device=None, dtype=None):
+    """Blending mask for a tile of the given spatial shape that fades linearly over feathers[d] elements at each border."""
+    mask = torch.ones([1, 1] + list(shape), device=device, dtype=dtype)
+    for d in range(len(shape)):
+        feather = feathers[d]
+        if feather >= shape[d]:
+            continue
+        a = torch.arange(1, feather + 1, device=device, dtype=dtype) / feather
+        ramp = torch.ones([shape[d]], device=device, dtype=dtype)
+        ramp[:feather] *= a
+        ramp[shape[d] - feather:] *= a.flip(0)
+        view = [1] * (len(shape) + 2)
+        view[d + 2] = shape[d]
+        mask = mask * ramp.view(view)
+    return mask
+
 @torch.inference_mode()
-def tiled_scale_multidim(samples, function, tile=(64, 64), overlap=8, upscale_amount=4, out_channels=3, output_device="cpu", downscale=False, index_formulas=None, pbar=None):
+def tiled_scale_multidim(samples, function, tile=(64, 64), overlap=8, upscale_amount=4, out_channels=3, output_device="cpu", downscale=False, index_formulas=None, pbar=None, tile_batch_size=1):
+    """
+    Runs function on overlapping tiles of samples and blends the results together.
+    tile_batch_size is the number of equally shaped tiles passed to function in the same call, it can be a
+    function that gets the shape of a single input tile and returns the batch size (for example based on free memory).
+    """
     dims = len(tile)
 
     if not (isinstance(upscale_amount, (tuple, list))):
@@ -930,6 +951,7 @@ def tiled_scale_multidim(samples, function, tile=(64, 64), overlap=8, upscale_am
         return out
 
     output = torch.empty([samples.shape[0], out_channels] + mult_list_upscale(samples.shape[2:]), device=output_device)
+    feather_masks = {}
 
     for b in range(samples.shape[0]):
         s = samples[b:b+1]
@@ -946,45 +968,60 @@ def tiled_scale_multidim(samples, function, tile=(64, 64), overlap=8, upscale_am
 
         positions = [range(0, s.shape[d+2] - overlap[d], tile[d] - overlap[d]) if s.shape[d+2] > tile[d] else [0] for d in range(dims)]
 
+        # group the tiles by input shape so they can be batched, a batch size of 1 keeps the original tile order
+        groups = {}
         for it in itertools.product(*positions):
-            s_in = s
-            upscaled = []
-
+            tile_pos = []
+            tile_shape = []
             for d in range(dims):
                 pos = max(0, min(s.shape[d + 2] - overlap[d], it[d]))
-                l = min(tile[d], s.shape[d + 2] - pos)
-                s_in = s_in.narrow(d + 2, pos, l)
-                upscaled.append(round(get_pos(d, pos)))
-
-            ps = function(s_in).to(output_device)
-            mask = torch.ones_like(ps)
-
-            for d in range(2, dims + 2):
-                feather = round(get_scale(d - 2, overlap[d - 2]))
-                if feather >= mask.shape[d]:
-                    continue
-                for t in range(feather):
-                    a = (t + 1) / feather
-                    mask.narrow(d, t, 1).mul_(a)
-                    mask.narrow(d, mask.shape[d] - 1 - t, 1).mul_(a)
-
-            o = out
-            o_d = out_div
-            for d in range(dims):
-                o = o.narrow(d + 2, upscaled[d], mask.shape[d + 2])
-                o_d = o_d.narrow(d + 2, upscaled[d], mask.shape[d + 2])
-
-            o.add_(ps * mask)
-            o_d.add_(mask)
-
-            if pbar is not None:
-                pbar.update(1)
+                tile_pos.append(pos)
+                tile_shape.append(min(tile[d], s.shape[d + 2] - pos))
+            key = tuple(tile_shape) if callable(tile_batch_size) or tile_batch_size > 1 else len(groups)
+            groups.setdefault(key, []).append(tile_pos)
+
+        for tiles in groups.values():
+            batch_size = tile_batch_size
+            if callable(tile_batch_size):
+                tile_shape = [min(tile[d], s.shape[d + 2] - tiles[0][d]) for d in range(dims)]
+                batch_size = tile_batch_size(list(s.shape[:2]) + tile_shape)
+            batch_size = max(1, batch_size)
+
+            for i in range(0, len(tiles), batch_size):
+                batch = tiles[i:i + batch_size]
+                s_in = []
+                for tile_pos in batch:
+                    t_in = s
+                    for d in range(dims):
+                        t_in = t_in.narrow(d + 2, tile_pos[d], min(tile[d], s.shape[d + 2] - tile_pos[d]))
+                    s_in.append(t_in)
+
+                ps = function(torch.cat(s_in) if len(s_in) > 1 else s_in[0]).to(output_device)
+                mask_key = tuple(ps.shape[2:])
+                mask = feather_masks.get(mask_key, None)
+                if mask is None:
+                    mask = get_feather_mask(ps.shape[2:], [round(get_scale(d, overlap[d])) for d in range(dims)], device=ps.device, dtype=ps.dtype)
+                    feather_masks[mask_key] = mask
+
+                for j, tile_pos in enumerate(batch):
+                    o = out
+                    o_d = out_div
+                    for d in range(dims):
+                        upscaled = round(get_pos(d, tile_pos[d]))
+                        o = o.narrow(d + 2, upscaled, mask.shape[d + 2])
+                        o_d = o_d.narrow(d + 2, upscaled, mask.shape[d + 2])
+
+                    o.add_(ps[j:j + 1] * mask)
+                    o_d.add_(mask)
+
+                    if pbar is not None:
+                        pbar.update(1)
 
         output[b:b+1] = out/out_div
     return output
 
-def tiled_scale(samples, function, tile_x=64, tile_y=64, overlap = 8, upscale_amount = 4, out_channels = 3, output_device="cpu", pbar = None):
-    return tiled_scale_multidim(samples, function, (tile_y, tile_x), overlap=overlap, upscale_amount=upscale_amount, out_channels=out_channels, output_device=output_device, pbar=pbar)
+def tiled_scale(samples, function, tile_x=64, tile_y=64, overlap = 8, upscale_amount = 4, out_channels = 3, output_device="cpu", pbar = None, tile_batch_size=1):
+    return tiled_scale_multidim(samples, function, (tile_y, tile_x), overlap=overlap, upscale_amount=upscale_amount, out_channels=out_channels, output_device=output_device, pbar=pbar, tile_batch_size=tile_batch_size)
 
 PROGRESS_BAR_ENABLED = True
 def set_progress_bar_enabled(enabled):
@@ -2,7 +2,7 @@ from __future__ import annotations
 from av.container import InputContainer
 from av.subtitles.stream import SubtitleStream
 from fractions import Fraction
-from typing import Optional
+from typing import Callable, Iterable, Optional
 from comfy_api.input import AudioInput
 import av
 import io
@@ -243,61 +243,123 @@ class VideoFromComponents(VideoInput):
             raise ValueError("Only MP4 format is supported for now")
         if codec != VideoCodec.AUTO and codec != VideoCodec.H264:
             raise ValueError("Only H264 codec is supported for now")
-        with av.open(path, mode='w', options={'movflags': 'use_metadata_tags'}) as output:
-            # Add metadata before writing any streams
-            if metadata is not None:
-                for key, value in metadata.items():
-                    output.metadata[key] = json.dumps(value)
-
-            frame_rate = Fraction(round(self.__components.frame_rate * 1000), 1000)
-            # Create a video stream
-            video_stream = output.add_stream('h264', rate=frame_rate)
-            video_stream.width = self.__components.images.shape[2]
-            video_stream.height = self.__components.images.shape[1]
-            video_stream.pix_fmt = 'yuv420p'
-
-            # Create an audio stream
-            audio_sample_rate = 1
-            audio_stream: Optional[av.AudioStream] = None
-            if self.__components.audio:
-                audio_sample_rate = int(self.__components.audio['sample_rate'])
-                audio_stream = output.add_stream('aac', rate=audio_sample_rate)
-                audio_stream.sample_rate = audio_sample_rate
-                audio_stream.format = 'fltp'
-
-            # Encode video
-            for i, frame in enumerate(self.__components.images):
-                img = (frame * 255).clamp(0, 255).byte().cpu().numpy() # shape: (H, W, 3)
-                frame = av.VideoFrame.from_ndarray(img, format='rgb24')
-                frame = frame.reformat(format='yuv420p')  # Convert to YUV420P as required by h264
-                packet = video_stream.encode(frame)
-                output.mux(packet)
+        write_video(path, [self.__components.images], self.__components.images.shape[2], self.__components.images.shape[1],
+                    self.__components.frame_rate, audio=self.__components.audio, metadata=metadata)
+
+
+class VideoFromFrameChunks(VideoInput):
+    """
+    Class representing a video that is produced in chunks of frames, for example decoded from a latent while it is
+    being encoded. The chunks are only all kept in memory when the components are requested.
+    """
 
-            # Flush video
-            packet = video_stream.encode(None)
-            output.mux(packet)
-
-            if audio_stream and self.__components.audio:
-                # Encode audio
-                samples_per_frame = int(audio_sample_rate / frame_rate)
-                num_frames = self.__components.audio['waveform'].shape[2] // samples_per_frame
-                for i in range(num_frames):
-                    start = i * samples_per_frame
-                    end = start + samples_per_frame
-                    # TODO(Feature) - Add support for stereo audio
-                    chunk = (
-                        self.__components.audio["waveform"][0, 0, start:end]
-                        .unsqueeze(0)
-                        .contiguous()
-                        .numpy()
-                    )
-                    audio_frame = av.AudioFrame.from_ndarray(chunk, format='fltp', layout='mono')
-                    audio_frame.sample_rate = audio_sample_rate
-                    audio_frame.pts = i * samples_per_frame
-                    for packet in audio_stream.encode(audio_frame):
-                        output.mux(packet)
-
-                # Flush audio
-                for packet in audio_stream.encode(None):
+    def __init__(self, get_chunks: Callable[[], Iterable[torch.Tensor]], width: int, height: int, frame_rate: Fraction,
+                 audio: Optional[AudioInput] = None, frame_count: Optional[int] = None):
+        """
+        get_chunks returns a new iterable of [frames, H, W, 3] float (0-1) or uint8 tensors every time it is called.
+        """
+        self.__get_chunks = get_chunks
+        self.__width = width
+        self.__height = height
+        self.__frame_rate = frame_rate
+        self.__audio = audio
+        self.__frame_count = frame_count
+
+    def get_components(self) -> VideoComponents:
+        chunks = []
+        for chunk in self.__get_chunks():
+            if chunk.dtype == torch.uint8:
+                chunk = chunk.float() / 255.0
+            chunks.append(chunk.cpu())
+        images = torch.cat(chunks) if len(chunks) > 0 else torch.zeros(0, self.__height, self.__width, 3)
+        return VideoComponents(images=images, audio=self.__audio, frame_rate=self.__frame_rate)
+
+    def get_dimensions(self) -> tuple[int, int]:
+        return self.__width, self.__height
+
+    def get_duration(self) -> float:
+        if self.__frame_count is not None:
+            return float(self.__frame_count / self.__frame_rate)
+        return super().get_duration()
+
+    def save_to(
+        self,
+        path: str,
+        format: VideoContainer = VideoContainer.AUTO,
+        codec: VideoCodec = VideoCodec.AUTO,
+        metadata: Optional[dict] = None
+    ):
+        if format != VideoContainer.AUTO and format != VideoContainer.MP4:
+            raise ValueError("Only MP4 format is supported for now")
+        if codec != VideoCodec.AUTO and codec != VideoCodec.H264:
+            raise ValueError("Only H264 codec is supported for now")
+        write_video(path, self.__get_chunks(), self.__width, self.__height, self.__frame_rate, audio=self.__audio, metadata=metadata)
+
+
+def write_video(path: str, chunks: Iterable[torch.Tensor], width: int, height: int, frame_rate: Fraction,
+                audio: Optional[AudioInput] = None, metadata: Optional[dict] = None, frames_per_conversion: int = 16):
+    """
+    Encodes chunks of [frames, H, W, 3] float (0-1) or uint8 tensors to an h264 mp4 file as they are produced.
+    Float frames are converted to uint8 on their device frames_per_conversion at a time before being copied to the cpu.
+    """
+    with av.open(path, mode='w', options={'movflags': 'use_metadata_tags'}) as output:
+        # Add metadata before writing any streams
+        if metadata is not None:
+            for key, value in metadata.items():
+                output.metadata[key] = json.dumps(value)
+
+        frame_rate = Fraction(round(frame_rate * 1000), 1000)
+        # Create a video stream
+        video_stream = output.add_stream('h264', rate=frame_rate)
+        video_stream.width = width
+        video_stream.height = height
+        video_stream.pix_fmt = 'yuv420p'
+
+        # Create an audio stream
+        audio_sample_rate = 1
+        audio_stream: Optional[av.AudioStream] = None
+        if audio:
+            audio_sample_rate = int(audio['sample_rate'])
+            audio_stream = output.add_stream('aac', rate=audio_sample_rate)
+            audio_stream.sample_rate = audio_sample_rate
+            audio_stream.format = 'fltp'
+
+        # Encode video
+        for chunk in chunks:
+            for i in range(0, chunk.shape[0], frames_per_conversion):
+                images = chunk[i:i + frames_per_conversion, :, :, :3]
+                if images.dtype != torch.uint8:
+                    images = (images * 255).clamp(0, 255).byte()
+                for img in images.cpu().numpy(): # shape: (H, W, 3)
+                    frame = av.VideoFrame.from_ndarray(img, format='rgb24')
+                    frame = frame.reformat(format='yuv420p')  # Convert to YUV420P as required by h264
+                    packet = video_stream.encode(frame)
                     output.mux(packet)
 
+        # Flush video
+        packet = video_stream.encode(None)
+        output.mux(packet)
+
+        if audio_stream and audio:
+            # Encode audio
+            samples_per_frame = int(audio_sample_rate / frame_rate)
+            num_frames = audio['waveform'].shape[2] // samples_per_frame
+            for i in range(num_frames):
+                start = i * samples_per_frame
+                end = start + samples_per_frame
+                # TODO(Feature) - Add support for stereo audio
+                chunk = (
+                    audio["waveform"][0, 0, start:end]
+                    .unsqueeze(0)
+                    .contiguous()
+                    .numpy()
+                )
+                audio_frame = av.AudioFrame.from_ndarray(chunk, format='fltp', layout='mono')
+                audio_frame.sample_rate = audio_sample_rate
+                audio_frame.pts = i * samples_per_frame
+                for packet in audio_stream.encode(audio_frame):
+                    output.mux(packet)
+
+            # Flush audio
+            for packet in audio_stream.encode(None):
+                output.mux(packet)
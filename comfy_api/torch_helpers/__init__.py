@@ -1,5 +1,6 @@
-from .torch_compile import set_torch_compile_wrapper
+from .torch_compile import set_torch_compile_wrapper, setup_torch_compile_cache
 
 __all__ = [
     "set_torch_compile_wrapper",
+    "setup_torch_compile_cache",
 ]
@@ -1,4 +1,10 @@
 from __future__ import annotations
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
 import torch
 
 import comfy.utils
@@ -11,22 +17,152 @@ if TYPE_CHECKING:
 
 COMPILE_KEY = "torch.compile"
 TORCH_COMPILE_KWARGS = "torch_compile_kwargs"
+CACHE_INDEX_FILE = "index.json"
 
+_cache_dir: Optional[str] = None
+_cache_lock = threading.Lock()
+_loaded_artifacts: set[str] = set()
 
-def apply_torch_compile_factory(compiled_module_dict: dict[str, Callable]) -> Callable:
+
+def setup_torch_compile_cache(cache_dir: str, warm: bool=True):
+    '''
+    Enable the persistent torch.compile artifact cache in cache_dir.
+
+    The inductor and triton caches should also be pointed inside of it with the TORCHINDUCTOR_CACHE_DIR and
+    TRITON_CACHE_DIR environment variables before torch gets imported. When warm is True the saved artifacts
+    of previously compiled models are loaded now so the first sampling doesn't pay for it.
+    '''
+    global _cache_dir
+    os.makedirs(cache_dir, exist_ok=True)
+    _cache_dir = cache_dir
+    try:
+        import torch._inductor.config
+        torch._inductor.config.fx_graph_cache = True
+        torch._inductor.config.autotune_local_cache = True
+    except Exception as e:
+        logging.warning("torch.compile cache: could not enable the inductor caches: {}".format(e))
+
+    if warm:
+        for key in get_torch_compile_cache_index():
+            load_torch_compile_artifacts(key)
+
+
+def get_torch_compile_cache_index() -> dict[str, dict]:
+    if _cache_dir is None:
+        return {}
+    index_path = os.path.join(_cache_dir, CACHE_INDEX_FILE)
+    if not os.path.isfile(index_path):
+        return {}
+    try:
+        with open(index_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except Exception as e:
+        logging.warning("torch.compile cache: could not read {}: {}".format(index_path, e))
+        return {}
+
+
+def get_torch_compile_cache_key(model: torch.nn.Module, x: torch.Tensor, compile_kwargs: dict) -> tuple[str, dict]:
+    '''
+    Key the compiled artifacts by model config, dtype, input shape, backend options and torch version.
+    '''
+    model_config = getattr(model, "model_config", None)
+    info = {
+        "model": type(model_config).__name__ if model_config is not None else type(model).__name__,
+        "unet_config": getattr(model_config, "unet_config", {}),
+        "dtype": str(model.get_dtype()) if hasattr(model, "get_dtype") else None,
+        "manual_cast_dtype": str(getattr(model, "manual_cast_dtype", None)),
+        "shape": list(x.shape),
+        "input_dtype": str(x.dtype),
+        "device": x.device.type,
+        "compile": compile_kwargs,
+        "torch": torch.__version__,
+    }
+    key = hashlib.sha256(json.dumps(info, sort_keys=True, default=str).encode("utf-8")).hexdigest()[:32]
+    return key, info
+
+
+def load_torch_compile_artifacts(key: str) -> bool:
+    if _cache_dir is None or not hasattr(torch.compiler, "load_cache_artifacts"):
+        return False
+    with _cache_lock:
+        if key in _loaded_artifacts:
+            return True
+        path = os.path.join(_cache_dir, "{}.bin".format(key))
+        if not os.path.isfile(path):
+            return False
+        start = time.perf_counter()
+        try:
+            with open(path, "rb") as f:
+                torch.compiler.load_cache_artifacts(f.read())
+        except Exception as e:
+            logging.warning("torch.compile cache: failed to load {}: {}".format(path, e))
+            return False
+        _loaded_artifacts.add(key)
+    logging.info("torch.compile cache: loaded artifacts {} in {:.2f} seconds".format(key, time.perf_counter() - start))
+    return True
+
+
+def save_torch_compile_artifacts(key: str, info: dict, first_call_time: float):
+    if _cache_dir is None:
+        return
+    with _cache_lock:
+        if hasattr(torch.compiler, "save_cache_artifacts"):
+            try:
+                artifacts = torch.compiler.save_cache_artifacts()
+                if artifacts is not None:
+                    with open(os.path.join(_cache_dir, "{}.bin".format(key)), "wb") as f:
+                        f.write(artifacts[0])
+                    _loaded_artifacts.add(key)
+            except Exception as e:
+                logging.warning("torch.compile cache: failed to save artifacts {}: {}".format(key, e))
+        index = get_torch_compile_cache_index()
+        entry = index.get(key, {"info": info})
+        entry["first_call_time"] = first_call_time
+        entry["last_used"] = time.time()
+        index[key] = entry
+        index_path = os.path.join(_cache_dir, CACHE_INDEX_FILE)
+        try:
+            with open(index_path + ".tmp", "w", encoding="utf-8") as f:
+                json.dump(index, f, indent=2, default=str)
+            os.replace(index_path + ".tmp", index_path)
+        except Exception as e:
+            logging.warning("torch.compile cache: could not write {}: {}".format(index_path, e))
+
+
+def apply_torch_compile_factory(compiled_module_dict: dict[str, Callable], compile_kwargs: Optional[dict]=None) -> Callable:
     '''
     Create a wrapper that will refer to the compiled_diffusion_model.
     '''
+    seen_keys = set()
+
     def apply_torch_compile_wrapper(executor: WrapperExecutor, *args, **kwargs):
+        key = None
+        if _cache_dir is not None and len(args) > 0 and isinstance(args[0], torch.Tensor):
+            key, info = get_torch_compile_cache_key(executor.class_obj, args[0], compile_kwargs)
+            if key in seen_keys:
+                key = None
+            else:
+                seen_keys.add(key)
+                from_cache = load_torch_compile_artifacts(key)
+                start = time.perf_counter()
         try:
             orig_modules = {}
-            for key, value in compiled_module_dict.items():
-                orig_modules[key] = comfy.utils.get_attr(executor.class_obj, key)
-                comfy.utils.set_attr(executor.class_obj, key, value)
-            return executor(*args, **kwargs)
+            for k, value in compiled_module_dict.items():
+                orig_modules[k] = comfy.utils.get_attr(executor.class_obj, k)
+                comfy.utils.set_attr(executor.class_obj, k, value)
+            out = executor(*args, **kwargs)
         finally:
-            for key, value in orig_modules.items():
-                comfy.utils.set_attr(executor.class_obj, key, value)
+            for k, value in orig_modules.items():
+                comfy.utils.set_attr(executor.class_obj, k, value)
+
+        if key is not None:
+            first_call_time = time.perf_counter() - start
+            if from_cache:
+                logging.info("torch.compile: first call with cached artifacts took {:.2f} seconds".format(first_call_time))
+            else:
+                logging.info("torch.compile: compiled in {:.2f} seconds, saving artifacts {}".format(first_call_time, key))
+            save_torch_compile_artifacts(key, info, first_call_time)
+        return out
     return apply_torch_compile_wrapper
 
 
@@ -62,6 +198,7 @@ def set_torch_compile_wrapper(model: ModelPatcher, backend: str, options: Option
     # add torch.compile wrapper
     wrapper_func = apply_torch_compile_factory(
         compiled_module_dict=compiled_modules,
+        compile_kwargs=dict(compile_kwargs, keys=keys),
     )
     # store wrapper to run on BaseModel's apply_model function
     model.add_wrapper_with_key(WrappersMP.APPLY_MODEL, COMPILE_KEY, wrapper_func)
@@ -15,9 +15,11 @@ class NodeNotFoundError(Exception):
     pass
 
 class DynamicPrompt:
-    def __init__(self, original_prompt):
+    def __init__(self, original_prompt, submitted_prompt=None):
         # The original prompt provided by the user
         self.original_prompt = original_prompt
+        # The prompt as submitted when original_prompt is an optimized version of it, what nodes and errors get to see
+        self.submitted_prompt = submitted_prompt if submitted_prompt is not None else original_prompt
         # Any extra pieces of the graph created during execution
         self.ephemeral_prompt = {}
         self.ephemeral_parents = {}
@@ -55,7 +57,7 @@ class DynamicPrompt:
         return set(self.original_prompt.keys()).union(set(self.ephemeral_prompt.keys()))
 
     def get_original_prompt(self):
-        return self.original_prompt
+        return self.submitted_prompt
 
 def get_input_info(
     class_def: Type[ComfyNodeABC],
@@ -0,0 +1,82 @@
+"""
+Optimization of a prompt before it gets executed: nodes no output depends on are removed and nodes computing the same
+thing (same CacheKeySetInputSignature, so the same class, constant inputs, IS_CHANGED result and ancestry) are merged
+into one, the links to the removed copies being redirected to the node that is kept.
+"""
+from __future__ import annotations
+
+from typing import NamedTuple
+
+import nodes
+from comfy_execution.caching import CacheKeySetInputSignature
+from comfy_execution.graph import DynamicPrompt
+from comfy_execution.graph_utils import is_link
+
+
+class GraphOptimization(NamedTuple):
+    prompt: dict
+    # removed node id -> id of the identical node that was kept
+    merged: dict[str, str]
+    # nodes no output depends on
+    removed: list[str]
+
+
+def is_output_node(class_type: str) -> bool:
+    class_def = nodes.NODE_CLASS_MAPPINGS[class_type]
+    return getattr(class_def, "OUTPUT_NODE", False) is True
+
+
+def get_live_nodes(prompt: dict, output_ids) -> set[str]:
+    live = set()
+    to_visit = [node_id for node_id in output_ids if node_id in prompt]
+    while len(to_visit) > 0:
+        node_id = to_visit.pop()
+        if node_id in live:
+            continue
+        live.add(node_id)
+        for value in prompt[node_id]["inputs"].values():
+            if is_link(value) and value[0] in prompt:
+                to_visit.append(value[0])
+    return live
+
+
+def optimize_prompt(prompt: dict, execute_outputs, is_changed_cache) -> GraphOptimization:
+    """
+    Returns the optimized prompt, the original node dicts are left untouched. Output nodes are kept even when they are
+    not in execute_outputs so the cached results of the other branches of the workflow stay in the cache. Output
+    nodes and the nodes in execute_outputs are never merged, NOT_IDEMPOTENT nodes and nodes with a UNIQUE_ID input
+    have their id in their signature so they aren't either.
+    """
+    outputs = set(execute_outputs)
+    outputs.update(node_id for node_id, node in prompt.items() if is_output_node(node["class_type"]))
+    live = get_live_nodes(prompt, outputs)
+    removed = [node_id for node_id in prompt if node_id not in live]
+
+    live_prompt = {node_id: node for node_id, node in prompt.items() if node_id in live}
+    key_set = CacheKeySetInputSignature(DynamicPrompt(live_prompt), [node_id for node_id in live_prompt if node_id not in outputs], is_changed_cache)
+    merged = {}
+    kept = {}
+    for node_id in live_prompt:
+        if node_id in outputs:
+            continue
+        signature = key_set.get_data_key(node_id)
+        if signature in kept:
+            merged[node_id] = kept[signature]
+        else:
+            kept[signature] = node_id
+
+    if len(merged) == 0:
+        if len(removed) == 0:
+            return GraphOptimization(prompt, merged, removed)
+        return GraphOptimization(live_prompt, merged, removed)
+
+    optimized = {}
+    for node_id, node in live_prompt.items():
+        if node_id in merged:
+            continue
+        inputs = node["inputs"]
+        if any(is_link(value) and value[0] in merged for value in inputs.values()):
+            inputs = {key: [merged[value[0]], value[1]] if is_link(value) and value[0] in merged else value for key, value in inputs.items()}
+            node = {**node, "inputs": inputs}
+        optimized[node_id] = node
+    return GraphOptimization(optimized, merged, removed)
@@ -0,0 +1,276 @@
+"""
+Lazy loading of the built-in node modules (--lazy-node-loading).
+
+The /object_info data of the node classes of the comfy_extras and comfy_api_nodes modules is written to the user
+directory together with the mtime and size of each module file. On the next start a module whose file didn't change
+isn't imported: its node classes are only registered by name and the module is imported the first time one of them
+is looked up in NODE_CLASS_MAPPINGS, when a prompt using it is validated or /object_info/{node_class} is requested.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import sys
+import threading
+import uuid
+from collections.abc import KeysView
+from typing import Callable
+
+import folder_paths
+
+REGISTRY_VERSION = 1
+# changes in these folders can change the INPUT_TYPES of the node classes (sampler lists, IO types...)
+CORE_DIRECTORIES = ["comfy", "comfy_api", "comfy_execution"]
+
+
+class NodeClassKeysView(KeysView):
+    """keys() of a NodeClassMappings, including the node classes that aren't loaded yet, without loading them."""
+
+    def __repr__(self):
+        return "{}({!r})".format(type(self).__name__, list(self))
+
+
+class NodeClassMappings(dict):
+    """
+    dict of the node classes (nodes.NODE_CLASS_MAPPINGS) that also knows about node classes whose module hasn't been
+    imported yet. Looking one of them up imports its module, iterating over the items or values imports all of them.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # node class name -> function importing its module
+        self.lazy: dict[str, Callable[[], bool]] = {}
+        self.lock = threading.RLock()
+
+    def add_lazy(self, name: str, load: Callable[[], bool]):
+        if not dict.__contains__(self, name):
+            self.lazy[name] = load
+
+    def is_lazy(self, name: str) -> bool:
+        return name in self.lazy
+
+    def load(self, name: str) -> bool:
+        with self.lock:
+            load = self.lazy.get(name)
+            if load is not None:
+                load()
+                # classes the module didn't define after all, or all of them if it failed to import
+                for n in [n for n, l in self.lazy.items() if l is load]:
+                    del self.lazy[n]
+            return dict.__contains__(self, name)
+
+    def load_all(self):
+        for name in list(self.lazy.keys()):
+            self.load(name)
+
+    def __missing__(self, key):
+        if key in self.lazy and self.load(key):
+            return dict.__getitem__(self, key)
+        raise KeyError(key)
+
+    def __setitem__(self, key, value):
+        self.lazy.pop(key, None)
+        dict.__setitem__(self, key, value)
+
+    def __delitem__(self, key):
+        if self.lazy.pop(key, None) is not None and not dict.__contains__(self, key):
+            return
+        dict.__delitem__(self, key)
+
+    def __contains__(self, key):
+        return dict.__contains__(self, key) or key in self.lazy
+
+    def __iter__(self):
+        # a snapshot, loading a class while iterating moves it from lazy to the dict
+        return iter(list(dict.keys(self)) + list(self.lazy.keys()))
+
+    def __len__(self):
+        return dict.__len__(self) + len(self.lazy)
+
+    def keys(self):
+        return NodeClassKeysView(self)
+
+    def pop(self, key, *default):
+        if key in self.lazy:
+            self.load(key)
+        return dict.pop(self, key, *default)
+
+    def setdefault(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            self[key] = default
+            return default
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def update(self, *args, **kwargs):
+        for key, value in dict(*args, **kwargs).items():
+            self[key] = value
+
+    def items(self):
+        self.load_all()
+        return dict.items(self)
+
+    def values(self):
+        self.load_all()
+        return dict.values(self)
+
+    def copy(self):
+        self.load_all()
+        return dict(dict.items(self))
+
+
+def get_module_key(module_path: str) -> list[int] | None:
+    try:
+        stat = os.stat(module_path)
+    except OSError:
+        return None
+    return [stat.st_mtime_ns, stat.st_size]
+
+
+def get_core_fingerprint() -> str:
+    base = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+    m = hashlib.sha256(sys.version.encode("utf-8"))
+    paths = [os.path.join(base, "nodes.py"), os.path.join(base, "folder_paths.py")]
+    for directory in CORE_DIRECTORIES:
+        for dirpath, subdirs, filenames in os.walk(os.path.join(base, directory)):
+            subdirs.sort()
+            paths.extend(os.path.join(dirpath, f) for f in sorted(filenames) if f.endswith(".py"))
+    for path in paths:
+        m.update("{}:{}".format(path, get_module_key(path)).encode("utf-8"))
+    return m.hexdigest()
+
+
+def get_persistent_fingerprint(kind: str, name: str | None):
+    """Like folder_paths.get_dependency_fingerprint but comparable across restarts."""
+    if kind == "filename_list":
+        try:
+            return hashlib.sha256("\n".join(folder_paths.get_filename_list(name)).encode("utf-8")).hexdigest()
+        except KeyError:
+            return None
+    if kind == "directory":
+        try:
+            return os.stat(name).st_mtime_ns
+        except OSError:
+            return None
+    return None
+
+
+class NodeRegistry:
+    def __init__(self, path: str | None = None):
+        self._path = path
+        # module path -> {"key": module key, "nodes": {node class: {"info", "dependencies", "display_name"}}}
+        self.modules: dict[str, dict] | None = None
+        self.core_fingerprint = None
+        # node classes registered from the registry -> their entry
+        self.nodes: dict[str, dict] = {}
+        # modules imported during this start -> the node classes they defined
+        self.pending: dict[str, list[str]] = {}
+        self.lock = threading.Lock()
+
+    @property
+    def path(self) -> str:
+        if self._path is None:
+            self._path = os.path.join(folder_paths.get_user_directory(), "node_registry_cache.json")
+        return self._path
+
+    def load(self):
+        if self.modules is not None:
+            return
+        self.modules = {}
+        self.core_fingerprint = get_core_fingerprint()
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return
+        except Exception as e:
+            logging.warning("Could not read the node registry cache {}: {}".format(self.path, e))
+            return
+        if data.get("version") == REGISTRY_VERSION and data.get("core") == self.core_fingerprint:
+            self.modules = data.get("modules", {})
+
+    def register_module(self, module_path: str, load: Callable[[], bool], node_class_mappings: NodeClassMappings, display_name_mappings: dict) -> bool:
+        """
+        Registers the node classes of a module that didn't change since it was last imported without importing it.
+        Returns False if the module has to be imported.
+        """
+        with self.lock:
+            self.load()
+            entry = self.modules.get(module_path)
+            if entry is None or entry.get("key") != get_module_key(module_path):
+                return False
+            for name, node in entry["nodes"].items():
+                node_class_mappings.add_lazy(name, load)
+                if node.get("display_name") is not None:
+                    display_name_mappings.setdefault(name, node["display_name"])
+                self.nodes[name] = node
+            return True
+
+    def imported(self, module_path: str, node_classes: list[str]):
+        with self.lock:
+            self.pending[module_path] = node_classes
+
+    def get_info(self, node_class: str) -> dict | None:
+        """
+        Returns the stored /object_info data of a node class registered without importing its module, None if one of
+        the folders its INPUT_TYPES read changed since then.
+        """
+        node = self.nodes.get(node_class)
+        if node is None:
+            return None
+        for kind, name, fingerprint in node["dependencies"]:
+            if get_persistent_fingerprint(kind, name) != fingerprint:
+                return None
+            folder_paths.record_dependency(kind, name)
+        return node["info"]
+
+    def save(self, get_entry: Callable[[str], tuple[dict | None, list[tuple[str, str | None]]] | None], display_name_mappings: dict):
+        """
+        Stores the node classes of the modules imported during this start. get_entry returns the /object_info data of
+        a node class and the dependencies recorded while building it (see folder_paths.record_dependency), or None.
+        """
+        with self.lock:
+            if len(self.pending) == 0:
+                return
+            self.load()
+            for module_path, node_classes in self.pending.items():
+                nodes = {}
+                for node_class in node_classes:
+                    entry = get_entry(node_class)
+                    if entry is None or entry[0] is None or any(kind == "volatile" for kind, _ in entry[1]):
+                        # INPUT_TYPES can't be cached, the module gets imported at startup
+                        nodes = None
+                        break
+                    nodes[node_class] = {"info": entry[0],
+                                         "dependencies": [[kind, name, get_persistent_fingerprint(kind, name)] for kind, name in sorted(entry[1], key=str)],
+                                         "display_name": display_name_mappings.get(node_class, None),
+                                         }
+                if nodes is None:
+                    self.modules.pop(module_path, None)
+                else:
+                    self.modules[module_path] = {"key": get_module_key(module_path), "nodes": nodes}
+            self.pending.clear()
+
+            data = {"version": REGISTRY_VERSION, "core": self.core_fingerprint, "modules": self.modules}
+            tmp_path = "{}.{}.tmp".format(self.path, uuid.uuid4().hex)
+            try:
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    json.dump(data, f)
+                os.replace(tmp_path, self.path)
+            except Exception as e:
+                logging.warning("Could not write the node registry cache {}: {}".format(self.path, e))
+            finally:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+
+
+node_registry = NodeRegistry()
@@ -0,0 +1,132 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Optional
+
+
+class OutputWriter:
+    """
+    Writes output files on a pool of background threads so the execution thread can move on to the next node.
+
+    The number of writes that are queued or running is bounded by max_pending: submit blocks when it is reached so
+    the memory held by the pending images can't grow without limit. The target file is created when the write is
+    submitted so the save path counters already see it, readers of a pending file can wait for it with wait().
+    """
+
+    def __init__(self, workers: int, max_pending: Optional[int] = None):
+        self.workers = workers
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="output_writer") if workers > 0 else None
+        if max_pending is None:
+            max_pending = workers * 4
+        self.slots = threading.BoundedSemaphore(max(1, max_pending))
+        self.lock = threading.Lock()
+        self.pending: dict[str, Future] = {}
+        # (path, exception, id of the node that submitted the write)
+        self.errors: list[tuple[str, BaseException, Optional[str]]] = []
+        self.current = threading.local()
+
+    def set_node(self, node_id: Optional[str]):
+        """Sets the node the writes submitted from this thread are attributed to in the errors."""
+        self.current.node_id = node_id
+
+    def submit(self, path: str, write_fn: Callable[[str], None]) -> Future:
+        """Calls write_fn(path) on a worker thread, blocks while max_pending writes are already in flight."""
+        path = os.path.abspath(path)
+        if self.executor is None:
+            future = Future()
+            write_fn(path)
+            future.set_result(path)
+            return future
+
+        self.slots.acquire()
+        future = Future()
+        node_id = getattr(self.current, "node_id", None)
+        created = False
+        try:
+            with open(path, "ab"):
+                pass
+            created = True
+            with self.lock:
+                self.pending[path] = future
+            self.executor.submit(self._write, path, write_fn, future, node_id)
+        except BaseException:
+            with self.lock:
+                if self.pending.get(path) is future:
+                    del self.pending[path]
+            self.slots.release()
+            if created:
+                self.remove(path)
+            raise
+        return future
+
+    def _write(self, path: str, write_fn: Callable[[str], None], future: Future, node_id: Optional[str]):
+        # the error and the pending write are recorded before the future is resolved so flush() can't return before
+        # they are (done callbacks run after the waiters of a future are woken up)
+        try:
+            write_fn(path)
+        except BaseException as e:
+            logging.error("Error writing output file {}: {}".format(path, e))
+            # don't leave the empty or partly written file created by submit behind
+            self.remove(path)
+            self.finish(path, future, (e, node_id))
+            future.set_exception(e)
+        else:
+            self.finish(path, future, None)
+            future.set_result(path)
+
+    def remove(self, path: str):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def finish(self, path: str, future: Future, error: Optional[tuple[BaseException, Optional[str]]]):
+        with self.lock:
+            if self.pending.get(path) is future:
+                del self.pending[path]
+            if error is not None:
+                self.errors.append((path,) + error)
+        self.slots.release()
+
+    def wait(self, path: str) -> Optional[Future]:
+        """Returns the future of the pending write of path, if there is one."""
+        with self.lock:
+            return self.pending.get(os.path.abspath(path))
+
+    async def wait_async(self, path: str):
+        future = self.wait(path)
+        if future is not None:
+            try:
+                await asyncio.wrap_future(future)
+            except Exception:
+                pass
+
+    def flush(self) -> list[tuple[str, BaseException, Optional[str]]]:
+        """Waits for every pending write and returns (and clears) the (path, exception, node id) of the failed writes."""
+        with self.lock:
+            futures = list(self.pending.values())
+        for future in futures:
+            try:
+                future.result()
+            except Exception:
+                pass
+        with self.lock:
+            errors = self.errors
+            self.errors = []
+        return errors
+
+
+_output_writer: Optional[OutputWriter] = None
+_output_writer_lock = threading.Lock()
+
+def get_output_writer() -> OutputWriter:
+    global _output_writer
+    with _output_writer_lock:
+        if _output_writer is None:
+            from comfy.cli_args import args
+            _output_writer = OutputWriter(max(0, args.image_save_workers))
+        return _output_writer
@@ -9,7 +9,6 @@ import os
 import io
 import json
 import random
-import hashlib
 import node_helpers
 from comfy.cli_args import args
 from comfy.comfy_types import FileLocator
@@ -93,7 +92,7 @@ class VAEDecodeAudio:
 def save_audio(self, audio, filename_prefix="ComfyUI", format="flac", prompt=None, extra_pnginfo=None, quality="128k"):
 
     filename_prefix += self.prefix_append
-    full_output_folder, filename, counter, subfolder, filename_prefix = folder_paths.get_save_image_path(filename_prefix, self.output_dir)
+    full_output_folder, filename, counter, subfolder, filename_prefix = folder_paths.get_save_image_path(filename_prefix, self.output_dir, count=audio["waveform"].shape[0])
     results: list[FileLocator] = []
 
     # Prepare metadata dictionary
@@ -198,6 +197,7 @@ def save_audio(self, audio, filename_prefix="ComfyUI", format="flac", prompt=Non
             "subfolder": subfolder,
             "type": self.type
         })
+        folder_paths.update_save_image_counter(full_output_folder, filename, counter)
         counter += 1
 
     return { "ui": { "audio": results } }
@@ -310,10 +310,7 @@ class LoadAudio:
     @classmethod
     def IS_CHANGED(s, audio):
         image_path = folder_paths.get_annotated_filepath(audio)
-        m = hashlib.sha256()
-        with open(image_path, 'rb') as f:
-            m.update(f.read())
-        return m.digest().hex()
+        return folder_paths.get_file_hash(image_path)
 
     @classmethod
     def VALIDATE_INPUTS(s, audio):
@@ -126,7 +126,10 @@ class SaveAnimatedWEBP:
     def save_images(self, images, fps, filename_prefix, lossless, quality, method, num_frames=0, prompt=None, extra_pnginfo=None):
         method = self.methods.get(method)
         filename_prefix += self.prefix_append
-        full_output_folder, filename, counter, subfolder, filename_prefix = folder_paths.get_save_image_path(filename_prefix, self.output_dir, images[0].shape[1], images[0].shape[0])
+        if num_frames == 0:
+            num_frames = len(images)
+        file_count = (len(images) + num_frames - 1) // num_frames
+        full_output_folder, filename, counter, subfolder, filename_prefix = folder_paths.get_save_image_path(filename_prefix, self.output_dir, images[0].shape[1], images[0].shape[0], file_count)
         results: list[FileLocator] = []
         pil_images = []
         for image in images:
@@ -144,9 +147,6 @@ class SaveAnimatedWEBP:
                     metadata[inital_exif] = "{}:{}".format(x, json.dumps(extra_pnginfo[x]))
                     inital_exif -= 1
 
-        if num_frames == 0:
-            num_frames = len(pil_images)
-
         c = len(pil_images)
         for i in range(0, c, num_frames):
             file = f"{filename}_{counter:05}_.webp"
@@ -156,6 +156,7 @@ class SaveAnimatedWEBP:
                 "subfolder": subfolder,
                 "type": self.type
             })
+            folder_paths.update_save_image_counter(full_output_folder, filename, counter)
             counter += 1
 
         animated = num_frames != 1
@@ -206,6 +207,7 @@ class SaveAnimatedPNG:
 
         file = f"{filename}_{counter:05}_.png"
         pil_images[0].save(os.path.join(full_output_folder, file), pnginfo=metadata, compress_level=compress_level, save_all=True, duration=int(1000.0/fps), append_images=pil_images[1:])
+        folder_paths.update_save_image_counter(full_output_folder, filename, counter)
         results.append({
             "filename": file,
             "subfolder": subfolder,
@@ -315,6 +315,24 @@ class ModelComputeDtype:
         m.set_model_compute_dtype(node_helpers.string_to_torch_dtype(dtype))
         return (m, )
 
+class ModelAreaCondBatching:
+    @classmethod
+    def INPUT_TYPES(s):
+        return {"required": { "model": ("MODEL",),
+                              "granularity": ("INT", {"default": 8, "min": 1, "max": 128, "step": 1, "tooltip": "Area sizes are rounded up to a multiple of this (in latent pixels) before being bucketed."}),
+                              "min_fill": ("FLOAT", {"default": 0.5, "min": 0.0, "max": 1.0, "step": 0.01, "tooltip": "An area is only grown to a bigger bucket if it covers at least this fraction of it."}),
+                              }}
+    RETURN_TYPES = ("MODEL",)
+    FUNCTION = "patch"
+
+    CATEGORY = "advanced/model"
+    DESCRIPTION = "Grows differently sized area and mask conds to shared bucket sizes so multiple regions can be run in the same model call. The extra context around each region can slightly change the result."
+
+    def patch(self, model, granularity, min_fill):
+        m = model.clone()
+        m.set_model_area_cond_batching(granularity, min_fill)
+        return (m, )
+
 
 NODE_CLASS_MAPPINGS = {
     "ModelSamplingDiscrete": ModelSamplingDiscrete,
@@ -326,4 +344,5 @@ NODE_CLASS_MAPPINGS = {
     "ModelSamplingFlux": ModelSamplingFlux,
     "RescaleCFG": RescaleCFG,
     "ModelComputeDtype": ModelComputeDtype,
+    "ModelAreaCondBatching": ModelAreaCondBatching,
 }
@@ -3,6 +3,12 @@
 import torch
 from typing import Tuple, Callable
 import math
+import comfy.patcher_extension
+import comfy.ldm.flux.model
+import comfy.ldm.chroma.model
+import comfy.ldm.hunyuan_video.model
+import comfy.ldm.wan.model
+import comfy.ldm.modules.diffusionmodules.mmdit
 
 def do_nothing(x: torch.Tensor, mode:str=None):
     return x
@@ -21,7 +27,7 @@ def mps_gather_workaround(input, dim, index):
 
 def bipartite_soft_matching_random2d(metric: torch.Tensor,
                                      w: int, h: int, sx: int, sy: int, r: int,
-                                     no_rand: bool = False) -> Tuple[Callable, Callable]:
+                                     no_rand: bool = False, return_indices: bool = False) -> Tuple[Callable, Callable]:
     """
     Partitions the tokens into src and dst and merges r tokens from src to dst.
     Dst tokens are partitioned by choosing one randomy in each (sx, sy) region.
@@ -33,10 +39,13 @@ def bipartite_soft_matching_random2d(metric: torch.Tensor,
      - sy: stride in the y dimension for dst, must divide h
      - r: number of tokens to remove (by merging)
      - no_rand: if true, disable randomness (use top left corner only)
+     - return_indices: if true, also return the [B, N - r] original indices of the tokens kept by merge
     """
     B, N, _ = metric.shape
 
     if r <= 0 or w == 1 or h == 1:
+        if return_indices:
+            return do_nothing, do_nothing, None
         return do_nothing, do_nothing
 
     gather = mps_gather_workaround if metric.device.type == "mps" else torch.gather
@@ -120,6 +129,11 @@ def bipartite_soft_matching_random2d(metric: torch.Tensor,
 
         return out
 
+    if return_indices:
+        unm_orig_idx = gather(a_idx.expand(B, a_idx.shape[1], 1), dim=1, index=unm_idx)
+        kept_idx = torch.cat([unm_orig_idx, b_idx.expand(B, num_dst, 1)], dim=1).squeeze(-1)
+        return merge, unmerge, kept_idx
+
     return merge, unmerge
 
 
@@ -171,6 +185,209 @@ class TomePatchModel:
         return (m, )
 
 
+def gather_tokens(x, dim, index):
+    """Gather the tokens in index [B, M] along dim of x, x can have a batch size of 1."""
+    if x.shape[0] != index.shape[0]:
+        x = x.expand(index.shape[0], *x.shape[1:])
+    shape = [index.shape[0]] + [1] * (x.ndim - 1)
+    shape[dim] = index.shape[1]
+    target = list(x.shape)
+    target[dim] = index.shape[1]
+    return torch.gather(x, dim, index.to(x.device).reshape(shape).expand(target))
+
+
+class DiTTokenLayout:
+    def __init__(self, txt_first=True, pe_dim=None, pe_has_txt=True):
+        self.txt_first = txt_first # order of the txt and img tokens in the single stream blocks and pe
+        self.pe_dim = pe_dim # token dimension of the rope pe, None if the model doesn't pass one to the blocks
+        self.pe_has_txt = pe_has_txt
+
+
+def get_dit_token_layout(diffusion_model):
+    if isinstance(diffusion_model, (comfy.ldm.flux.model.Flux, comfy.ldm.chroma.model.Chroma)):
+        return DiTTokenLayout(txt_first=True, pe_dim=2), len(diffusion_model.double_blocks), len(diffusion_model.single_blocks)
+    if isinstance(diffusion_model, comfy.ldm.hunyuan_video.model.HunyuanVideo):
+        return DiTTokenLayout(txt_first=False, pe_dim=2), len(diffusion_model.double_blocks), len(diffusion_model.single_blocks)
+    if isinstance(diffusion_model, comfy.ldm.wan.model.WanModel):
+        return DiTTokenLayout(pe_dim=1, pe_has_txt=False), len(diffusion_model.blocks), 0
+    if isinstance(diffusion_model, comfy.ldm.modules.diffusionmodules.mmdit.MMDiT):
+        return DiTTokenLayout(pe_dim=None), len(diffusion_model.joint_blocks), 0
+    return None, 0, 0
+
+
+class DiTTokenMerging:
+    """
+    Bipartite token merging on the image tokens of the double/single stream blocks of DiT models.
+    The tokens are merged before each patched block and the residual the block adds is unmerged back
+    to every original token. The matching is computed once per model call and shared by the blocks.
+    """
+    def __init__(self, diffusion_model, ratio_start, ratio_end, start_percent=0.0, end_percent=1.0, depth_start=0.0, depth_end=1.0):
+        self.layout, self.double_blocks, self.single_blocks = get_dit_token_layout(diffusion_model)
+        patch_size = diffusion_model.patch_size
+        self.patch_size = list(patch_size) if isinstance(patch_size, (list, tuple)) else None
+        if self.patch_size is None:
+            self.patch_size = [patch_size, patch_size]
+        self.ratio_start = ratio_start
+        self.ratio_end = ratio_end
+        self.start_percent = start_percent
+        self.end_percent = end_percent
+        self.depth_start = depth_start
+        self.depth_end = depth_end
+        self.ratio = 0.0
+        self.grid = None
+        self.txt_len = None
+        self.functions = None
+
+    def step_ratio(self, sigma, transformer_options):
+        sample_sigmas = transformer_options.get("sample_sigmas", None)
+        percent = 0.0
+        if sample_sigmas is not None and len(sample_sigmas) > 1:
+            step = int((sample_sigmas.to(sigma.device) - sigma[0]).abs().argmin())
+            percent = step / (len(sample_sigmas) - 1)
+        if percent < self.start_percent or percent > self.end_percent:
+            return 0.0
+        span = max(self.end_percent - self.start_percent, 1e-5)
+        return self.ratio_start + (self.ratio_end - self.ratio_start) * min(1.0, (percent - self.start_percent) / span)
+
+    def prepare(self, x, sigma, transformer_options):
+        spatial = x.shape[2:]
+        patch_size = self.patch_size[-len(spatial):]
+        grid = [(spatial[i] + patch_size[i] - 1) // patch_size[i] for i in range(len(spatial))]
+        # video latents are flattened to a (frames * height, width) grid
+        self.grid = (math.prod(grid[:-1]), grid[-1])
+        self.ratio = self.step_ratio(sigma, transformer_options)
+        self.txt_len = None
+        self.functions = None
+
+    def apply_model_wrapper(self, executor, *args, **kwargs):
+        self.prepare(args[0], args[1], args[5] if len(args) > 5 else kwargs.get("transformer_options", {}))
+        try:
+            return executor(*args, **kwargs)
+        finally:
+            self.functions = None
+
+    def block_enabled(self, index):
+        total = self.double_blocks + self.single_blocks
+        depth = index / max(1, total - 1)
+        return self.ratio > 0.0 and self.depth_start <= depth <= self.depth_end
+
+    def get_functions(self, img):
+        h, w = self.grid
+        if img.shape[1] != h * w:
+            return None
+        if self.functions is None:
+            r = int(img.shape[1] * self.ratio)
+            merge, unmerge, kept_idx = bipartite_soft_matching_random2d(img, w, h, 2, 2, r, return_indices=True)
+            if kept_idx is None:
+                return None
+            self.functions = (merge, unmerge, kept_idx)
+        return self.functions
+
+    def merge_pe(self, pe, kept_idx, img_len):
+        if pe is None or self.layout.pe_dim is None:
+            return pe
+        dim = self.layout.pe_dim
+        if not self.layout.pe_has_txt:
+            return gather_tokens(pe, dim, kept_idx)
+        txt_len = pe.shape[dim] - img_len
+        batch = kept_idx.shape[0]
+        if self.layout.txt_first:
+            pe_txt, pe_img = pe.narrow(dim, 0, txt_len), pe.narrow(dim, txt_len, img_len)
+            return torch.cat([pe_txt.expand(batch, *pe_txt.shape[1:]), gather_tokens(pe_img, dim, kept_idx)], dim=dim)
+        pe_img, pe_txt = pe.narrow(dim, 0, img_len), pe.narrow(dim, img_len, txt_len)
+        return torch.cat([gather_tokens(pe_img, dim, kept_idx), pe_txt.expand(batch, *pe_txt.shape[1:])], dim=dim)
+
+    def can_merge(self, args):
+        return args.get("attn_mask", None) is None and args.get("attention_mask", None) is None and args.get("modulation_dims", args.get("modulation_dims_img", None)) is None
+
+    def double_block(self, index, args, extra_options):
+        original_block = extra_options["original_block"]
+        img = args["img"]
+        if "txt" in args:
+            self.txt_len = args["txt"].shape[1]
+        if not self.block_enabled(index) or not self.can_merge(args):
+            return original_block(args)
+        functions = self.get_functions(img)
+        if functions is None:
+            return original_block(args)
+        merge, unmerge, kept_idx = functions
+
+        args = args.copy()
+        args["img"] = merge(img)
+        args["pe"] = self.merge_pe(args.get("pe", None), kept_idx, img.shape[1])
+        out = original_block(args)
+        out["img"] = img + unmerge(out["img"] - merge(img))
+        return out
+
+    def single_block(self, index, args, extra_options):
+        original_block = extra_options["original_block"]
+        x = args["img"]
+        if self.txt_len is None or not self.block_enabled(self.double_blocks + index) or not self.can_merge(args):
+            return original_block(args)
+        img_len = x.shape[1] - self.txt_len
+        if self.layout.txt_first:
+            txt, img = x[:, :self.txt_len], x[:, self.txt_len:]
+        else:
+            img, txt = x[:, :img_len], x[:, img_len:]
+        functions = self.get_functions(img)
+        if functions is None:
+            return original_block(args)
+        merge, unmerge, kept_idx = functions
+
+        def join(txt, img):
+            if self.layout.txt_first:
+                return torch.cat((txt, img), dim=1)
+            return torch.cat((img, txt), dim=1)
+
+        args = args.copy()
+        args["img"] = join(txt, merge(img))
+        args["pe"] = self.merge_pe(args.get("pe", None), kept_idx, img_len)
+        out = original_block(args)
+        merged_len = kept_idx.shape[1]
+        if self.layout.txt_first:
+            txt_out, img_out = out["img"][:, :self.txt_len], out["img"][:, self.txt_len:]
+        else:
+            img_out, txt_out = out["img"][:, :merged_len], out["img"][:, merged_len:]
+        out["img"] = join(txt_out, img + unmerge(img_out - merge(img)))
+        return out
+
+    def patch_model(self, model):
+        for i in range(self.double_blocks):
+            model.set_model_patch_replace(lambda args, extra_options, i=i: self.double_block(i, args, extra_options), "dit", "double_block", i)
+        for i in range(self.single_blocks):
+            model.set_model_patch_replace(lambda args, extra_options, i=i: self.single_block(i, args, extra_options), "dit", "single_block", i)
+        model.add_wrapper_with_key(comfy.patcher_extension.WrappersMP.APPLY_MODEL, "token_merging", self.apply_model_wrapper)
+
+
+class TomePatchDiT:
+    @classmethod
+    def INPUT_TYPES(s):
+        return {"required": { "model": ("MODEL",),
+                              "ratio_start": ("FLOAT", {"default": 0.5, "min": 0.0, "max": 0.75, "step": 0.01, "tooltip": "Fraction of the image tokens merged at the first step."}),
+                              "ratio_end": ("FLOAT", {"default": 0.3, "min": 0.0, "max": 0.75, "step": 0.01, "tooltip": "Fraction of the image tokens merged at the last step."}),
+                              "start_percent": ("FLOAT", {"default": 0.0, "min": 0.0, "max": 1.0, "step": 0.001}),
+                              "end_percent": ("FLOAT", {"default": 1.0, "min": 0.0, "max": 1.0, "step": 0.001}),
+                              "depth_start": ("FLOAT", {"default": 0.0, "min": 0.0, "max": 1.0, "step": 0.01, "tooltip": "Only merge tokens in the blocks from this fraction of the model depth."}),
+                              "depth_end": ("FLOAT", {"default": 1.0, "min": 0.0, "max": 1.0, "step": 0.01, "tooltip": "Only merge tokens in the blocks up to this fraction of the model depth."}),
+                              }}
+    RETURN_TYPES = ("MODEL",)
+    FUNCTION = "patch"
+
+    CATEGORY = "model_patches/dit"
+    DESCRIPTION = "Token merging for the transformer blocks of Flux, Chroma, SD3, HunyuanVideo and Wan models."
+    EXPERIMENTAL = True
+
+    def patch(self, model, ratio_start, ratio_end, start_percent, end_percent, depth_start, depth_end):
+        diffusion_model = model.get_model_object("diffusion_model")
+        tome = DiTTokenMerging(diffusion_model, ratio_start, ratio_end, start_percent, end_percent, depth_start, depth_end)
+        if tome.layout is None:
+            raise ValueError("Token merging is not supported for this model type: {}".format(type(diffusion_model).__name__))
+        m = model.clone()
+        tome.patch_model(m)
+        return (m, )
+
+
 NODE_CLASS_MAPPINGS = {
     "TomePatchModel": TomePatchModel,
+    "TomePatchDiT": TomePatchDiT,
 }
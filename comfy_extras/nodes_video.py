@@ -10,7 +10,7 @@ from fractions import Fraction
 from comfy.comfy_types import IO, FileLocator, ComfyNodeABC
 from comfy_api.input import ImageInput, AudioInput, VideoInput
 from comfy_api.util import VideoContainer, VideoCodec, VideoComponents
-from comfy_api.input_impl import VideoFromFile, VideoFromComponents
+from comfy_api.input_impl import VideoFromFile, VideoFromComponents, VideoFromFrameChunks
 from comfy.cli_args import args
 
 class SaveWEBM:
@@ -70,6 +70,7 @@ class SaveWEBM:
                 container.mux(packet)
         container.mux(stream.encode())
         container.close()
+        folder_paths.update_save_image_counter(full_output_folder, filename, counter)
 
         results: list[FileLocator] = [{
             "filename": file,
@@ -134,6 +135,7 @@ class SaveVideo(ComfyNodeABC):
             codec=codec,
             metadata=saved_metadata
         )
+        folder_paths.update_save_image_counter(full_output_folder, filename, counter)
 
         results.append({
             "filename": file,
@@ -172,6 +174,53 @@ class CreateVideo(ComfyNodeABC):
             )
         ),)
 
+class VAEDecodeVideo(ComfyNodeABC):
+    @classmethod
+    def INPUT_TYPES(cls):
+        return {
+            "required": {
+                "samples": (IO.LATENT, ),
+                "vae": (IO.VAE, ),
+                "fps": ("FLOAT", {"default": 24.0, "min": 1.0, "max": 120.0, "step": 1.0}),
+                "temporal_size": ("INT", {"default": 64, "min": 8, "max": 4096, "step": 4, "tooltip": "Amount of frames to decode at a time, lower values use less memory."}),
+                "temporal_overlap": ("INT", {"default": 8, "min": 4, "max": 4096, "step": 4, "tooltip": "Amount of frames to overlap."}),
+            },
+            "optional": {
+                "audio": (IO.AUDIO, {"tooltip": "The audio to add to the video."}),
+            }
+        }
+
+    RETURN_TYPES = (IO.VIDEO,)
+    FUNCTION = "decode"
+
+    CATEGORY = "image/video"
+    DESCRIPTION = "Create a video that is decoded from the latent in chunks of frames while it is saved, the full decoded video is never kept in memory."
+
+    def decode(self, samples, vae, fps: float, temporal_size: int, temporal_overlap: int, audio: Optional[AudioInput] = None):
+        latent = samples["samples"]
+        if temporal_size < temporal_overlap * 2:
+            temporal_overlap = temporal_overlap // 2
+        temporal_compression = vae.temporal_compression_decode()
+        if temporal_compression is not None:
+            temporal_size = max(2, temporal_size // temporal_compression)
+            temporal_overlap = max(1, min(temporal_size // 2, temporal_overlap // temporal_compression))
+
+        if latent.ndim == 5:
+            # every video of the batch is decoded to the number of frames the temporal upscale of the vae gives
+            frame_count = latent.shape[0] * round(vae.upscale_ratio[0](latent.shape[2]))
+        else:
+            frame_count = latent.shape[0]
+
+        compression = vae.spacial_compression_decode()
+        return (VideoFromFrameChunks(
+            lambda: vae.decode_temporal_chunks(latent, tile_t=temporal_size, overlap_t=temporal_overlap, uint8=True),
+            width=latent.shape[-1] * compression,
+            height=latent.shape[-2] * compression,
+            frame_rate=Fraction(fps),
+            audio=audio,
+            frame_count=frame_count,
+        ),)
+
 class GetVideoComponents(ComfyNodeABC):
     @classmethod
     def INPUT_TYPES(cls):
@@ -213,10 +262,7 @@ class LoadVideo(ComfyNodeABC):
     @classmethod
     def IS_CHANGED(cls, file):
         video_path = folder_paths.get_annotated_filepath(file)
-        mod_time = os.path.getmtime(video_path)
-        # Instead of hashing the file, we can just use the modification time to avoid
-        # rehashing large files.
-        return mod_time
+        return folder_paths.get_file_hash(video_path)
 
     @classmethod
     def VALIDATE_INPUTS(cls, file):
@@ -229,6 +275,7 @@ NODE_CLASS_MAPPINGS = {
     "SaveWEBM": SaveWEBM,
     "SaveVideo": SaveVideo,
     "CreateVideo": CreateVideo,
+    "VAEDecodeVideo": VAEDecodeVideo,
     "GetVideoComponents": GetVideoComponents,
     "LoadVideo": LoadVideo,
 }
@@ -236,6 +283,7 @@ NODE_CLASS_MAPPINGS = {
 NODE_DISPLAY_NAME_MAPPINGS = {
     "SaveVideo": "Save Video",
     "CreateVideo": "Create Video",
+    "VAEDecodeVideo": "VAE Decode Video (Streaming)",
     "GetVideoComponents": "Get Video Components",
     "LoadVideo": "Load Video",
 }
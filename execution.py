@@ -1,7 +1,11 @@
+import collections
 import copy
 import heapq
 import inspect
+import itertools
+import json
 import logging
+import os
 import sys
 import threading
 import time
@@ -12,7 +16,9 @@ from typing import List, Literal, NamedTuple, Optional
 import torch
 
 import comfy.model_management
+import folder_paths
 import nodes
+from comfy.cli_args import args
 from comfy_execution.caching import (
     CacheKeySetID,
     CacheKeySetInputSignature,
@@ -26,7 +32,9 @@ from comfy_execution.graph import (
     ExecutionList,
     get_input_info,
 )
+from comfy_execution.graph_optimizer import optimize_prompt
 from comfy_execution.graph_utils import GraphBuilder, is_link
+from comfy_execution.output_writer import get_output_writer
 from comfy_execution.validation import validate_node_input
 
 
@@ -39,10 +47,11 @@ class DuplicateNodeError(Exception):
     pass
 
 class IsChangedCache:
-    def __init__(self, dynprompt, outputs_cache):
+    def __init__(self, dynprompt, outputs_cache, is_changed=None):
         self.dynprompt = dynprompt
         self.outputs_cache = outputs_cache
-        self.is_changed = {}
+        # node id -> IS_CHANGED result, can be shared between the caches of the same prompt
+        self.is_changed = {} if is_changed is None else is_changed
 
     def get(self, node_id):
         if node_id in self.is_changed:
@@ -60,15 +69,14 @@ class IsChangedCache:
             return self.is_changed[node_id]
 
         # Intentionally do not use cached outputs here. We only want constants in IS_CHANGED
+        # The result isn't stored in the node, the prompt is shared with the queue and the history
         input_data_all, _ = get_input_data(node["inputs"], class_def, node_id, None)
         try:
             is_changed = _map_node_over_list(class_def, input_data_all, "IS_CHANGED")
-            node["is_changed"] = [None if isinstance(x, ExecutionBlocker) else x for x in is_changed]
+            self.is_changed[node_id] = [None if isinstance(x, ExecutionBlocker) else x for x in is_changed]
         except Exception as e:
             logging.warning("WARNING: {}".format(e))
-            node["is_changed"] = float("NaN")
-        finally:
-            self.is_changed[node_id] = node["is_changed"]
+            self.is_changed[node_id] = float("NaN")
         return self.is_changed[node_id]
 
 
@@ -322,6 +330,8 @@ def execute(server, dynprompt, caches, current_item, extra_data, executed, promp
                 server.last_node_id = display_node_id
                 server.send_sync("executing", { "node": unique_id, "display_node": display_node_id, "prompt_id": prompt_id }, server.client_id)
 
+            # write errors are reported on the node shown in the ui
+            get_output_writer().set_node(display_node_id)
             obj = caches.objects.get(unique_id)
             if obj is None:
                 obj = class_def()
@@ -468,6 +478,20 @@ class PromptExecutor:
         if self.server.client_id is not None or broadcast:
             self.server.send_sync(event, data, self.server.client_id)
 
+    def optimize_prompt(self, prompt, prompt_id, execute_outputs, is_changed):
+        try:
+            # the IS_CHANGED results are shared with the IsChangedCache of the execution, the kept nodes keep their ids
+            optimization = optimize_prompt(prompt, execute_outputs, IsChangedCache(DynamicPrompt(prompt), self.caches.outputs, is_changed))
+        except Exception as e:
+            logging.warning("Could not optimize the prompt, executing it as is: {}".format(e))
+            return prompt
+        if len(optimization.merged) > 0 or len(optimization.removed) > 0:
+            logging.info("Prompt optimized: merged {} duplicate nodes, removed {} unused nodes".format(len(optimization.merged), len(optimization.removed)))
+            self.add_message("execution_optimized",
+                             {"prompt_id": prompt_id, "merged": optimization.merged, "removed": optimization.removed},
+                             broadcast=False)
+        return optimization.prompt
+
     def handle_execution_error(self, prompt_id, prompt, current_outputs, executed, error, ex):
         node_id = error["node_id"]
         class_type = prompt[node_id]["class_type"]
@@ -496,6 +520,29 @@ class PromptExecutor:
             }
             self.add_message("execution_error", mes, broadcast=False)
 
+    def handle_write_errors(self, prompt_id, prompt, current_outputs, executed, errors) -> bool:
+        """
+        Reports the output files the background writer failed to write as an execution error of the node that saved
+        the first of them, returns False if there were any.
+        """
+        if len(errors) == 0:
+            return True
+        self.success = False
+        _, ex, node_id = errors[0]
+        mes = {
+            "prompt_id": prompt_id,
+            "node_id": node_id,
+            "node_type": prompt[node_id]["class_type"] if node_id in prompt else None,
+            "executed": list(executed),
+            "exception_message": "Could not write the output files: {}".format(", ".join("{} ({})".format(os.path.basename(path), e) for path, e, _ in errors)),
+            "exception_type": full_type_name(type(ex)),
+            "traceback": traceback.format_tb(ex.__traceback__),
+            "current_inputs": {},
+            "current_outputs": list(current_outputs),
+        }
+        self.add_message("execution_error", mes, broadcast=False)
+        return False
+
     def execute(self, prompt, prompt_id, extra_data={}, execute_outputs=[]):
         nodes.interrupt_processing(False)
 
@@ -508,8 +555,13 @@ class PromptExecutor:
         self.add_message("execution_start", { "prompt_id": prompt_id}, broadcast=False)
 
         with torch.inference_mode():
-            dynamic_prompt = DynamicPrompt(prompt)
-            is_changed_cache = IsChangedCache(dynamic_prompt, self.caches.outputs)
+            is_changed = {}
+            submitted_prompt = prompt
+            if not args.disable_graph_optimization:
+                prompt = self.optimize_prompt(prompt, prompt_id, execute_outputs, is_changed)
+            # the optimized graph is executed, the PROMPT hidden input and the error reports get the submitted one
+            dynamic_prompt = DynamicPrompt(prompt, submitted_prompt)
+            is_changed_cache = IsChangedCache(dynamic_prompt, self.caches.outputs, is_changed)
             for cache in self.caches.all:
                 cache.set_prompt(dynamic_prompt, prompt.keys(), is_changed_cache)
                 cache.clean_unused()
@@ -533,13 +585,13 @@ class PromptExecutor:
             while not execution_list.is_empty():
                 node_id, error, ex = execution_list.stage_node_execution()
                 if error is not None:
-                    self.handle_execution_error(prompt_id, dynamic_prompt.original_prompt, current_outputs, executed, error, ex)
+                    self.handle_execution_error(prompt_id, dynamic_prompt.get_original_prompt(), current_outputs, executed, error, ex)
                     break
 
                 result, error, ex = execute(self.server, dynamic_prompt, self.caches, node_id, extra_data, executed, prompt_id, execution_list, pending_subgraph_results)
                 self.success = result != ExecutionResult.FAILURE
                 if result == ExecutionResult.FAILURE:
-                    self.handle_execution_error(prompt_id, dynamic_prompt.original_prompt, current_outputs, executed, error, ex)
+                    self.handle_execution_error(prompt_id, dynamic_prompt.get_original_prompt(), current_outputs, executed, error, ex)
                     break
                 elif result == ExecutionResult.PENDING:
                     execution_list.unstage_node_execution()
@@ -547,7 +599,12 @@ class PromptExecutor:
                     execution_list.complete_node_execution()
             else:
                 # Only execute when the while-loop ends without break
-                self.add_message("execution_success", { "prompt_id": prompt_id }, broadcast=False)
+                # the outputs in the history have to be on disk before the prompt is reported as done
+                if self.handle_write_errors(prompt_id, dynamic_prompt.get_original_prompt(), current_outputs, executed, get_output_writer().flush()):
+                    self.add_message("execution_success", { "prompt_id": prompt_id }, broadcast=False)
+            # after an error the writes of the nodes that ran are still waited for
+            get_output_writer().flush()
+            get_output_writer().set_node(None)
 
             ui_outputs = {}
             meta_outputs = {}
@@ -566,7 +623,96 @@ class PromptExecutor:
                 comfy.model_management.unload_all_models()
 
 
-def validate_inputs(prompt, item, validated):
+def validate_input_value(inputs, x, val, input_type, extra_info, check_value):
+    """
+    Converts a widget value of a node to the type of its input in place and, if check_value is set (the value isn't
+    checked by VALIDATE_INPUTS), checks it against the min, max and combo options. Returns the error or None.
+    """
+    info = (input_type, extra_info)
+    try:
+        # Unwraps values wrapped in __value__ key. This is used to pass
+        # list widget value to execution, as by default list value is
+        # reserved to represent the connection between nodes.
+        if isinstance(val, dict) and "__value__" in val:
+            val = val["__value__"]
+            inputs[x] = val
+
+        if input_type == "INT":
+            val = int(val)
+            inputs[x] = val
+        if input_type == "FLOAT":
+            val = float(val)
+            inputs[x] = val
+        if input_type == "STRING":
+            val = str(val)
+            inputs[x] = val
+        if input_type == "BOOLEAN":
+            val = bool(val)
+            inputs[x] = val
+    except Exception as ex:
+        return {
+            "type": "invalid_input_type",
+            "message": f"Failed to convert an input value to a {input_type} value",
+            "details": f"{x}, {val}, {ex}",
+            "extra_info": {
+                "input_name": x,
+                "input_config": info,
+                "received_value": val,
+                "exception_message": str(ex)
+            }
+        }
+
+    if check_value:
+        if "min" in extra_info and val < extra_info["min"]:
+            return {
+                "type": "value_smaller_than_min",
+                "message": "Value {} smaller than min of {}".format(val, extra_info["min"]),
+                "details": f"{x}",
+                "extra_info": {
+                    "input_name": x,
+                    "input_config": info,
+                    "received_value": val,
+                }
+            }
+        if "max" in extra_info and val > extra_info["max"]:
+            return {
+                "type": "value_bigger_than_max",
+                "message": "Value {} bigger than max of {}".format(val, extra_info["max"]),
+                "details": f"{x}",
+                "extra_info": {
+                    "input_name": x,
+                    "input_config": info,
+                    "received_value": val,
+                }
+            }
+
+        if isinstance(input_type, list):
+            combo_options = input_type
+            if val not in combo_options:
+                input_config = info
+                list_info = ""
+
+                # Don't send back gigantic lists like if they're lots of
+                # scanned model filepaths
+                if len(combo_options) > 20:
+                    list_info = f"(list of length {len(combo_options)})"
+                    input_config = None
+                else:
+                    list_info = str(combo_options)
+
+                return {
+                    "type": "value_not_in_list",
+                    "message": "Value not in list",
+                    "details": f"{x}: '{val}' not in {list_info}",
+                    "extra_info": {
+                        "input_name": x,
+                        "input_config": input_config,
+                        "received_value": val,
+                    }
+                }
+    return None
+
+def validate_inputs(prompt, item, validated, input_info=None):
     unique_id = item
     if unique_id in validated:
         return validated[unique_id]
@@ -575,7 +721,16 @@ def validate_inputs(prompt, item, validated):
     class_type = prompt[unique_id]['class_type']
     obj_class = nodes.NODE_CLASS_MAPPINGS[class_type]
 
-    class_inputs = obj_class.INPUT_TYPES()
+    recorder = folder_paths.dependency_recorder
+    previous_dependencies = getattr(recorder, "dependencies", None)
+    recorder.dependencies = set()
+    try:
+        class_inputs = obj_class.INPUT_TYPES()
+    finally:
+        class_dependencies = recorder.dependencies
+        recorder.dependencies = previous_dependencies
+        if previous_dependencies is not None:
+            previous_dependencies.update(class_dependencies)
     valid_inputs = set(class_inputs.get('required',{})).union(set(class_inputs.get('optional',{})))
 
     errors = []
@@ -588,10 +743,18 @@ def validate_inputs(prompt, item, validated):
         validate_function_inputs = argspec.args
         validate_has_kwargs = argspec.varkw is not None
     received_types = {}
+    class_input_info = None
+    if input_info is not None:
+        # class_type -> (class, {input: (input_type, extra_info, check_value)}, INPUT_TYPES read no folder through
+        # folder_paths), see ValidationCache
+        class_input_info = {}
+        input_info[class_type] = (obj_class, class_input_info, len(class_dependencies) == 0)
 
     for x in valid_inputs:
         input_type, input_category, extra_info = get_input_info(obj_class, x, class_inputs)
         assert extra_info is not None
+        if class_input_info is not None:
+            class_input_info[x] = (input_type, extra_info, x not in validate_function_inputs and not validate_has_kwargs)
         if x not in inputs:
             if input_category == "required":
                 error = {
@@ -643,7 +806,7 @@ def validate_inputs(prompt, item, validated):
                 errors.append(error)
                 continue
             try:
-                r = validate_inputs(prompt, o_id, validated)
+                r = validate_inputs(prompt, o_id, validated, input_info)
                 if r[0] is False:
                     # `r` will be set in `validated[o_id]` already
                     valid = False
@@ -668,96 +831,11 @@ def validate_inputs(prompt, item, validated):
                 validated[o_id] = (False, reasons, o_id)
                 continue
         else:
-            try:
-                # Unwraps values wrapped in __value__ key. This is used to pass
-                # list widget value to execution, as by default list value is
-                # reserved to represent the connection between nodes.
-                if isinstance(val, dict) and "__value__" in val:
-                    val = val["__value__"]
-                    inputs[x] = val
-
-                if input_type == "INT":
-                    val = int(val)
-                    inputs[x] = val
-                if input_type == "FLOAT":
-                    val = float(val)
-                    inputs[x] = val
-                if input_type == "STRING":
-                    val = str(val)
-                    inputs[x] = val
-                if input_type == "BOOLEAN":
-                    val = bool(val)
-                    inputs[x] = val
-            except Exception as ex:
-                error = {
-                    "type": "invalid_input_type",
-                    "message": f"Failed to convert an input value to a {input_type} value",
-                    "details": f"{x}, {val}, {ex}",
-                    "extra_info": {
-                        "input_name": x,
-                        "input_config": info,
-                        "received_value": val,
-                        "exception_message": str(ex)
-                    }
-                }
+            error = validate_input_value(inputs, x, val, input_type, extra_info, x not in validate_function_inputs and not validate_has_kwargs)
+            if error is not None:
                 errors.append(error)
                 continue
 
-            if x not in validate_function_inputs and not validate_has_kwargs:
-                if "min" in extra_info and val < extra_info["min"]:
-                    error = {
-                        "type": "value_smaller_than_min",
-                        "message": "Value {} smaller than min of {}".format(val, extra_info["min"]),
-                        "details": f"{x}",
-                        "extra_info": {
-                            "input_name": x,
-                            "input_config": info,
-                            "received_value": val,
-                        }
-                    }
-                    errors.append(error)
-                    continue
-                if "max" in extra_info and val > extra_info["max"]:
-                    error = {
-                        "type": "value_bigger_than_max",
-                        "message": "Value {} bigger than max of {}".format(val, extra_info["max"]),
-                        "details": f"{x}",
-                        "extra_info": {
-                            "input_name": x,
-                            "input_config": info,
-                            "received_value": val,
-                        }
-                    }
-                    errors.append(error)
-                    continue
-
-                if isinstance(input_type, list):
-                    combo_options = input_type
-                    if val not in combo_options:
-                        input_config = info
-                        list_info = ""
-
-                        # Don't send back gigantic lists like if they're lots of
-                        # scanned model filepaths
-                        if len(combo_options) > 20:
-                            list_info = f"(list of length {len(combo_options)})"
-                            input_config = None
-                        else:
-                            list_info = str(combo_options)
-
-                        error = {
-                            "type": "value_not_in_list",
-                            "message": "Value not in list",
-                            "details": f"{x}: '{val}' not in {list_info}",
-                            "extra_info": {
-                                "input_name": x,
-                                "input_config": input_config,
-                                "received_value": val,
-                            }
-                        }
-                        errors.append(error)
-                        continue
-
     if len(validate_function_inputs) > 0 or validate_has_kwargs:
         input_data_all, _ = get_input_data(inputs, obj_class, unique_id)
         input_filtered = {}
@@ -801,7 +879,152 @@ def full_type_name(klass):
         return klass.__qualname__
     return module + '.' + klass.__qualname__
 
+# widget values that validate_input_value fully validates when they aren't passed to VALIDATE_INPUTS
+CHEAP_INPUT_TYPES = ("INT", "FLOAT", "STRING", "BOOLEAN")
+
+class ValidationCacheEntry(NamedTuple):
+    outputs: list
+    # node ids validated -> class_type
+    nodes: dict
+    classes: dict
+    input_info: dict
+    dependencies: dict
+
+class ValidationCache:
+    """
+    Results of validate_prompt for the prompts that were fully valid, keyed by the shape of their graph: the node ids,
+    class types, links and the widget values that aren't just converted and checked against a min and max (combo
+    choices, values passed to VALIDATE_INPUTS...). Another prompt with the same shape, like the same workflow with
+    other seeds or text, only gets its remaining widget values checked. An entry is dropped when one of its node
+    classes is replaced or a folder read by INPUT_TYPES or VALIDATE_INPUTS (recorded through folder_paths) changed.
+    The combo choices of the node classes whose INPUT_TYPES read no folder through folder_paths (they can list files
+    another way) are compared with a fresh INPUT_TYPES on every hit.
+    """
+
+    def __init__(self, max_size=64):
+        self.max_size = max_size
+        # class_type -> (class, {input: (input_type, extra_info, check_value)}) from the last validation
+        self.input_info = {}
+        self.entries = collections.OrderedDict()
+        self.lock = threading.Lock()
+
+    def get_key(self, prompt):
+        shape = {}
+        for node_id, node in prompt.items():
+            class_type = node.get("class_type", None)
+            info = self.input_info.get(class_type, (None, {}))[1]
+            inputs = {}
+            for x, val in node.get("inputs", {}).items():
+                i = info.get(x, None)
+                if i is not None and i[2] and i[0] in CHEAP_INPUT_TYPES and not isinstance(val, list):
+                    val = None
+                inputs[x] = val
+            shape[node_id] = (class_type, inputs)
+        try:
+            return json.dumps(shape, sort_keys=True)
+        except (TypeError, ValueError):
+            return None
+
+    def is_valid(self, entry):
+        for class_type, class_ in entry.classes.items():
+            if nodes.NODE_CLASS_MAPPINGS.get(class_type, None) is not class_:
+                return False
+        for dependency, fingerprint in entry.dependencies.items():
+            if folder_paths.get_dependency_fingerprint(dependency) != fingerprint:
+                return False
+        for class_type in set(entry.nodes.values()):
+            class_, info, untracked = entry.input_info[class_type]
+            combos = {x: i[0] for x, i in info.items() if isinstance(i[0], list)}
+            if not untracked or len(combos) == 0:
+                continue
+            class_inputs = class_.INPUT_TYPES()
+            for x, choices in combos.items():
+                if get_input_info(class_, x, class_inputs)[0] != choices:
+                    return False
+        return True
+
+    def check_values(self, prompt, entry):
+        for node_id, class_type in entry.nodes.items():
+            info = entry.input_info[class_type][1]
+            inputs = prompt[node_id]["inputs"]
+            for x, val in list(inputs.items()):
+                i = info.get(x, None)
+                if i is None or isinstance(val, list):
+                    continue
+                if validate_input_value(inputs, x, val, i[0], i[1], i[2] and i[0] in CHEAP_INPUT_TYPES) is not None:
+                    return False
+        return True
+
+    def validate(self, prompt):
+        try:
+            key = self.get_key(prompt)
+            # shallow copy, the validation replaces the widget values it converts
+            prompt_shape = {node_id: {"class_type": node.get("class_type", None), "inputs": dict(node.get("inputs", {}))} for node_id, node in prompt.items()}
+        except Exception:
+            # malformed prompt, the validation reports it
+            key = None
+        if key is not None:
+            with self.lock:
+                entry = self.entries.get(key, None)
+                if entry is not None:
+                    self.entries.move_to_end(key)
+            if entry is not None:
+                try:
+                    if self.is_valid(entry) and self.check_values(prompt, entry):
+                        return (True, None, list(entry.outputs), {})
+                except Exception:
+                    pass
+
+        input_info = {}
+        previous = getattr(folder_paths.dependency_recorder, "dependencies", None)
+        folder_paths.dependency_recorder.dependencies = set()
+        try:
+            result = validate_prompt_uncached(prompt, input_info)
+        finally:
+            dependencies = folder_paths.dependency_recorder.dependencies
+            folder_paths.dependency_recorder.dependencies = previous
+            if previous is not None:
+                previous.update(dependencies)
+
+        with self.lock:
+            self.input_info.update(input_info)
+        if key is None or not result[0] or len(result[3]) > 0 or ("volatile", None) in dependencies:
+            return result
+
+        # the nodes the outputs depend on, the ones that were validated
+        validated = {}
+        to_visit = list(result[2])
+        while len(to_visit) > 0:
+            node_id = to_visit.pop()
+            if node_id in validated or node_id not in prompt:
+                continue
+            validated[node_id] = prompt[node_id]["class_type"]
+            to_visit.extend(v[0] for v in prompt[node_id]["inputs"].values() if isinstance(v, list) and len(v) == 2)
+        if any(class_type not in input_info for class_type in validated.values()):
+            return result
+
+        entry = ValidationCacheEntry(outputs=list(result[2]),
+                                     nodes=validated,
+                                     classes={node["class_type"]: nodes.NODE_CLASS_MAPPINGS.get(node["class_type"], None) for node in prompt.values()},
+                                     input_info=input_info,
+                                     dependencies={d: folder_paths.get_dependency_fingerprint(d) for d in dependencies})
+        key = self.get_key(prompt_shape)
+        if key is not None:
+            with self.lock:
+                self.entries[key] = entry
+                self.entries.move_to_end(key)
+                while len(self.entries) > self.max_size:
+                    self.entries.popitem(last=False)
+        return result
+
+validation_cache = ValidationCache()
+
 def validate_prompt(prompt):
+    if args.disable_validation_cache:
+        return validate_prompt_uncached(prompt)
+    return validation_cache.validate(prompt)
+
+def validate_prompt_uncached(prompt, input_info=None):
     outputs = set()
     for x in prompt:
         if 'class_type' not in prompt[x]:
@@ -844,7 +1067,7 @@ def validate_prompt(prompt):
         valid = False
         reasons = []
         try:
-            m = validate_inputs(prompt, o, validated)
+            m = validate_inputs(prompt, o, validated, input_info)
             valid = m[0]
             reasons = m[1]
         except Exception as ex:
@@ -921,13 +1144,33 @@ class PromptQueue:
         self.currently_running = {}
         self.history = {}
         self.flags = {}
+        # incremented on every change of the queue or of the running items, see get_queue_snapshot
+        self.version = 0
+        self.snapshot = None
+
+    # Queue items are (number, prompt_id, prompt, extra_data, outputs_to_execute) tuples that aren't modified once
+    # queued, they are shared by reference between the queue, the running items, the snapshots and the history. Nodes
+    # get the prompt and extra_data through the PROMPT and EXTRA_PNGINFO hidden inputs and may modify them, so get()
+    # hands the executor its own copy of these.
+
+    def queue_changed(self):
+        self.version += 1
+        self.server.queue_updated()
 
     def put(self, item):
         with self.mutex:
             heapq.heappush(self.queue, item)
-            self.server.queue_updated()
+            self.queue_changed()
             self.not_empty.notify()
 
+    def put_many(self, items):
+        """Adds several items to the queue at once, with a single status update."""
+        with self.mutex:
+            for item in items:
+                heapq.heappush(self.queue, item)
+            self.queue_changed()
+            self.not_empty.notify_all()
+
     def get(self, timeout=None):
         with self.not_empty:
             while len(self.queue) == 0:
@@ -936,10 +1179,11 @@ class PromptQueue:
                     return None
             item = heapq.heappop(self.queue)
             i = self.task_counter
-            self.currently_running[i] = copy.deepcopy(item)
+            self.currently_running[i] = item
             self.task_counter += 1
-            self.server.queue_updated()
-            return (item, i)
+            self.queue_changed()
+        # copied outside of the lock, it can take a while for big workflows
+        return ((item[0], item[1], copy.deepcopy(item[2]), copy.deepcopy(item[3])) + tuple(item[4:]), i)
 
     class ExecutionStatus(NamedTuple):
         status_str: Literal['success', 'error']
@@ -963,22 +1207,26 @@ class PromptQueue:
                 'status': status_dict,
             }
             self.history[prompt[1]].update(history_result)
-            self.server.queue_updated()
+            self.queue_changed()
+            self.server.history_updated(prompt[1])
+
+    def get_queue_snapshot(self):
+        """
+        Returns (version, running items, queued items in heap order). The lists are only rebuilt when the queue changed
+        and must not be modified.
+        """
+        with self.mutex:
+            if self.snapshot is None or self.snapshot[0] != self.version:
+                self.snapshot = (self.version, list(self.currently_running.values()), list(self.queue))
+            return self.snapshot
 
-    # Note: slow
     def get_current_queue(self):
-        with self.mutex:
-            out = []
-            for x in self.currently_running.values():
-                out += [x]
-            return (out, copy.deepcopy(self.queue))
+        _, running, queued = self.get_queue_snapshot()
+        return (list(running), list(queued))
 
     # read-safe as long as queue items are immutable
     def get_current_queue_volatile(self):
-        with self.mutex:
-            running = [x for x in self.currently_running.values()]
-            queued = copy.copy(self.queue)
-            return (running, queued)
+        return self.get_current_queue()
 
     def get_tasks_remaining(self):
         with self.mutex:
@@ -987,7 +1235,7 @@ class PromptQueue:
     def wipe_queue(self):
         with self.mutex:
             self.queue = []
-            self.server.queue_updated()
+            self.queue_changed()
 
     def delete_queue_item(self, function):
         with self.mutex:
@@ -998,26 +1246,44 @@ class PromptQueue:
                     else:
                         self.queue.pop(x)
                         heapq.heapify(self.queue)
-                    self.server.queue_updated()
+                        self.queue_changed()
                     return True
         return False
 
-    def get_history(self, prompt_id=None, max_items=None, offset=-1):
+    def get_prompt_ids(self, batch_id=None, include_history=True):
+        """Ids of the running, queued and (optionally) finished prompts, only the ones of a batch if batch_id is set."""
+        with self.mutex:
+            items = list(self.currently_running.values()) + self.queue
+            if include_history:
+                items += [h["prompt"] for h in self.history.values()]
+            return [x[1] for x in items if batch_id is None or x[3].get("batch_id") == batch_id]
+
+    def get_history(self, prompt_id=None, max_items=None, offset=-1, prompt_ids=None, batch_id=None):
         with self.mutex:
             if prompt_id is None:
-                out = {}
-                i = 0
+                keys = self.history.keys()
+                if prompt_ids is not None:
+                    keys = [k for k in prompt_ids if k in self.history]
+                if batch_id is not None:
+                    keys = [k for k in keys if self.history[k]["prompt"][3].get("batch_id") == batch_id]
+                count = len(keys)
                 if offset < 0 and max_items is not None:
-                    offset = len(self.history) - max_items
-                for k in self.history:
-                    if i >= offset:
-                        out[k] = self.history[k]
-                        if max_items is not None and len(out) >= max_items:
-                            break
-                    i += 1
-                return out
+                    offset = count - max_items
+                start = max(offset, 0)
+                end = count if max_items is None else min(count, start + max_items)
+                if start >= end:
+                    return {}
+                if isinstance(keys, list):
+                    selected = keys[start:end]
+                elif count - end < start:
+                    # the newest entries are the ones usually requested, walk from the end
+                    selected = list(itertools.islice(reversed(keys), count - end, count - start))[::-1]
+                else:
+                    selected = itertools.islice(keys, start, end)
+                # the entries aren't modified once added, they are returned without copying them
+                return {k: self.history[k] for k in selected}
             elif prompt_id in self.history:
-                return {prompt_id: copy.deepcopy(self.history[prompt_id])}
+                return {prompt_id: self.history[prompt_id]}
             else:
                 return {}
 
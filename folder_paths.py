@@ -2,6 +2,8 @@ from __future__ import annotations
 
 import os
 import time
+import hashlib
+import threading
 import mimetypes
 import logging
 from typing import Literal, List
@@ -51,7 +53,24 @@ temp_directory = os.path.join(base_path, "temp")
 input_directory = os.path.join(base_path, "input")
 user_directory = os.path.join(base_path, "user")
 
-filename_list_cache: dict[str, tuple[list[str], dict[str, float], float]] = {}
+filename_list_cache: dict[str, tuple[list[str], dict[str, int], float]] = {}
+
+# set dependency_recorder.dependencies to a set to collect the folders read on this thread, see get_dependency_fingerprint
+dependency_recorder = threading.local()
+
+def record_dependency(kind: Literal["filename_list", "directory", "volatile"], name: str | None) -> None:
+    dependencies = getattr(dependency_recorder, "dependencies", None)
+    if dependencies is not None:
+        dependencies.add((kind, name))
+
+# (output folder, filename prefix) -> [folder mtime_ns when last known, highest counter in use]
+save_counter_cache: dict[tuple[str, str], list[int]] = {}
+save_counter_lock = threading.Lock()
+
+# path -> ((hash function, st_ino, st_size, st_mtime_ns), hex digest), see get_file_hash
+file_hash_cache: dict[str, tuple[tuple[str, int, int, int], str]] = {}
+file_hash_lock = threading.Lock()
+MAX_FILE_HASH_CACHE_SIZE = 4096
 
 class CacheHelper:
     """
@@ -83,6 +102,152 @@ class CacheHelper:
 
 cache_helper = CacheHelper()
 
+class FolderIndex:
+    """
+    Incrementally updated list of the files under a directory, shared by everything that lists a model folder.
+
+    refresh() stats every known subdirectory and only lists again the ones whose mtime changed, instead of walking the
+    whole tree. When the folder is watched (--watch-model-folders) the stats are skipped until the watcher reports a
+    change, otherwise --model-folder-poll-interval can limit how often they happen.
+    """
+    def __init__(self, root: str, excluded_dir_names: Collection[str] = (".git",)):
+        self.root = root
+        self.excluded_dir_names = set(excluded_dir_names)
+        # relative directory path -> (mtime_ns, files, subdirectories)
+        self.dirs: dict[str, tuple[int, list[str], list[str]]] = {}
+        self.version = 0
+        self.files: list[str] | None = None
+        self.lock = threading.RLock()
+        self.last_refresh = None
+        self.watched = False
+        self.dirty = True
+        self.has_links = False
+
+    def needs_refresh(self) -> bool:
+        if self.dirty or self.last_refresh is None:
+            return True
+        if self.watched and not self.has_links:
+            return False
+        return time.monotonic() - self.last_refresh >= args.model_folder_poll_interval
+
+    def list_directory(self, path: str) -> tuple[list[str], list[str]]:
+        files = []
+        subdirs = []
+        try:
+            with os.scandir(path) as it:
+                for entry in it:
+                    try:
+                        if entry.is_dir():
+                            if entry.name not in self.excluded_dir_names:
+                                subdirs.append(entry.name)
+                        else:
+                            files.append(entry.name)
+                    except OSError:
+                        logging.warning(f"Warning: Unable to access {entry.path}. Skipping this path.")
+        except OSError:
+            logging.warning(f"Warning: Unable to access {path}. Skipping this path.")
+        return files, subdirs
+
+    def refresh(self) -> int:
+        """Brings the index up to date and returns its version, which changes every time the list of files changes."""
+        with self.lock:
+            if not self.needs_refresh():
+                return self.version
+            self.dirty = False
+            self.last_refresh = time.monotonic()
+
+            changed = False
+            has_links = False
+            dirs = {}
+            # (relative path, identities of the resolved directories from the root down to it)
+            stack = [("", frozenset())]
+            while len(stack) > 0:
+                relative, ancestors = stack.pop()
+                path = os.path.join(self.root, relative) if relative else self.root
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                if relative and os.path.islink(path):
+                    has_links = True
+                # directory symlinks are followed like os.walk(followlinks=True) does, several links to the same
+                # directory are all listed, only a link back to a directory it is in is skipped
+                identity = (stat.st_dev, stat.st_ino)
+                if identity in ancestors:
+                    continue
+                ancestors = ancestors | {identity}
+
+                entry = self.dirs.get(relative)
+                if entry is None or entry[0] != stat.st_mtime_ns:
+                    files, subdirs = self.list_directory(path)
+                    entry = (stat.st_mtime_ns, files, subdirs)
+                    changed = True
+                dirs[relative] = entry
+                stack.extend((os.path.join(relative, d) if relative else d, ancestors) for d in entry[2])
+
+            if changed or len(dirs) != len(self.dirs):
+                logging.debug("folder index {}: {} directories".format(self.root, len(dirs)))
+                self.version += 1
+                self.files = None
+            self.dirs = dirs
+            self.has_links = has_links
+            return self.version
+
+    def get_files(self) -> list[str]:
+        """Paths of all the files under the root, relative to it."""
+        with self.lock:
+            self.refresh()
+            if self.files is None:
+                files = []
+                for relative, (_, filenames, _) in self.dirs.items():
+                    files.extend(os.path.join(relative, f) if relative else f for f in filenames)
+                self.files = files
+            return self.files
+
+folder_indexes: dict[str, FolderIndex] = {}
+folder_indexes_lock = threading.Lock()
+folder_observer = None
+
+def watch_folder(index: FolderIndex) -> None:
+    global folder_observer
+    try:
+        from watchdog.observers import Observer
+        from watchdog.events import FileSystemEventHandler
+    except ImportError:
+        logging.warning("--watch-model-folders needs the watchdog package, polling the model folders instead.")
+        args.watch_model_folders = False
+        return
+
+    class Handler(FileSystemEventHandler):
+        def on_any_event(self, event):
+            if event.event_type not in ("opened", "closed", "closed_no_write"):
+                index.dirty = True
+
+    if not os.path.isdir(index.root):
+        return
+    try:
+        if folder_observer is None:
+            folder_observer = Observer()
+            folder_observer.daemon = True
+            folder_observer.start()
+        folder_observer.schedule(Handler(), index.root, recursive=True)
+        index.watched = True
+    except Exception as e:
+        logging.warning("Could not watch {}, polling it instead: {}".format(index.root, e))
+
+def get_folder_index(directory: str) -> FolderIndex:
+    """Returns the shared index of the files under directory."""
+    index = folder_indexes.get(directory)
+    if index is None:
+        with folder_indexes_lock:
+            index = folder_indexes.get(directory)
+            if index is None:
+                index = FolderIndex(directory)
+                if args.watch_model_folders:
+                    watch_folder(index)
+                folder_indexes[directory] = index
+    return index
+
 extension_mimetypes_cache = {
     "webp" : "image",
     "fbx" : "model",
@@ -113,14 +278,17 @@ def set_input_directory(input_dir: str) -> None:
 
 def get_output_directory() -> str:
     global output_directory
+    record_dependency("directory", output_directory)
     return output_directory
 
 def get_temp_directory() -> str:
     global temp_directory
+    record_dependency("directory", temp_directory)
     return temp_directory
 
 def get_input_directory() -> str:
     global input_directory
+    record_dependency("directory", input_directory)
     return input_directory
 
 def get_user_directory() -> str:
@@ -230,45 +398,15 @@ def get_folder_paths(folder_name: str) -> list[str]:
     return folder_names_and_paths[folder_name][0][:]
 
 def recursive_search(directory: str, excluded_dir_names: list[str] | None=None) -> tuple[list[str], dict[str, float]]:
+    """Lists the files under directory (relative paths) and the mtimes of the directories walked, by absolute path."""
     if not os.path.isdir(directory):
         return [], {}
 
-    if excluded_dir_names is None:
-        excluded_dir_names = []
-
-    result = []
-    dirs = {}
-
-    # Attempt to add the initial directory to dirs with error handling
-    try:
-        dirs[directory] = os.path.getmtime(directory)
-    except FileNotFoundError:
-        logging.warning(f"Warning: Unable to access {directory}. Skipping this path.")
-
-    logging.debug("recursive file list on directory {}".format(directory))
-    dirpath: str
-    subdirs: list[str]
-    filenames: list[str]
-
-    for dirpath, subdirs, filenames in os.walk(directory, followlinks=True, topdown=True):
-        subdirs[:] = [d for d in subdirs if d not in excluded_dir_names]
-        for file_name in filenames:
-            try:
-                relative_path = os.path.relpath(os.path.join(dirpath, file_name), directory)
-                result.append(relative_path)
-            except:
-                logging.warning(f"Warning: Unable to access {file_name}. Skipping this file.")
-                continue
-
-        for d in subdirs:
-            path: str = os.path.join(dirpath, d)
-            try:
-                dirs[path] = os.path.getmtime(path)
-            except FileNotFoundError:
-                logging.warning(f"Warning: Unable to access {path}. Skipping this path.")
-                continue
-    logging.debug("found {} files".format(len(result)))
-    return result, dirs
+    index = FolderIndex(directory, excluded_dir_names or ())
+    files = index.get_files()
+    dirs = {os.path.join(directory, relative) if relative else directory: mtime / 1e9 for relative, (mtime, _, _) in index.dirs.items()}
+    logging.debug("found {} files".format(len(files)))
+    return files, dirs
 
 def filter_files_extensions(files: Collection[str], extensions: Collection[str]) -> list[str]:
     return sorted(list(filter(lambda a: os.path.splitext(a)[-1].lower() in extensions or len(extensions) == 0, files)))
@@ -305,20 +443,20 @@ def get_full_path_or_raise(folder_name: str, filename: str) -> str:
     return full_path
 
 
-def get_filename_list_(folder_name: str) -> tuple[list[str], dict[str, float], float]:
+def get_filename_list_(folder_name: str) -> tuple[list[str], dict[str, int], float]:
     folder_name = map_legacy(folder_name)
     global folder_names_and_paths
     output_list = set()
     folders = folder_names_and_paths[folder_name]
     output_folders = {}
     for x in folders[0]:
-        files, folders_all = recursive_search(x, excluded_dir_names=[".git"])
-        output_list.update(filter_files_extensions(files, folders[1]))
-        output_folders = {**output_folders, **folders_all}
+        index = get_folder_index(x)
+        output_list.update(filter_files_extensions(index.get_files(), folders[1]))
+        output_folders[x] = index.version
 
     return sorted(list(output_list)), output_folders, time.perf_counter()
 
-def cached_filename_list_(folder_name: str) -> tuple[list[str], dict[str, float], float] | None:
+def cached_filename_list_(folder_name: str) -> tuple[list[str], dict[str, int], float] | None:
     strong_cache = cache_helper.get(folder_name)
     if strong_cache is not None:
         return strong_cache
@@ -330,22 +468,18 @@ def cached_filename_list_(folder_name: str) -> tuple[list[str], dict[str, float]
         return None
     out = filename_list_cache[folder_name]
 
-    for x in out[1]:
-        time_modified = out[1][x]
-        folder = x
-        if os.path.getmtime(folder) != time_modified:
-            return None
-
     folders = folder_names_and_paths[folder_name]
+    if len(folders[0]) != len(out[1]):
+        return None
     for x in folders[0]:
-        if os.path.isdir(x):
-            if x not in out[1]:
-                return None
+        if x not in out[1] or get_folder_index(x).refresh() != out[1][x]:
+            return None
 
     return out
 
 def get_filename_list(folder_name: str) -> list[str]:
     folder_name = map_legacy(folder_name)
+    record_dependency("filename_list", folder_name)
     out = cached_filename_list_(folder_name)
     if out is None:
         out = get_filename_list_(folder_name)
@@ -354,7 +488,194 @@ def get_filename_list(folder_name: str) -> list[str]:
     cache_helper.set(folder_name, out)
     return list(out[0])
 
-def get_save_image_path(filename_prefix: str, output_dir: str, image_width=0, image_height=0) -> tuple[str, str, int, str, str]:
+def get_dependency_fingerprint(dependency: tuple[str, str | None]):
+    """
+    Returns a value that changes when the folder a recorded dependency refers to changes, None if it doesn't exist.
+    Filename lists are revalidated through the filename list cache, directories by their mtime.
+    """
+    kind, name = dependency
+    if kind == "filename_list":
+        try:
+            get_filename_list(name)
+        except KeyError:
+            return None
+        out = cache_helper.get(name)
+        if out is None:
+            out = filename_list_cache.get(name)
+        return None if out is None else out[2]
+    if kind == "directory":
+        try:
+            return os.stat(name).st_mtime_ns
+        except OSError:
+            return None
+    return object()
+
+hash_functions = {
+    "md5": hashlib.md5,
+    "sha1": hashlib.sha1,
+    "sha256": hashlib.sha256,
+    "sha512": hashlib.sha512,
+    "blake2b": hashlib.blake2b,
+}
+
+def get_hash_function(name: str):
+    """
+    Returns the hashlib style constructor of a --default-hashing-function choice. xxh3 (a fast non cryptographic hash)
+    needs the xxhash package and falls back to blake2b without it.
+    """
+    if name == "xxh3":
+        try:
+            import xxhash
+            return xxhash.xxh3_128
+        except ImportError:
+            if "xxh3" not in hash_functions:
+                logging.warning("The xxh3 hashing function needs the xxhash package (pip install xxhash), using blake2b instead.")
+            hash_functions["xxh3"] = hashlib.blake2b
+    return hash_functions[name]
+
+def get_file_hash(path: str, hash_function: str | None = None) -> str:
+    """
+    Returns the hex digest of the content of a file. The file is only read again when its inode, size or mtime changed
+    since the last call, so this is cheap enough for IS_CHANGED. hash_function defaults to --default-hashing-function.
+    """
+    if hash_function is None:
+        hash_function = args.default_hashing_function
+    stat = os.stat(path)
+    key = (hash_function, stat.st_ino, stat.st_size, stat.st_mtime_ns)
+    path = os.path.abspath(path)
+    cached = file_hash_cache.get(path)
+    if cached is not None and cached[0] == key:
+        return cached[1]
+
+    m = get_hash_function(hash_function)()
+    with open(path, "rb") as f:
+        while chunk := f.read(1024 * 1024):
+            m.update(chunk)
+    digest = m.hexdigest()
+
+    stat = os.stat(path)
+    # don't keep the digest of a file that changed while it was being read
+    if key == (hash_function, stat.st_ino, stat.st_size, stat.st_mtime_ns):
+        with file_hash_lock:
+            file_hash_cache.pop(path, None)
+            if len(file_hash_cache) >= MAX_FILE_HASH_CACHE_SIZE:
+                file_hash_cache.pop(next(iter(file_hash_cache)))
+            file_hash_cache[path] = (key, digest)
+    return digest
+
+class DirectoryHashIndex:
+    """
+    Content hashes of the files directly in a directory (an upload folder), so an upload can be matched against the
+    existing files with a dictionary lookup. The directory is only listed again when its mtime changes and a file is
+    only hashed again when its inode, size or mtime change.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.hash_function = None
+        self.mtime_ns = None
+        # file name -> ((st_ino, st_size, st_mtime_ns), hex digest)
+        self.files: dict[str, tuple[tuple[int, int, int], str]] = {}
+        # hex digest -> first file name with that content
+        self.by_hash: dict[str, str] = {}
+        self.lock = threading.Lock()
+
+    def hash_file(self, name: str, stat: os.stat_result) -> str:
+        key = (stat.st_ino, stat.st_size, stat.st_mtime_ns)
+        entry = self.files.get(name)
+        if entry is None or entry[0] != key:
+            entry = (key, get_file_hash(os.path.join(self.directory, name), self.hash_function))
+            self.files[name] = entry
+        return entry[1]
+
+    def refresh(self) -> None:
+        hash_function = args.default_hashing_function
+        try:
+            mtime_ns = os.stat(self.directory).st_mtime_ns
+        except OSError:
+            mtime_ns = None
+        if hash_function == self.hash_function and mtime_ns == self.mtime_ns:
+            return
+        if hash_function != self.hash_function:
+            self.hash_function = hash_function
+            self.files = {}
+
+        old_files = self.files
+        self.files = {}
+        self.by_hash = {}
+        self.mtime_ns = mtime_ns
+        if mtime_ns is None:
+            return
+        with os.scandir(self.directory) as it:
+            entries = sorted((e for e in it if not e.name.startswith(".")), key=lambda e: e.name)
+        for entry in entries:
+            try:
+                if not entry.is_file():
+                    continue
+                stat = entry.stat()
+                if entry.name in old_files:
+                    self.files[entry.name] = old_files[entry.name]
+                digest = self.hash_file(entry.name, stat)
+            except OSError:
+                continue
+            self.by_hash.setdefault(digest, entry.name)
+
+    def get_hash(self, name: str) -> str | None:
+        """Hex digest of a file of the directory, None if it doesn't exist."""
+        with self.lock:
+            self.refresh()
+            try:
+                return self.hash_file(name, os.stat(os.path.join(self.directory, name)))
+            except OSError:
+                return None
+
+    def find(self, digest: str) -> str | None:
+        """Name of a file of the directory with this content, None if there is none."""
+        with self.lock:
+            self.refresh()
+            name = self.by_hash.get(digest)
+            if name is None:
+                return None
+            try:
+                # the file could have been modified in place since the directory was listed
+                if self.hash_file(name, os.stat(os.path.join(self.directory, name))) == digest:
+                    return name
+            except OSError:
+                pass
+            del self.by_hash[digest]
+            return None
+
+    def add(self, name: str, digest: str) -> None:
+        """Records the hash of a file that was just written to the directory, so it doesn't need to be read."""
+        with self.lock:
+            try:
+                stat = os.stat(os.path.join(self.directory, name))
+            except OSError:
+                return
+            if self.hash_function == args.default_hashing_function:
+                self.files[name] = ((stat.st_ino, stat.st_size, stat.st_mtime_ns), digest)
+            self.refresh()
+            if name in self.files and self.files[name][1] == digest:
+                self.by_hash.setdefault(digest, name)
+
+directory_hash_indexes: dict[str, DirectoryHashIndex] = {}
+directory_hash_indexes_lock = threading.Lock()
+
+def get_directory_hash_index(directory: str) -> DirectoryHashIndex:
+    """Returns the shared content hash index of the files directly in directory."""
+    directory = os.path.abspath(directory)
+    with directory_hash_indexes_lock:
+        index = directory_hash_indexes.get(directory)
+        if index is None:
+            index = DirectoryHashIndex(directory)
+            directory_hash_indexes[directory] = index
+        return index
+
+def get_save_image_path(filename_prefix: str, output_dir: str, image_width=0, image_height=0, count=1) -> tuple[str, str, int, str, str]:
+    """
+    Returns the folder, file name, first counter, subfolder and prefix of a save. count is the number of files the
+    node writes with this prefix, the counters from the returned one to counter + count - 1 are reserved for it.
+    """
     def map_filename(filename: str) -> tuple[int, str]:
         prefix_len = len(os.path.basename(filename_prefix))
         prefix = filename[:prefix_len + 1]
@@ -392,21 +713,62 @@ def get_save_image_path(filename_prefix: str, output_dir: str, image_width=0, im
         logging.error(err)
         raise Exception(err)
 
-    try:
-        counter = max(filter(lambda a: os.path.normcase(a[1][:-1]) == os.path.normcase(filename) and a[1][-1] == "_", map(map_filename, os.listdir(full_output_folder))))[0] + 1
-    except ValueError:
-        counter = 1
-    except FileNotFoundError:
-        os.makedirs(full_output_folder, exist_ok=True)
-        counter = 1
+    def scan_counter() -> int:
+        try:
+            return max(filter(lambda a: os.path.normcase(a[1][:-1]) == os.path.normcase(filename) and a[1][-1] == "_", map(map_filename, os.listdir(full_output_folder))))[0]
+        except ValueError:
+            return 0
+
+    key = save_counter_key(full_output_folder, filename)
+    with save_counter_lock:
+        try:
+            mtime = os.stat(full_output_folder).st_mtime_ns
+        except FileNotFoundError:
+            os.makedirs(full_output_folder, exist_ok=True)
+            mtime = os.stat(full_output_folder).st_mtime_ns
+
+        cached = save_counter_cache.get(key)
+        if cached is None:
+            # first save with this prefix, seed from the files on disk
+            cached = [mtime, scan_counter()]
+            save_counter_cache[key] = cached
+        elif cached[0] != mtime:
+            # the folder changed, the counters handed out to saves that didn't create their files yet are kept
+            cached[0] = mtime
+            cached[1] = max(cached[1], scan_counter())
+        # hand out the counters even before the files exist so concurrent saves don't get the same ones
+        counter = cached[1] + 1
+        cached[1] += max(1, count)
     return full_output_folder, filename, counter, subfolder, filename_prefix
 
+def save_counter_key(full_output_folder: str, filename: str) -> tuple[str, str]:
+    return os.path.normcase(os.path.abspath(full_output_folder)), os.path.normcase(filename)
+
+def update_save_image_counter(full_output_folder: str, filename: str, counter: int) -> None:
+    """
+    Records that a save node created its files in full_output_folder up to counter (the last counter it used), call it
+    right after the files are created. The folder mtime they produced is recorded so the next get_save_image_path with
+    the same prefix doesn't list the folder again, only a change made after that triggers a rescan.
+    """
+    key = save_counter_key(full_output_folder, filename)
+    with save_counter_lock:
+        cached = save_counter_cache.get(key)
+        if cached is None:
+            return
+        try:
+            cached[0] = os.stat(full_output_folder).st_mtime_ns
+        except FileNotFoundError:
+            save_counter_cache.pop(key, None)
+            return
+        cached[1] = max(cached[1], counter)
+
 def get_input_subfolders() -> list[str]:
     """Returns a list of all subfolder paths in the input directory, recursively.
 
     Returns:
         List of folder paths relative to the input directory, excluding the root directory
     """
+    record_dependency("volatile", None) # nested folders are not covered by the input directory mtime
     input_dir = get_input_directory()
     folders = []
 
@@ -1,4 +1,6 @@
 import torch
+import os
+import threading
 from PIL import Image
 from comfy.cli_args import args, LatentPreviewMethod
 from comfy.taesd.taesd import TAESD
@@ -9,6 +11,9 @@ import logging
 
 MAX_PREVIEW_RESOLUTION = args.preview_size
 
+# (latent format class, device, method) -> (previewer, taesd decoder path, decoder mtime)
+previewer_cache = {}
+
 def preview_to_image(latent_image):
         latents_ubyte = (((latent_image + 1.0) / 2.0).clamp(0, 1)  # change scale from -1..1 to 0..1
                             .mul(0xFF)  # to 0..255
@@ -30,10 +35,12 @@ class LatentPreviewer:
 class TAESDPreviewerImpl(LatentPreviewer):
     def __init__(self, taesd):
         self.taesd = taesd
+        self.dtype = next(taesd.parameters()).dtype
+        self.device = next(taesd.parameters()).device
 
     def decode_latent_to_preview(self, x0):
-        x_sample = self.taesd.decode(x0[:1])[0].movedim(0, 2)
-        return preview_to_image(x_sample)
+        x_sample = self.taesd.decode(x0[:1].to(device=self.device, dtype=self.dtype))[0].movedim(0, 2)
+        return preview_to_image(x_sample.float())
 
 
 class Latent2RGBPreviewer(LatentPreviewer):
@@ -59,41 +66,137 @@ class Latent2RGBPreviewer(LatentPreviewer):
         return preview_to_image(latent_image)
 
 
-def get_previewer(device, latent_format):
+def create_previewer(device, latent_format, method):
     previewer = None
-    method = args.preview_method
-    if method != LatentPreviewMethod.NoPreviews:
-        # TODO previewer methods
+    taesd_decoder_path = None
+    if latent_format.taesd_decoder_name is not None:
+        taesd_decoder_path = next(
+            (fn for fn in folder_paths.get_filename_list("vae_approx")
+                if fn.startswith(latent_format.taesd_decoder_name)),
+            ""
+        )
+        taesd_decoder_path = folder_paths.get_full_path("vae_approx", taesd_decoder_path)
+
+    if method == LatentPreviewMethod.TAESD:
+        if taesd_decoder_path:
+            dtype = comfy.model_management.vae_dtype(device, [torch.float16, torch.float32])
+            taesd = TAESD(None, taesd_decoder_path, latent_channels=latent_format.latent_channels).to(device=device, dtype=dtype)
+            taesd.requires_grad_(False)
+            previewer = TAESDPreviewerImpl(taesd)
+        else:
+            logging.warning("Warning: TAESD previews enabled, but could not find models/vae_approx/{}".format(latent_format.taesd_decoder_name))
+            taesd_decoder_path = None
+
+    if previewer is None:
         taesd_decoder_path = None
-        if latent_format.taesd_decoder_name is not None:
-            taesd_decoder_path = next(
-                (fn for fn in folder_paths.get_filename_list("vae_approx")
-                    if fn.startswith(latent_format.taesd_decoder_name)),
-                ""
-            )
-            taesd_decoder_path = folder_paths.get_full_path("vae_approx", taesd_decoder_path)
-
-        if method == LatentPreviewMethod.Auto:
-            method = LatentPreviewMethod.Latent2RGB
-
-        if method == LatentPreviewMethod.TAESD:
-            if taesd_decoder_path:
-                taesd = TAESD(None, taesd_decoder_path, latent_channels=latent_format.latent_channels).to(device)
-                previewer = TAESDPreviewerImpl(taesd)
-            else:
-                logging.warning("Warning: TAESD previews enabled, but could not find models/vae_approx/{}".format(latent_format.taesd_decoder_name))
-
-        if previewer is None:
-            if latent_format.latent_rgb_factors is not None:
-                previewer = Latent2RGBPreviewer(latent_format.latent_rgb_factors, latent_format.latent_rgb_factors_bias)
+        if latent_format.latent_rgb_factors is not None:
+            previewer = Latent2RGBPreviewer(latent_format.latent_rgb_factors, latent_format.latent_rgb_factors_bias)
+    return previewer, taesd_decoder_path
+
+def previewer_cache_valid(method, taesd_decoder_path, mtime):
+    if taesd_decoder_path is not None:
+        try:
+            return os.path.getmtime(taesd_decoder_path) == mtime
+        except OSError:
+            return False
+    if method == LatentPreviewMethod.TAESD:
+        # the decoder was missing, look again only if the vae_approx folders changed
+        return folder_paths.cached_filename_list_("vae_approx") is not None
+    return True
+
+def get_previewer(device, latent_format):
+    method = args.preview_method
+    if method == LatentPreviewMethod.NoPreviews:
+        return None
+    if method == LatentPreviewMethod.Auto:
+        method = LatentPreviewMethod.Latent2RGB
+
+    key = (type(latent_format), str(device), method)
+    cached = previewer_cache.get(key)
+    if cached is not None and previewer_cache_valid(method, cached[1], cached[2]):
+        return cached[0]
+
+    previewer, taesd_decoder_path = create_previewer(device, latent_format, method)
+    mtime = None
+    if taesd_decoder_path is not None:
+        mtime = os.path.getmtime(taesd_decoder_path)
+    previewer_cache[key] = (previewer, taesd_decoder_path, mtime)
     return previewer
 
+class AsyncPreviewDecoder:
+    """
+    Decodes previews on a background thread (and CUDA stream) so the sampler doesn't wait for them. Only the latest
+    latent is kept when the decoder falls behind, the newest finished preview is returned by each submit.
+    """
+    def __init__(self, previewer, preview_format):
+        self.previewer = previewer
+        self.preview_format = preview_format
+        self.condition = threading.Condition()
+        self.pending = None
+        self.preview = None
+        self.closed = True
+        self.start()
+
+    def start(self):
+        self.closed = False
+        threading.Thread(target=self.run, daemon=True, name="preview_decoder").start()
+
+    def submit(self, x0):
+        x0 = x0[:1].clone()
+        event = None
+        if comfy.model_management.is_device_cuda(x0.device):
+            event = torch.cuda.Event()
+            event.record()
+        with self.condition:
+            if self.closed: # the thread stops after a minute without previews
+                self.start()
+            self.pending = (x0, event)
+            self.condition.notify()
+            return self.preview
+
+    def run(self):
+        stream = None
+        with torch.inference_mode():
+            while True:
+                with self.condition:
+                    while self.pending is None and not self.closed:
+                        if not self.condition.wait(timeout=60.0):
+                            self.closed = True
+                    if self.pending is None:
+                        return
+                    x0, event = self.pending
+                    self.pending = None
+                try:
+                    if event is not None:
+                        if stream is None:
+                            stream = torch.cuda.Stream(x0.device)
+                        stream.wait_event(event)
+                        with torch.cuda.stream(stream):
+                            preview = self.previewer.decode_latent_to_preview_image(self.preview_format, x0)
+                    else:
+                        preview = self.previewer.decode_latent_to_preview_image(self.preview_format, x0)
+                except Exception as e:
+                    logging.warning("Error decoding the preview: {}".format(e))
+                    preview = None
+                with self.condition:
+                    if preview is not None:
+                        self.preview = preview
+
+    def close(self):
+        with self.condition:
+            self.closed = True
+            self.pending = None
+            self.condition.notify()
+
 def prepare_callback(model, steps, x0_output_dict=None):
     preview_format = "JPEG"
     if preview_format not in ["JPEG", "PNG"]:
         preview_format = "JPEG"
 
     previewer = get_previewer(model.load_device, model.model.latent_format)
+    async_decoder = None
+    if previewer and args.async_preview_decode:
+        async_decoder = AsyncPreviewDecoder(previewer, preview_format)
 
     pbar = comfy.utils.ProgressBar(steps)
     def callback(step, x0, x, total_steps):
@@ -101,7 +204,11 @@ def prepare_callback(model, steps, x0_output_dict=None):
             x0_output_dict["x0"] = x0
 
         preview_bytes = None
-        if previewer:
+        if async_decoder is not None:
+            preview_bytes = async_decoder.submit(x0)
+            if step + 1 >= total_steps:
+                async_decoder.close()
+        elif previewer:
             preview_bytes = previewer.decode_latent_to_preview_image(preview_format, x0)
         pbar.update_absolute(step + 1, total_steps, preview_bytes)
     return callback
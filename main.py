@@ -122,6 +122,11 @@ if __name__ == "__main__":
         if 'CUBLAS_WORKSPACE_CONFIG' not in os.environ:
             os.environ['CUBLAS_WORKSPACE_CONFIG'] = ":4096:8"
 
+    if args.torch_compile_cache:
+        torch_compile_cache_dir = os.path.join(folder_paths.get_user_directory(), "torch_compile_cache")
+        os.environ.setdefault('TORCHINDUCTOR_CACHE_DIR', os.path.join(torch_compile_cache_dir, "inductor"))
+        os.environ.setdefault('TRITON_CACHE_DIR', os.path.join(torch_compile_cache_dir, "triton"))
+
     import cuda_malloc
 
 import comfy.utils
@@ -246,6 +251,13 @@ def setup_database():
         logging.error(f"Failed to initialize database. Please ensure you have installed the latest requirements. If the error persists, please report this as in future the database will be required: {e}")
 
 
+def setup_torch_compile_cache():
+    if not args.torch_compile_cache:
+        return
+    from comfy_api.torch_helpers import setup_torch_compile_cache
+    setup_torch_compile_cache(os.path.join(folder_paths.get_user_directory(), "torch_compile_cache"))
+
+
 def start_comfyui(asyncio_loop=None):
     """
     Starts the ComfyUI server using the provided asyncio event loop or creates a new one.
@@ -275,6 +287,7 @@ def start_comfyui(asyncio_loop=None):
 
     cuda_malloc_warning()
     setup_database()
+    setup_torch_compile_cache()
 
     prompt_server.add_routes()
     hijack_progress(prompt_server)
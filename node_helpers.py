@@ -1,7 +1,7 @@
-import hashlib
 import torch
 
 from comfy.cli_args import args
+import folder_paths
 
 from PIL import ImageFile, UnidentifiedImageError
 
@@ -35,13 +35,7 @@ def pillow(fn, arg):
     return x
 
 def hasher():
-    hashfuncs = {
-        "md5": hashlib.md5,
-        "sha1": hashlib.sha1,
-        "sha256": hashlib.sha256,
-        "sha512": hashlib.sha512
-    }
-    return hashfuncs[args.default_hashing_function]
+    return folder_paths.get_hash_function(args.default_hashing_function)
 
 def string_to_torch_dtype(string):
     if string == "fp32":
@@ -4,7 +4,6 @@ import torch
 import os
 import sys
 import json
-import hashlib
 import traceback
 import math
 import time
@@ -37,6 +36,8 @@ import importlib
 import folder_paths
 import latent_preview
 import node_helpers
+from comfy_execution.output_writer import get_output_writer
+from comfy_execution.node_registry import NodeClassMappings, node_registry
 
 def before_node_execution():
     comfy.model_management.throw_exception_if_processing_interrupted()
@@ -496,6 +497,7 @@ class SaveLatent:
         output["latent_format_version_0"] = torch.tensor([])
 
         comfy.utils.save_torch_file(output, file, metadata=metadata)
+        folder_paths.update_save_image_counter(full_output_folder, filename, counter)
         return { "ui": { "latents": results } }
 
 
@@ -523,10 +525,7 @@ class LoadLatent:
     @classmethod
     def IS_CHANGED(s, latent):
         image_path = folder_paths.get_annotated_filepath(latent)
-        m = hashlib.sha256()
-        with open(image_path, 'rb') as f:
-            m.update(f.read())
-        return m.digest().hex()
+        return folder_paths.get_file_hash(image_path)
 
     @classmethod
     def VALIDATE_INPUTS(s, latent):
@@ -1578,23 +1577,25 @@ class SaveImage:
 
     def save_images(self, images, filename_prefix="ComfyUI", prompt=None, extra_pnginfo=None):
         filename_prefix += self.prefix_append
-        full_output_folder, filename, counter, subfolder, filename_prefix = folder_paths.get_save_image_path(filename_prefix, self.output_dir, images[0].shape[1], images[0].shape[0])
+        full_output_folder, filename, counter, subfolder, filename_prefix = folder_paths.get_save_image_path(filename_prefix, self.output_dir, images[0].shape[1], images[0].shape[0], len(images))
         results = list()
-        for (batch_number, image) in enumerate(images):
-            i = 255. * image.cpu().numpy()
-            img = Image.fromarray(np.clip(i, 0, 255).astype(np.uint8))
-            metadata = None
-            if not args.disable_metadata:
-                metadata = PngInfo()
-                if prompt is not None:
-                    metadata.add_text("prompt", json.dumps(prompt))
-                if extra_pnginfo is not None:
-                    for x in extra_pnginfo:
-                        metadata.add_text(x, json.dumps(extra_pnginfo[x]))
+        metadata = None
+        if not args.disable_metadata:
+            metadata = PngInfo()
+            if prompt is not None:
+                metadata.add_text("prompt", json.dumps(prompt))
+            if extra_pnginfo is not None:
+                for x in extra_pnginfo:
+                    metadata.add_text(x, json.dumps(extra_pnginfo[x]))
 
+        # convert on the device the images are on, only the uint8 pixels get copied to the cpu
+        images = (images * 255.).clamp(0, 255).to(torch.uint8).cpu().numpy()
+        output_writer = get_output_writer()
+        compress_level = self.compress_level
+        for (batch_number, image) in enumerate(images):
             filename_with_batch_num = filename.replace("%batch_num%", str(batch_number))
             file = f"{filename_with_batch_num}_{counter:05}_.png"
-            img.save(os.path.join(full_output_folder, file), pnginfo=metadata, compress_level=self.compress_level)
+            output_writer.submit(os.path.join(full_output_folder, file), lambda path, image=image: Image.fromarray(image).save(path, pnginfo=metadata, compress_level=compress_level))
             results.append({
                 "filename": file,
                 "subfolder": subfolder,
@@ -1602,6 +1603,7 @@ class SaveImage:
             })
             counter += 1
 
+        folder_paths.update_save_image_counter(full_output_folder, filename, counter - 1)
         return { "ui": { "images": results } }
 
 class PreviewImage(SaveImage):
@@ -1682,10 +1684,7 @@ class LoadImage:
     @classmethod
     def IS_CHANGED(s, image):
         image_path = folder_paths.get_annotated_filepath(image)
-        m = hashlib.sha256()
-        with open(image_path, 'rb') as f:
-            m.update(f.read())
-        return m.digest().hex()
+        return folder_paths.get_file_hash(image_path)
 
     @classmethod
     def VALIDATE_INPUTS(s, image):
@@ -1731,10 +1730,7 @@ class LoadImageMask:
     @classmethod
     def IS_CHANGED(s, image, channel):
         image_path = folder_paths.get_annotated_filepath(image)
-        m = hashlib.sha256()
-        with open(image_path, 'rb') as f:
-            m.update(f.read())
-        return m.digest().hex()
+        return folder_paths.get_file_hash(image_path)
 
     @classmethod
     def VALIDATE_INPUTS(s, image):
@@ -1934,7 +1930,7 @@ class ImagePadForOutpaint:
         return (new_image, mask.unsqueeze(0))
 
 
-NODE_CLASS_MAPPINGS = {
+NODE_CLASS_MAPPINGS = NodeClassMappings({
     "KSampler": KSampler,
     "CheckpointLoaderSimple": CheckpointLoaderSimple,
     "CLIPTextEncode": CLIPTextEncode,
@@ -2002,7 +1998,7 @@ NODE_CLASS_MAPPINGS = {
     "ConditioningZeroOut": ConditioningZeroOut,
     "ConditioningSetTimestepRange": ConditioningSetTimestepRange,
     "LoraLoaderModelOnly": LoraLoaderModelOnly,
-}
+})
 
 NODE_DISPLAY_NAME_MAPPINGS = {
     # Sampling
@@ -2165,6 +2161,26 @@ def load_custom_node(module_path: str, ignore=set(), module_parent="custom_nodes
         logging.warning(f"Cannot import {module_path} module for custom nodes: {e}")
         return False
 
+def load_builtin_node_module(module_path: str, module_parent: str) -> bool:
+    """
+    Imports a built-in node module. With --lazy-node-loading a module that didn't change since it was last imported
+    only has its node classes registered, the import happens the first time one of them is used.
+    """
+    if not args.lazy_node_loading:
+        return load_custom_node(module_path, module_parent=module_parent)
+
+    def load():
+        before = set(dict.keys(NODE_CLASS_MAPPINGS))
+        success = load_custom_node(module_path, module_parent=module_parent)
+        if success:
+            # (re)written to the registry the next time /object_info is built
+            node_registry.imported(module_path, [name for name in dict.keys(NODE_CLASS_MAPPINGS) if name not in before])
+        return success
+
+    if node_registry.register_module(module_path, load, NODE_CLASS_MAPPINGS, NODE_DISPLAY_NAME_MAPPINGS):
+        return True
+    return load()
+
 def init_external_custom_nodes():
     """
     Initializes the external custom nodes.
@@ -2175,9 +2191,11 @@ def init_external_custom_nodes():
     Returns:
         None
     """
+    from app.custom_node_import import prefetch_custom_node_imports, write_import_time_report
+
     base_node_names = set(NODE_CLASS_MAPPINGS.keys())
     node_paths = folder_paths.get_folder_paths("custom_nodes")
-    node_import_times = []
+    module_paths = []
     for custom_node_path in node_paths:
         possible_modules = os.listdir(os.path.realpath(custom_node_path))
         if "__pycache__" in possible_modules:
@@ -2187,9 +2205,19 @@ def init_external_custom_nodes():
             module_path = os.path.join(custom_node_path, possible_module)
             if os.path.isfile(module_path) and os.path.splitext(module_path)[1] != ".py": continue
             if module_path.endswith(".disabled"): continue
-            time_before = time.perf_counter()
-            success = load_custom_node(module_path, base_node_names, module_parent="custom_nodes")
-            node_import_times.append((time.perf_counter() - time_before, module_path, success))
+            module_paths.append(module_path)
+
+    prefetch_report = None
+    if args.custom_node_import_workers > 0 and len(module_paths) > 0:
+        prefetch_report = prefetch_custom_node_imports(module_paths, args.custom_node_import_workers)
+
+    # the node classes are always registered in the same order, one package at a time
+    node_import_times = []
+    for module_path in module_paths:
+        node_count = len(NODE_CLASS_MAPPINGS)
+        time_before = time.perf_counter()
+        success = load_custom_node(module_path, base_node_names, module_parent="custom_nodes")
+        node_import_times.append((time.perf_counter() - time_before, module_path, success, len(NODE_CLASS_MAPPINGS) - node_count))
 
     if len(node_import_times) > 0:
         logging.info("\nImport times for custom nodes:")
@@ -2200,6 +2228,7 @@ def init_external_custom_nodes():
                 import_message = " (IMPORT FAILED)"
             logging.info("{:6.1f} seconds{}: {}".format(n[0], import_message, n[1]))
         logging.info("")
+        write_import_time_report(node_import_times, prefetch_report)
 
 def init_builtin_extra_nodes():
     """
@@ -2283,7 +2312,7 @@ def init_builtin_extra_nodes():
 
     import_failed = []
     for node_file in extras_files:
-        if not load_custom_node(os.path.join(extras_dir, node_file), module_parent="comfy_extras"):
+        if not load_builtin_node_module(os.path.join(extras_dir, node_file), module_parent="comfy_extras"):
             import_failed.append(node_file)
 
     return import_failed
@@ -2314,7 +2343,7 @@ def init_builtin_api_nodes():
 
     import_failed = []
     for node_file in api_nodes_files:
-        if not load_custom_node(os.path.join(api_nodes_dir, node_file), module_parent="comfy_api_nodes"):
+        if not load_builtin_node_module(os.path.join(api_nodes_dir, node_file), module_parent="comfy_api_nodes"):
             import_failed.append(node_file)
 
     return import_failed
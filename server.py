@@ -14,6 +14,11 @@ import struct
 import ssl
 import socket
 import ipaddress
+import collections
+import threading
+import shutil
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
 from PIL import Image, ImageOps
 from PIL.PngImagePlugin import PngInfo
 from io import BytesIO
@@ -27,26 +32,137 @@ from comfy.cli_args import args
 import comfy.utils
 import comfy.model_management
 import node_helpers
+from comfy_execution.output_writer import get_output_writer
 from comfyui_version import __version__
 from app.frontend_management import FrontendManager
 
 from app.user_manager import UserManager
 from app.model_manager import ModelFileManager
 from app.custom_node_manager import CustomNodeManager
+from app.node_info_cache import NodeInfoCache
+from comfy_execution.node_registry import node_registry
+from app.thumbnail_cache import thumbnail_cache
+from app.model_index import model_index
 from typing import Optional, Union
 from api_server.routes.internal.internal_routes import InternalRoutes
 
+# minimum time between two status messages sent because the queue changed
+QUEUE_STATUS_INTERVAL = 0.1
+
 class BinaryEventTypes:
     PREVIEW_IMAGE = 1
     UNENCODED_PREVIEW_IMAGE = 2
     TEXT = 3
 
+def encode_preview_image(image_data):
+    image_type = image_data[0]
+    image = image_data[1]
+    max_size = image_data[2]
+    if max_size is not None:
+        if hasattr(Image, 'Resampling'):
+            resampling = Image.Resampling.BILINEAR
+        else:
+            resampling = Image.Resampling.LANCZOS
+
+        image = ImageOps.contain(image, (max_size, max_size), resampling)
+    type_num = 1
+    if image_type == "JPEG":
+        type_num = 1
+    elif image_type == "PNG":
+        type_num = 2
+
+    bytesIO = BytesIO()
+    header = struct.pack(">I", type_num)
+    bytesIO.write(header)
+    image.save(bytesIO, format=image_type, quality=95, compress_level=1)
+    return bytesIO.getvalue()
+
+class PreviewFrame:
+    """An unencoded preview image that is encoded at most once no matter how many clients it is sent to."""
+    def __init__(self, image_data):
+        self.image_data = image_data
+        self.encoded = None
+
 async def send_socket_catch_exception(function, message):
     try:
         await function(message)
     except (aiohttp.ClientError, aiohttp.ClientPayloadError, ConnectionResetError, BrokenPipeError, ConnectionError) as err:
         logging.warning("send error: {}".format(err))
 
+# events that only show transient state, a client that can't keep up loses the oldest ones first
+DROPPABLE_EVENTS = {"progress", "logs", BinaryEventTypes.PREVIEW_IMAGE}
+# events of which only the newest one is worth sending, a client has at most one of them waiting
+REPLACEABLE_EVENTS = {BinaryEventTypes.PREVIEW_IMAGE}
+MAX_CLIENT_QUEUE_SIZE = 256
+
+# stands for the pending replaceable message in the queue of a ClientSender
+PENDING_PREVIEW = object()
+
+class ClientSender:
+    """
+    Outbound messages of one websocket client, sent by their own task so a slow client doesn't hold up the others.
+    When more than max_size messages are waiting the oldest droppable one is dropped, other messages are never dropped.
+    A replaceable message takes the place of the one still waiting, if any, so previews never pile up.
+    """
+    def __init__(self, ws, max_size=MAX_CLIENT_QUEUE_SIZE):
+        self.ws = ws
+        self.max_size = max_size
+        self.queue = collections.deque()
+        self.preview = None
+        self.ready = asyncio.Event()
+        self.closed = False
+        self.dropped = 0
+        self.task = asyncio.create_task(self.run())
+
+    def put(self, message, droppable=False, replaceable=False):
+        if self.closed:
+            return
+        if replaceable:
+            if self.preview is not None:
+                self.preview = message
+                self.dropped += 1
+                return
+        if len(self.queue) >= self.max_size:
+            for i, queued in enumerate(self.queue):
+                if queued[1]:
+                    if queued[0] is PENDING_PREVIEW:
+                        self.preview = None
+                    del self.queue[i]
+                    self.dropped += 1
+                    break
+            else:
+                if droppable:
+                    self.dropped += 1
+                    return
+        if replaceable:
+            # set after making room, the room may be made by dropping a pending preview
+            self.preview = message
+            message = PENDING_PREVIEW
+        self.queue.append((message, droppable))
+        self.ready.set()
+
+    async def run(self):
+        while not self.closed:
+            while len(self.queue) > 0 and not self.closed:
+                message, _ = self.queue.popleft()
+                if message is PENDING_PREVIEW:
+                    message = self.preview
+                    self.preview = None
+                if isinstance(message, str):
+                    await send_socket_catch_exception(self.ws.send_str, message)
+                else:
+                    await send_socket_catch_exception(self.ws.send_bytes, message)
+            self.ready.clear()
+            await self.ready.wait()
+
+    def close(self):
+        self.closed = True
+        self.queue.clear()
+        self.preview = None
+        self.ready.set()
+        if self.dropped > 0:
+            logging.debug("websocket client was too slow, {} messages were dropped".format(self.dropped))
+
 @web.middleware
 async def cache_control(request: web.Request, handler):
     response: web.Response = await handler(request)
@@ -61,6 +177,8 @@ async def compress_body(request: web.Request, handler):
     response: web.Response = await handler(request)
     if not isinstance(response, web.Response):
         return response
+    if "Content-Encoding" in response.headers:
+        return response
     if response.content_type not in ["application/json", "text/plain"]:
         return response
     if response.body and "gzip" in accept_encoding:
@@ -147,6 +265,71 @@ def create_origin_only_middleware():
 
     return origin_only_middleware
 
+def get_umask():
+    umask = os.umask(0)
+    os.umask(umask)
+    return umask
+
+# mode of the files created with open(), mkstemp creates them readable by their owner only
+UPLOAD_FILE_MODE = 0o666 & ~get_umask()
+
+class UploadedFile:
+    """A file field of a multipart upload, streamed to a temporary file and hashed while it was received."""
+
+    def __init__(self, filename: str, path: str, digest: str):
+        self.filename = filename
+        self.path = path
+        self.digest = digest
+        self.file = open(path, "rb")
+
+    def close(self):
+        self.file.close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+async def read_upload(request: web.Request, max_size: int) -> dict:
+    """
+    Reads a multipart upload without keeping it in memory: the file fields are written to the temp directory while
+    they are hashed with the --default-hashing-function. The returned dict can be used like the one of request.post()
+    and the UploadedFile values have to be closed.
+    """
+    post = {}
+    size = 0
+    try:
+        reader = await request.multipart()
+        while (part := await reader.next()) is not None:
+            if part.filename is None:
+                post[part.name] = await part.text()
+                continue
+            m = node_helpers.hasher()()
+            temp_dir = folder_paths.get_temp_directory()
+            os.makedirs(temp_dir, exist_ok=True)
+            fd, path = tempfile.mkstemp(prefix="upload_", dir=temp_dir)
+            # the file is moved to the upload folder as is
+            os.chmod(path, UPLOAD_FILE_MODE)
+            with os.fdopen(fd, "wb") as f:
+                try:
+                    while chunk := await part.read_chunk(1024 * 1024):
+                        size += len(chunk)
+                        if size > max_size:
+                            raise web.HTTPRequestEntityTooLarge(max_size=max_size, actual_size=size)
+                        m.update(chunk)
+                        f.write(chunk)
+                except BaseException:
+                    f.close()
+                    os.remove(path)
+                    raise
+            post[part.name] = UploadedFile(part.filename, path, m.hexdigest())
+    except BaseException:
+        close_upload(post)
+        raise
+    return post
+
+def close_upload(post: dict):
+    for value in post.values():
+        if isinstance(value, UploadedFile):
+            value.close()
+
 class PromptServer():
     def __init__(self, loop):
         PromptServer.instance = self
@@ -163,6 +346,17 @@ class PromptServer():
         self.prompt_queue = execution.PromptQueue(self)
         self.loop = loop
         self.messages = asyncio.Queue()
+        # asyncio queues of the /history/stream requests, receiving the ids of the prompts that finished
+        self.history_listeners = set()
+        # /queue response of the last queue version, the prefix keeps ETags from matching across restarts
+        self.queue_etag_prefix = uuid.uuid4().hex[:8]
+        self.queue_body = None
+        self.status_pending = False
+        self.last_status_time = 0.0
+        self.preview_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="preview_encoder")
+        self.pending_previews = {}
+        self.preview_senders = set()
+        self.preview_last_sent = {}
         self.client_session:Optional[aiohttp.ClientSession] = None
         self.number = 0
 
@@ -176,8 +370,10 @@ class PromptServer():
             middlewares.append(create_origin_only_middleware())
 
         max_upload_size = round(args.max_upload_size * 1024 * 1024)
+        self.max_upload_size = max_upload_size
         self.app = web.Application(client_max_size=max_upload_size, middlewares=middlewares)
         self.sockets = dict()
+        self.client_senders = dict()
         self.web_root = (
             FrontendManager.init_frontend(args.front_end_version)
             if args.front_end_root is None
@@ -199,10 +395,15 @@ class PromptServer():
             if sid:
                 # Reusing existing session, remove old
                 self.sockets.pop(sid, None)
+                old_sender = self.client_senders.pop(sid, None)
+                if old_sender is not None:
+                    old_sender.close()
             else:
                 sid = uuid.uuid4().hex
 
             self.sockets[sid] = ws
+            sender = ClientSender(ws)
+            self.client_senders[sid] = sender
 
             try:
                 # Send initial state to the new client
@@ -215,7 +416,10 @@ class PromptServer():
                     if msg.type == aiohttp.WSMsgType.ERROR:
                         logging.warning('ws connection closed with exception %s' % ws.exception())
             finally:
-                self.sockets.pop(sid, None)
+                if self.sockets.get(sid) is ws:
+                    self.sockets.pop(sid, None)
+                    self.client_senders.pop(sid, None)
+                sender.close()
             return ws
 
         @routes.get("/")
@@ -272,21 +476,14 @@ class PromptServer():
 
             return type_dir, dir_type
 
-        def compare_image_hash(filepath, image):
-            hasher = node_helpers.hasher()
-
-            # function to compare hashes of two images to see if it already exists, fix to #3465
-            if os.path.exists(filepath):
-                a = hasher()
-                b = hasher()
-                with open(filepath, "rb") as f:
-                    a.update(f.read())
-                    b.update(image.file.read())
-                    image.file.seek(0)
-                return a.hexdigest() == b.hexdigest()
-            return False
+        # uploads run in executor threads, picking a free file name and writing it has to be atomic
+        upload_lock = threading.Lock()
 
         def image_upload(post, image_save_function=None):
+            with upload_lock:
+                return image_upload_locked(post, image_save_function)
+
+        def image_upload_locked(post, image_save_function=None):
             image = post.get("image")
             overwrite = post.get("overwrite")
             image_is_duplicate = False
@@ -294,7 +491,7 @@ class PromptServer():
             image_upload_type = post.get("type")
             upload_dir, image_upload_type = get_dir_by_type(image_upload_type)
 
-            if image and image.file:
+            if isinstance(image, UploadedFile):
                 filename = image.filename
                 if not filename:
                     return web.Response(status=400)
@@ -310,25 +507,34 @@ class PromptServer():
                     os.makedirs(full_output_folder)
 
                 split = os.path.splitext(filename)
+                hash_index = folder_paths.get_directory_hash_index(os.path.dirname(filepath))
 
                 if overwrite is not None and (overwrite == "true" or overwrite == "1"):
                     pass
                 else:
                     i = 1
                     while os.path.exists(filepath):
-                        if compare_image_hash(filepath, image): #compare hash to prevent saving of duplicates with same name, fix for #3465
+                        if hash_index.get_hash(os.path.basename(filepath)) == image.digest: #compare hash to prevent saving of duplicates with same name, fix for #3465
                             image_is_duplicate = True
                             break
                         filename = f"{split[0]} ({i}){split[1]}"
                         filepath = os.path.join(full_output_folder, filename)
                         i += 1
 
+                    # the same content uploaded under another name, the mask editor saves something else than the upload
+                    if not image_is_duplicate and image_save_function is None:
+                        existing = hash_index.find(image.digest)
+                        if existing is not None:
+                            filename = os.path.join(os.path.dirname(filename), existing)
+                            image_is_duplicate = True
+
                 if not image_is_duplicate:
                     if image_save_function is not None:
                         image_save_function(image, post, filepath)
                     else:
-                        with open(filepath, "wb") as f:
-                            f.write(image.file.read())
+                        image.file.close()
+                        shutil.move(image.path, filepath)
+                        hash_index.add(os.path.basename(filepath), image.digest)
 
                 return web.json_response({"name" : filename, "subfolder": subfolder, "type": image_upload_type})
             else:
@@ -336,13 +542,17 @@ class PromptServer():
 
         @routes.post("/upload/image")
         async def upload_image(request):
-            post = await request.post()
-            return image_upload(post)
+            post = await read_upload(request, self.max_upload_size)
+            try:
+                # hashing the files of the upload folder the first time can take a while
+                return await self.loop.run_in_executor(None, image_upload, post)
+            finally:
+                close_upload(post)
 
 
         @routes.post("/upload/mask")
         async def upload_mask(request):
-            post = await request.post()
+            post = await read_upload(request, self.max_upload_size)
 
             def image_save_function(image, post, filepath):
                 original_ref = json.loads(post.get("original_ref"))
@@ -384,7 +594,10 @@ class PromptServer():
                         original_pil.putalpha(new_alpha)
                         original_pil.save(filepath, compress_level=4, pnginfo=metadata)
 
-            return image_upload(post, image_save_function)
+            try:
+                return await self.loop.run_in_executor(None, image_upload, post, image_save_function)
+            finally:
+                close_upload(post)
 
         @routes.get("/view")
         async def view_image(request):
@@ -414,27 +627,43 @@ class PromptServer():
 
                 filename = os.path.basename(filename)
                 file = os.path.join(output_dir, filename)
+                await get_output_writer().wait_async(file)
 
                 if os.path.isfile(file):
-                    if 'preview' in request.rel_url.query:
-                        with Image.open(file) as img:
-                            preview_info = request.rel_url.query['preview'].split(';')
-                            image_format = preview_info[0]
-                            if image_format not in ['webp', 'jpeg'] or 'a' in request.rel_url.query.get('channel', ''):
-                                image_format = 'webp'
+                    if 'preview' in request.rel_url.query or 'max_size' in request.rel_url.query:
+                        preview_info = request.rel_url.query.get('preview', 'webp').split(';')
+                        image_format = preview_info[0]
+                        if image_format not in ['webp', 'jpeg'] or 'a' in request.rel_url.query.get('channel', ''):
+                            image_format = 'webp'
+
+                        quality = 90
+                        if preview_info[-1].isdigit():
+                            quality = int(preview_info[-1])
+
+                        max_size = None
+                        if request.rel_url.query.get('max_size', '').isdigit():
+                            max_size = max(1, int(request.rel_url.query['max_size']))
+
+                        mode = None
+                        if image_format in ['jpeg'] or request.rel_url.query.get('channel', '') == 'rgb':
+                            mode = "RGB"
 
-                            quality = 90
-                            if preview_info[-1].isdigit():
-                                quality = int(preview_info[-1])
+                        headers = {"Content-Disposition": f"filename=\"{filename}\""}
+                        if thumbnail_cache.enabled:
+                            thumbnail = await self.loop.run_in_executor(None, thumbnail_cache.get_file_thumbnail, file, image_format, quality, max_size, mode)
+                            return web.FileResponse(thumbnail, headers={**headers, "Content-Type": f"image/{image_format}"})
 
+                        with Image.open(file) as img:
+                            if mode is not None:
+                                img = img.convert(mode)
+                            if max_size is not None:
+                                img = ImageOps.contain(img, (max_size, max_size), Image.Resampling.BILINEAR)
                             buffer = BytesIO()
-                            if image_format in ['jpeg'] or request.rel_url.query.get('channel', '') == 'rgb':
-                                img = img.convert("RGB")
                             img.save(buffer, format=image_format, quality=quality)
                             buffer.seek(0)
 
                             return web.Response(body=buffer.read(), content_type=f'image/{image_format}',
-                                                headers={"Content-Disposition": f"filename=\"{filename}\""})
+                                                headers=headers)
 
                     if 'channel' not in request.rel_url.query:
                         channel = 'rgba'
@@ -505,6 +734,14 @@ class PromptServer():
             safetensors_path = folder_paths.get_full_path(folder_name, filename)
             if safetensors_path is None:
                 return web.Response(status=404)
+            if model_index.available():
+                try:
+                    entry = await asyncio.get_running_loop().run_in_executor(None, model_index.get, folder_name, filename)
+                    if entry is None or entry["metadata"] is None:
+                        return web.Response(status=404)
+                    return web.json_response(entry["metadata"])
+                except Exception as e:
+                    logging.warning("Could not get {} {} from the model index: {}".format(folder_name, filename, e))
             out = comfy.utils.safetensors_header(safetensors_path, max_size=1024*1024)
             if out is None:
                 return web.Response(status=404)
@@ -553,10 +790,17 @@ class PromptServer():
             return web.json_response(self.get_queue_info())
 
         def node_info(node_class):
+            if nodes.NODE_CLASS_MAPPINGS.is_lazy(node_class):
+                info = node_registry.get_info(node_class)
+                if info is not None:
+                    info = dict(info)
+                    info['display_name'] = nodes.NODE_DISPLAY_NAME_MAPPINGS.get(node_class, node_class)
+                    return info
             obj_class = nodes.NODE_CLASS_MAPPINGS[node_class]
             info = {}
-            info['input'] = obj_class.INPUT_TYPES()
-            info['input_order'] = {key: list(value.keys()) for (key, value) in obj_class.INPUT_TYPES().items()}
+            input_types = obj_class.INPUT_TYPES()
+            info['input'] = input_types
+            info['input_order'] = {key: list(value.keys()) for (key, value) in input_types.items()}
             info['output'] = obj_class.RETURN_TYPES
             info['output_is_list'] = obj_class.OUTPUT_IS_LIST if hasattr(obj_class, 'OUTPUT_IS_LIST') else [False] * len(obj_class.RETURN_TYPES)
             info['output_name'] = obj_class.RETURN_NAMES if hasattr(obj_class, 'RETURN_NAMES') else info['output']
@@ -585,32 +829,119 @@ class PromptServer():
                 info['api_node'] = obj_class.API_NODE
             return info
 
+        self.node_info_cache = NodeInfoCache(node_info, lambda: nodes.NODE_CLASS_MAPPINGS)
+
+        def is_refresh(request):
+            # the frontend refresh button, or anything that wants the node info rebuilt from scratch
+            return "refresh" in request.rel_url.query or "no-cache" in request.headers.get("Cache-Control", "")
+
         @routes.get("/object_info")
         async def get_object_info(request):
-            with folder_paths.cache_helper:
-                out = {}
-                for x in nodes.NODE_CLASS_MAPPINGS:
-                    try:
-                        out[x] = node_info(x)
-                    except Exception:
-                        logging.error(f"[ERROR] An error occurred while retrieving information for the '{x}' node.")
-                        logging.error(traceback.format_exc())
-                return web.json_response(out)
+            # the entries that need it are rebuilt by calling INPUT_TYPES, which can take a while
+            body, gzip_body, etag = await asyncio.get_running_loop().run_in_executor(None, self.node_info_cache.get_response, is_refresh(request))
+            if len(node_registry.pending) > 0:
+                await asyncio.get_running_loop().run_in_executor(None, node_registry.save, self.node_info_cache.get_cached, nodes.NODE_DISPLAY_NAME_MAPPINGS)
+            headers = {"ETag": etag, "Cache-Control": "no-cache", "Vary": "Accept-Encoding"}
+            if etag in request.headers.get("If-None-Match", ""):
+                return web.Response(status=304, headers=headers)
+            if "gzip" in request.headers.get("Accept-Encoding", ""):
+                headers["Content-Encoding"] = "gzip"
+                body = gzip_body
+            return web.Response(body=body, content_type="application/json", headers=headers)
+
+        @routes.get("/object_info_timings")
+        async def get_object_info_timings(request):
+            return web.json_response(self.node_info_cache.timing_report())
 
         @routes.get("/object_info/{node_class}")
         async def get_object_info_node(request):
             node_class = request.match_info.get("node_class", None)
             out = {}
             if (node_class is not None) and (node_class in nodes.NODE_CLASS_MAPPINGS):
-                out[node_class] = node_info(node_class)
+                if nodes.NODE_CLASS_MAPPINGS.is_lazy(node_class):
+                    await asyncio.get_running_loop().run_in_executor(None, nodes.NODE_CLASS_MAPPINGS.load, node_class)
+                info = await asyncio.get_running_loop().run_in_executor(None, self.node_info_cache.get_info, node_class, is_refresh(request))
+                if info is not None:
+                    out[node_class] = info
             return web.json_response(out)
 
+        def get_query_prompt_ids(query):
+            # ?prompt_ids=a,b or ?prompt_ids=a&prompt_ids=b
+            if "prompt_ids" not in query:
+                return None
+            return [i for ids in query.getall("prompt_ids") for i in ids.split(",") if i != ""]
+
         @routes.get("/history")
         async def get_history(request):
             max_items = request.rel_url.query.get("max_items", None)
             if max_items is not None:
                 max_items = int(max_items)
-            return web.json_response(self.prompt_queue.get_history(max_items=max_items))
+            prompt_ids = get_query_prompt_ids(request.rel_url.query)
+            batch_id = request.rel_url.query.get("batch_id", None)
+            return web.json_response(self.prompt_queue.get_history(max_items=max_items, prompt_ids=prompt_ids, batch_id=batch_id))
+
+        @routes.get("/history/stream")
+        async def get_history_stream(request):
+            """
+            Sends the history entries of the prompts as they finish, as newline delimited JSON or as server sent events
+            with ?format=sse. With ?prompt_ids= or ?batch_id= the entries of the prompts that already finished are sent
+            first and the response ends once all of them finished, otherwise it sends every prompt finishing from now on.
+            """
+            query = request.rel_url.query
+            sse = query.get("format", "ndjson") == "sse"
+            prompt_ids = get_query_prompt_ids(query)
+            batch_id = query.get("batch_id", None)
+
+            listener = asyncio.Queue()
+            self.history_listeners.add(listener)
+            response = web.StreamResponse(headers={"Content-Type": "text/event-stream" if sse else "application/x-ndjson",
+                                                   "Cache-Control": "no-cache"})
+            try:
+                await response.prepare(request)
+
+                async def send(prompt_id, entry):
+                    data = {"prompt_id": prompt_id}
+                    data.update((k, v) for k, v in entry.items() if k != "prompt")
+                    if sse:
+                        await response.write("event: prompt_done\ndata: {}\n\n".format(json.dumps(data)).encode("utf-8"))
+                    else:
+                        await response.write((json.dumps(data) + "\n").encode("utf-8"))
+
+                remaining = None
+                if batch_id is not None:
+                    batch_prompt_ids = self.prompt_queue.get_prompt_ids(batch_id=batch_id)
+                    prompt_ids = batch_prompt_ids if prompt_ids is None else [i for i in prompt_ids if i in set(batch_prompt_ids)]
+                if prompt_ids is not None:
+                    remaining = set(prompt_ids)
+                    for prompt_id, entry in self.prompt_queue.get_history(prompt_ids=prompt_ids).items():
+                        if prompt_id in remaining:
+                            remaining.discard(prompt_id)
+                            await send(prompt_id, entry)
+
+                while remaining is None or len(remaining) > 0:
+                    try:
+                        prompt_id = await asyncio.wait_for(listener.get(), timeout=15)
+                    except asyncio.TimeoutError:
+                        if remaining is not None:
+                            # prompts deleted from the queue or from the history will never finish
+                            known = set(self.prompt_queue.get_prompt_ids())
+                            remaining.intersection_update(known)
+                        if sse:
+                            await response.write(b": keepalive\n\n")
+                        continue
+                    if remaining is not None:
+                        if prompt_id not in remaining:
+                            continue
+                        remaining.discard(prompt_id)
+                    entry = self.prompt_queue.get_history(prompt_id=prompt_id).get(prompt_id)
+                    if entry is not None:
+                        await send(prompt_id, entry)
+                await response.write_eof()
+            except (ConnectionResetError, ConnectionError):
+                pass
+            finally:
+                self.history_listeners.discard(listener)
+            return response
 
         @routes.get("/history/{prompt_id}")
         async def get_history_prompt_id(request):
@@ -619,11 +950,19 @@ class PromptServer():
 
         @routes.get("/queue")
         async def get_queue(request):
-            queue_info = {}
-            current_queue = self.prompt_queue.get_current_queue_volatile()
-            queue_info['queue_running'] = current_queue[0]
-            queue_info['queue_pending'] = current_queue[1]
-            return web.json_response(queue_info)
+            version, running, queued = self.prompt_queue.get_queue_snapshot()
+            etag = '"{}-{}"'.format(self.queue_etag_prefix, version)
+            if request.headers.get("If-None-Match") == etag:
+                return web.Response(status=304, headers={"ETag": etag})
+            body = self.queue_body
+            if body is None or body[0] != etag:
+                queue_info = {}
+                queue_info['queue_running'] = running
+                queue_info['queue_pending'] = queued
+                queue_info['version'] = version
+                body = (etag, json.dumps(queue_info))
+                self.queue_body = body
+            return web.Response(text=body[1], content_type="application/json", headers={"ETag": etag})
 
         @routes.post("/prompt")
         async def post_prompt(request):
@@ -668,6 +1007,70 @@ class PromptServer():
                 }
                 return web.json_response({"error": error, "node_errors": {}}, status=400)
 
+        @routes.post("/prompts")
+        async def post_prompts(request):
+            """
+            Queues a list of prompts, each one like the body of POST /prompt, either as the body itself or as
+            {"prompts": [...], "batch_id": ..., "client_id": ...}. Either all of them are queued or none is. They are
+            tagged with the batch_id (a new one if not set), which can be used to filter /history and /history/stream.
+            """
+            json_data = await request.json()
+            if isinstance(json_data, list):
+                json_data = {"prompts": json_data}
+            prompts = json_data.get("prompts", None)
+            if not isinstance(prompts, list) or len(prompts) == 0:
+                error = {
+                    "type": "no_prompt",
+                    "message": "No prompts provided",
+                    "details": "No prompts provided",
+                    "extra_info": {}
+                }
+                return web.json_response({"error": error, "errors": []}, status=400)
+            logging.info("got {} prompts".format(len(prompts)))
+
+            batch_id = str(json_data.get("batch_id", uuid.uuid4()))
+            prompts = [self.trigger_on_prompt(p) for p in prompts]
+
+            def validate_prompts():
+                # the prompts of a batch mostly share their graph, see execution.ValidationCache
+                return [execution.validate_prompt(p["prompt"]) if isinstance(p, dict) and "prompt" in p else None for p in prompts]
+
+            valid = await self.loop.run_in_executor(None, validate_prompts)
+
+            errors = []
+            for i, v in enumerate(valid):
+                if v is None:
+                    errors.append({"index": i,
+                                   "error": {"type": "no_prompt", "message": "No prompt provided", "details": "No prompt provided", "extra_info": {}},
+                                   "node_errors": {}})
+                elif not v[0]:
+                    errors.append({"index": i, "error": v[1], "node_errors": v[3]})
+            if len(errors) > 0:
+                logging.warning("invalid prompts in batch {}: {}".format(batch_id, [e["error"] for e in errors]))
+                return web.json_response({"error": errors[0]["error"], "errors": errors}, status=400)
+
+            items = []
+            out = []
+            for p, v in zip(prompts, valid):
+                if "number" in p:
+                    number = float(p['number'])
+                else:
+                    number = self.number
+                    if p.get("front", False):
+                        number = -number
+                    self.number += 1
+
+                extra_data = dict(p.get("extra_data", {}))
+                client_id = p.get("client_id", json_data.get("client_id", None))
+                if client_id is not None:
+                    extra_data["client_id"] = client_id
+                extra_data["batch_id"] = batch_id
+                prompt_id = str(uuid.uuid4())
+                items.append((number, prompt_id, p["prompt"], extra_data, list(v[2])))
+                out.append({"prompt_id": prompt_id, "number": number, "node_errors": v[3]})
+            self.prompt_queue.put_many(items)
+            return web.json_response({"batch_id": batch_id, "prompts": out})
+
         @routes.post("/queue")
         async def post_queue(request):
             json_data =  await request.json()
@@ -781,55 +1184,97 @@ class PromptServer():
         return message
 
     async def send_image(self, image_data, sid=None):
-        image_type = image_data[0]
-        image = image_data[1]
-        max_size = image_data[2]
-        if max_size is not None:
-            if hasattr(Image, 'Resampling'):
-                resampling = Image.Resampling.BILINEAR
-            else:
-                resampling = Image.Resampling.LANCZOS
-
-            image = ImageOps.contain(image, (max_size, max_size), resampling)
-        type_num = 1
-        if image_type == "JPEG":
-            type_num = 1
-        elif image_type == "PNG":
-            type_num = 2
-
-        bytesIO = BytesIO()
-        header = struct.pack(">I", type_num)
-        bytesIO.write(header)
-        image.save(bytesIO, format=image_type, quality=95, compress_level=1)
-        preview_bytes = bytesIO.getvalue()
+        preview_bytes = await self.loop.run_in_executor(self.preview_executor, encode_preview_image, image_data)
         await self.send_bytes(BinaryEventTypes.PREVIEW_IMAGE, preview_bytes, sid=sid)
 
+    def queue_preview_image(self, frame, sid=None):
+        """Must run on the event loop. Replaces the preview waiting to be sent to each client (latest frame wins)."""
+        sids = list(self.sockets.keys()) if sid is None else [sid]
+        for s in sids:
+            if s not in self.sockets:
+                continue
+            self.pending_previews[s] = frame
+            if s not in self.preview_senders:
+                self.preview_senders.add(s)
+                self.loop.create_task(self.preview_sender(s))
+
+    async def encode_preview_frame(self, frame):
+        if frame.encoded is None:
+            frame.encoded = self.loop.run_in_executor(self.preview_executor, encode_preview_image, frame.image_data)
+        return await frame.encoded
+
+    async def preview_sender(self, sid):
+        try:
+            while sid in self.pending_previews and sid in self.sockets:
+                if args.preview_max_fps > 0:
+                    wait = self.preview_last_sent.get(sid, 0.0) + 1.0 / args.preview_max_fps - self.loop.time()
+                    if wait > 0:
+                        await asyncio.sleep(wait)
+                frame = self.pending_previews.pop(sid, None)
+                if frame is None:
+                    break
+                preview_bytes = await self.encode_preview_frame(frame)
+                self.preview_last_sent[sid] = self.loop.time()
+                await self.send_bytes(BinaryEventTypes.PREVIEW_IMAGE, preview_bytes, sid=sid)
+        except Exception as e:
+            logging.warning("error sending preview: {}".format(e))
+        finally:
+            self.preview_senders.discard(sid)
+            if sid not in self.sockets:
+                self.pending_previews.pop(sid, None)
+                self.preview_last_sent.pop(sid, None)
+
+    def queue_message(self, event, message, sid=None):
+        """Adds an already serialized message to the queue of one client or of every client when sid is None."""
+        droppable = event in DROPPABLE_EVENTS
+        replaceable = event in REPLACEABLE_EVENTS
+        if sid is None:
+            for sender in list(self.client_senders.values()):
+                sender.put(message, droppable, replaceable)
+        elif sid in self.client_senders:
+            self.client_senders[sid].put(message, droppable, replaceable)
+
     async def send_bytes(self, event, data, sid=None):
         message = self.encode_bytes(event, data)
-
-        if sid is None:
-            sockets = list(self.sockets.values())
-            for ws in sockets:
-                await send_socket_catch_exception(ws.send_bytes, message)
-        elif sid in self.sockets:
-            await send_socket_catch_exception(self.sockets[sid].send_bytes, message)
+        self.queue_message(event, bytes(message), sid)
 
     async def send_json(self, event, data, sid=None):
         message = {"type": event, "data": data}
-
-        if sid is None:
-            sockets = list(self.sockets.values())
-            for ws in sockets:
-                await send_socket_catch_exception(ws.send_json, message)
-        elif sid in self.sockets:
-            await send_socket_catch_exception(self.sockets[sid].send_json, message)
+        self.queue_message(event, json.dumps(message), sid)
 
     def send_sync(self, event, data, sid=None):
+        if event == BinaryEventTypes.UNENCODED_PREVIEW_IMAGE:
+            # previews skip the message queue so a slow client only ever gets the newest one
+            self.loop.call_soon_threadsafe(self.queue_preview_image, PreviewFrame(data), sid)
+            return
         self.loop.call_soon_threadsafe(
             self.messages.put_nowait, (event, data, sid))
 
     def queue_updated(self):
-        self.send_sync("status", { "status": self.get_queue_info() })
+        # called on every queue change, the status is sent at most every QUEUE_STATUS_INTERVAL seconds
+        if self.status_pending:
+            return
+        self.status_pending = True
+        self.loop.call_soon_threadsafe(self.schedule_status)
+
+    def schedule_status(self):
+        delay = self.last_status_time + QUEUE_STATUS_INTERVAL - self.loop.time()
+        self.loop.call_later(max(delay, 0.0), self.send_status)
+
+    def send_status(self):
+        # cleared first, a change while the status is built sends another one
+        self.status_pending = False
+        self.last_status_time = self.loop.time()
+        self.messages.put_nowait(("status", { "status": self.get_queue_info() }, None))
+
+    def history_updated(self, prompt_id):
+        """Called from the prompt worker thread when a prompt finished and was added to the history."""
+        if len(self.history_listeners) > 0:
+            self.loop.call_soon_threadsafe(self.notify_history_listeners, prompt_id)
+
+    def notify_history_listeners(self, prompt_id):
+        for listener in self.history_listeners:
+            listener.put_nowait(prompt_id)
 
     async def publish_loop(self):
         while True:
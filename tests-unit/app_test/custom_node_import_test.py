@@ -0,0 +1,71 @@
+import json
+import os
+import sys
+import pytest
+from unittest.mock import patch
+
+from app.custom_node_import import get_module_level_imports, is_third_party, prefetch_custom_node_imports, write_import_time_report
+
+
+def test_module_level_imports():
+    source = """
+import os, json
+from a.b import c
+from . import local
+try:
+    import optional_dep
+except ImportError:
+    import fallback_dep
+
+def f():
+    import lazy_dep
+"""
+    assert get_module_level_imports(source) == {"os", "json", "a.b", "optional_dep", "fallback_dep"}
+
+
+def test_prefetch(tmp_path):
+    site = tmp_path / "site"
+    site.mkdir()
+    for name in ("fake_heavy_dependency", "fake_nested_dependency", "fake_test_dependency", "fake_shadowed_utils"):
+        (site / f"{name}.py").write_text("VALUE = 1\n")
+    custom_nodes = tmp_path / "custom_nodes"
+    package = custom_nodes / "my_nodes"
+    (package / "tests").mkdir(parents=True)
+    (package / "__init__.py").write_text("import json\nimport fake_heavy_dependency\nimport missing_dependency\nimport fake_shadowed_utils\nfrom .nodes import X\n")
+    (package / "nodes.py").write_text("import fake_nested_dependency\nX = 1\n")
+    # the node's own module, found through the package directory being on sys.path
+    (package / "fake_shadowed_utils.py").write_text("VALUE = 2\n")
+    # never imported by the package
+    (package / "tests" / "test_nodes.py").write_text("import fake_test_dependency\n")
+
+    sys.path.insert(0, str(site))
+    try:
+        with patch("folder_paths.get_folder_paths", return_value=[str(custom_nodes)]):
+            assert not is_third_party("json", [])
+            report = prefetch_custom_node_imports([str(package)], workers=2)
+        assert "fake_heavy_dependency" in sys.modules
+        assert sorted(m["module"] for m in report["modules"]) == ["fake_heavy_dependency", "fake_nested_dependency"]
+        assert "fake_test_dependency" not in sys.modules
+        assert "fake_shadowed_utils" not in sys.modules
+        assert os.path.isdir(package / "__pycache__")
+    finally:
+        sys.path.remove(str(site))
+        for name in ("fake_heavy_dependency", "fake_nested_dependency", "fake_test_dependency", "fake_shadowed_utils"):
+            sys.modules.pop(name, None)
+
+
+def test_stdlib_without_stdlib_module_names(monkeypatch):
+    # python < 3.10
+    monkeypatch.delattr(sys, "stdlib_module_names", raising=False)
+    for name in ("json", "email.message", "sys", "_thread"):
+        assert not is_third_party(name, [])
+    assert is_third_party("pytest", [])
+
+
+def test_report(tmp_path):
+    with patch("folder_paths.get_user_directory", return_value=str(tmp_path)):
+        write_import_time_report([(0.5, "/custom_nodes/a", True, 3), (0.1, "/custom_nodes/b", False, 0)])
+    with open(tmp_path / "custom_node_import_times.json") as f:
+        report = json.load(f)
+    assert report["total_seconds"] == pytest.approx(0.6)
+    assert report["custom_nodes"][1] == {"path": "/custom_nodes/b", "seconds": 0.1, "success": False, "node_count": 0}
@@ -0,0 +1,72 @@
+import hashlib
+import json
+import os
+import struct
+import pytest
+from unittest.mock import patch
+
+pytest.importorskip("sqlalchemy")
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.database.models import Base
+from app.model_index import ModelIndex, hash_file
+
+
+def write_safetensors(path, metadata):
+    header = json.dumps({"__metadata__": metadata, "weight": {"dtype": "F32", "shape": [1], "data_offsets": [0, 4]}}).encode("utf-8")
+    with open(path, "wb") as f:
+        f.write(struct.pack("<Q", len(header)))
+        f.write(header)
+        f.write(b"\0" * 4)
+
+
+@pytest.fixture
+def model_dir(tmp_path):
+    path = tmp_path / "loras"
+    path.mkdir()
+    with patch.dict("folder_paths.folder_names_and_paths", {"loras": ([str(path)], {".safetensors"})}):
+        yield path
+
+
+@pytest.fixture
+def index(tmp_path):
+    engine = create_engine("sqlite:///{}".format(tmp_path / "test.db"))
+    Base.metadata.create_all(engine)
+    return ModelIndex(sessionmaker(bind=engine))
+
+
+def test_entry_is_updated_when_the_file_changes(index, model_dir):
+    write_safetensors(model_dir / "a.safetensors", {"ss_network_dim": "16"})
+    entry = index.get("loras", "a.safetensors")
+    assert entry["metadata"] == {"ss_network_dim": "16"}
+    assert entry["hash"] is None
+
+    index.hash_model("loras", "a.safetensors")
+    entry = index.get("loras", "a.safetensors")
+    assert entry["hash"] == hashlib.sha256((model_dir / "a.safetensors").read_bytes()).hexdigest()
+    assert index.find_by_hash(entry["hash"])[0]["path"] == "a.safetensors"
+
+    write_safetensors(model_dir / "a.safetensors", {"ss_network_dim": "32"})
+    mtime = os.stat(model_dir / "a.safetensors").st_mtime_ns + 1_000_000_000
+    os.utime(model_dir / "a.safetensors", ns=(mtime, mtime))
+    entry = index.get("loras", "a.safetensors")
+    assert entry["metadata"] == {"ss_network_dim": "32"}
+    assert entry["hash"] is None
+
+
+def test_list_removes_deleted_files(index, model_dir):
+    write_safetensors(model_dir / "a.safetensors", {})
+    write_safetensors(model_dir / "b.safetensors", {})
+    assert sorted(e["path"] for e in index.list("loras")) == ["a.safetensors", "b.safetensors"]
+    os.remove(model_dir / "b.safetensors")
+    assert [e["path"] for e in index.list("loras")] == ["a.safetensors"]
+    assert index.get("loras", "b.safetensors") is None
+
+
+def test_hash_file_throttle(tmp_path):
+    path = tmp_path / "data.bin"
+    path.write_bytes(b"x" * 1000)
+    with patch("time.sleep") as sleep:
+        assert hash_file(str(path), bytes_per_second=100) == hashlib.sha256(b"x" * 1000).hexdigest()
+    assert sleep.called
@@ -0,0 +1,109 @@
+import os
+import pytest
+from unittest.mock import patch
+
+import folder_paths
+from app.node_info_cache import NodeInfoCache
+
+
+@pytest.fixture
+def input_dir(tmp_path):
+    with patch.object(folder_paths, "input_directory", str(tmp_path)):
+        yield tmp_path
+
+
+def make_cache(calls):
+    def node_info(node_class):
+        calls.append(node_class)
+        if node_class == "LoadThing":
+            return {"input": sorted(os.listdir(folder_paths.get_input_directory()))}
+        if node_class == "ListsFiles":
+            # doesn't go through folder_paths
+            return {"input": sorted(os.listdir(os.path.join(folder_paths.input_directory, "presets")))}
+        if node_class == "Volatile":
+            folder_paths.record_dependency("volatile", None)
+            return {"input": node_class}
+        if node_class == "Broken":
+            raise ValueError("broken")
+        return {"input": node_class}
+
+    node_classes = {"Static": None, "LoadThing": None}
+    return NodeInfoCache(node_info, lambda: node_classes), node_classes
+
+
+def test_response_is_cached_until_a_folder_changes(input_dir):
+    calls = []
+    cache, _ = make_cache(calls)
+    body, gzip_body, etag = cache.get_response()
+    assert sorted(calls) == ["LoadThing", "Static"]
+
+    calls.clear()
+    assert cache.get_response() == (body, gzip_body, etag)
+    assert calls == []
+
+    (input_dir / "image.png").write_bytes(b"")
+    mtime = os.stat(input_dir).st_mtime_ns + 1_000_000_000
+    os.utime(input_dir, ns=(mtime, mtime))
+    new_body, _, new_etag = cache.get_response()
+    assert calls == ["LoadThing"]
+    assert new_etag != etag
+    assert b"image.png" in new_body
+
+
+def test_node_classes_added_and_removed(input_dir):
+    calls = []
+    cache, node_classes = make_cache(calls)
+    cache.get_response()
+    calls.clear()
+
+    node_classes["Other"] = None
+    del node_classes["Static"]
+    body, _, _ = cache.get_response()
+    assert sorted(calls) == ["Other"]
+    assert b"Static" not in body
+    assert [e["node_class"] for e in cache.timing_report()].count("Static") == 0
+
+
+def test_failing_node_info_is_retried(input_dir):
+    calls = []
+    cache, node_classes = make_cache(calls)
+    node_classes["Broken"] = None
+    body, _, _ = cache.get_response()
+    assert b"Broken" not in body
+    calls.clear()
+    cache.get_response()
+    assert calls == ["Broken"]
+    assert cache.get_info("Static") == {"input": "Static"}
+
+
+def test_files_listed_without_folder_paths_are_seen_on_refresh(input_dir):
+    calls = []
+    cache, node_classes = make_cache(calls)
+    node_classes["ListsFiles"] = None
+    (input_dir / "presets").mkdir()
+    _, _, etag = cache.get_response()
+    (input_dir / "presets" / "preset.json").write_bytes(b"")
+    assert cache.get_response()[2] == etag
+    body, _, new_etag = cache.get_response(refresh=True)
+    assert new_etag != etag
+    assert b"preset.json" in body
+
+
+def test_volatile_node_info_is_always_rebuilt(input_dir):
+    calls = []
+    cache, node_classes = make_cache(calls)
+    node_classes["Volatile"] = None
+    _, _, etag = cache.get_response()
+    calls.clear()
+    # rebuilt, the response stays the same since its info didn't change
+    assert cache.get_response()[2] == etag
+    assert calls == ["Volatile"]
+
+
+def test_refresh_rebuilds_everything(input_dir):
+    calls = []
+    cache, _ = make_cache(calls)
+    _, _, etag = cache.get_response()
+    calls.clear()
+    assert cache.get_response(refresh=True)[2] == etag
+    assert sorted(calls) == ["LoadThing", "Static"]
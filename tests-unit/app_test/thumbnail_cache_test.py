@@ -0,0 +1,40 @@
+import os
+import pytest
+from PIL import Image
+
+from app.thumbnail_cache import ThumbnailCache
+
+
+@pytest.fixture
+def image_path(tmp_path):
+    path = tmp_path / "image.png"
+    Image.new("RGBA", (512, 256), (255, 0, 0, 128)).save(path)
+    return str(path)
+
+
+def test_thumbnail_is_cached(tmp_path, image_path):
+    cache = ThumbnailCache(str(tmp_path / "cache"), max_bytes=1024 * 1024)
+    thumbnail = cache.get_file_thumbnail(image_path, "jpeg", 80, max_size=128, mode="RGB")
+    with Image.open(thumbnail) as img:
+        assert img.size == (128, 64)
+        assert img.format == "JPEG"
+
+    opened = []
+    assert cache.get_thumbnail(os.path.abspath(image_path), os.stat(image_path).st_mtime_ns, os.path.getsize(image_path),
+                               lambda: opened.append(1), "jpeg", 80, 128, "RGB") == thumbnail
+    assert opened == []
+
+    # other parameters or a changed source get their own thumbnail
+    assert cache.get_file_thumbnail(image_path, "webp", 80, max_size=128) != thumbnail
+    Image.new("RGBA", (300, 300)).save(image_path)
+    assert cache.get_file_thumbnail(image_path, "jpeg", 80, max_size=128, mode="RGB") != thumbnail
+
+
+def test_size_cap_evicts_least_recently_used(tmp_path, image_path):
+    cache = ThumbnailCache(str(tmp_path / "cache"), max_bytes=1)
+    first = cache.get_file_thumbnail(image_path, "png", 90, max_size=64)
+    # the thumbnail that was just created is returned even if it doesn't fit in the cache on its own
+    assert os.path.exists(first)
+    second = cache.get_file_thumbnail(image_path, "png", 90, max_size=32)
+    assert os.path.exists(second)
+    assert not os.path.exists(first)
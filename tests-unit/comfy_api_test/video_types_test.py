@@ -5,7 +5,7 @@ import os
 import av
 import io
 from fractions import Fraction
-from comfy_api.input_impl.video_types import VideoFromFile, VideoFromComponents
+from comfy_api.input_impl.video_types import VideoFromFile, VideoFromComponents, VideoFromFrameChunks
 from comfy_api.util.video_types import VideoComponents
 from comfy_api.input.basic_types import AudioInput
 from av.error import InvalidDataError
@@ -237,3 +237,23 @@ def test_duration_consistency(video_components):
     manual_duration = float(components.images.shape[0] / components.frame_rate)
 
     assert duration == pytest.approx(manual_duration)
+
+
+def test_video_from_frame_chunks_save_matches_components():
+    images = torch.rand(10, 16, 16, 3)
+    chunks = lambda: [images[:4], (images[4:] * 255).byte()]
+    video = VideoFromFrameChunks(chunks, width=16, height=16, frame_rate=Fraction(24), frame_count=10)
+
+    assert video.get_dimensions() == (16, 16)
+    assert abs(video.get_duration() - 10 / 24) < EPSILON
+    assert video.get_components().images.shape == (10, 16, 16, 3)
+
+    with tempfile.NamedTemporaryFile(suffix=".mp4", delete=False) as tmp:
+        path = tmp.name
+    try:
+        video.save_to(path)
+        loaded = VideoFromFile(path).get_components()
+        assert loaded.images.shape == (10, 16, 16, 3)
+        assert loaded.frame_rate == Fraction(24)
+    finally:
+        os.unlink(path)
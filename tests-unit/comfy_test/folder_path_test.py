@@ -99,12 +99,15 @@ def test_filter_files_extensions():
     assert folder_paths.filter_files_extensions(files, [".jpg", ".png"]) == ["file2.jpg", "file3.png"]
     assert folder_paths.filter_files_extensions(files, []) == files
 
-@patch("folder_paths.recursive_search")
-@patch("folder_paths.folder_names_and_paths")
-def test_get_filename_list(mock_folder_names_and_paths, mock_recursive_search):
-    mock_folder_names_and_paths.__getitem__.return_value = (["/test/path"], {".txt"})
-    mock_recursive_search.return_value = (["file1.txt", "file2.jpg"], {})
-    assert folder_paths.get_filename_list("test_folder") == ["file1.txt"]
+def test_get_filename_list(temp_dir):
+    open(os.path.join(temp_dir, "file1.txt"), "w").close()
+    open(os.path.join(temp_dir, "file2.jpg"), "w").close()
+    with patch.dict(folder_paths.folder_names_and_paths, {"test_folder": ([temp_dir], {".txt"})}):
+        assert folder_paths.get_filename_list("test_folder") == ["file1.txt"]
+
+        os.makedirs(os.path.join(temp_dir, "subdir"))
+        open(os.path.join(temp_dir, "subdir", "file3.txt"), "w").close()
+        assert folder_paths.get_filename_list("test_folder") == ["file1.txt", os.path.join("subdir", "file3.txt")]
 
 def test_get_save_image_path(temp_dir):
     with patch("folder_paths.output_directory", temp_dir):
@@ -115,6 +118,36 @@ def test_get_save_image_path(temp_dir):
         assert subfolder == ""
         assert filename_prefix == "test"
 
+def test_get_save_image_path_counter_index(temp_dir):
+    def next_counter(prefix="test", count=1):
+        return folder_paths.get_save_image_path(prefix, temp_dir, count=count)[2]
+
+    def save(count=1):
+        counter = next_counter(count=count)
+        for c in range(counter, counter + count):
+            open(os.path.join(temp_dir, f"test_{c:05}_.png"), "w").close()
+        folder_paths.update_save_image_counter(temp_dir, "test", counter + count - 1)
+        return counter
+
+    open(os.path.join(temp_dir, "test_00007_.png"), "w").close()
+    assert next_counter() == 8
+    # handed out counters are not reused even before the file is written, a batch reserves a counter per file
+    assert next_counter(count=4) == 9
+
+    # the folder changes of the saves themselves don't make the next save list the folder
+    listdir = os.listdir
+    listed = []
+    with patch("os.listdir", side_effect=lambda path: listed.append(path) or listdir(path)):
+        assert [save(), save(count=3), save(), save(), save()] == [13, 14, 17, 18, 19]
+    assert listed == []
+
+    # a file added by someone else changes the folder mtime and triggers a rescan
+    open(os.path.join(temp_dir, "test_00050_.png"), "w").close()
+    mtime = os.stat(temp_dir).st_mtime_ns + 1_000_000_000
+    os.utime(temp_dir, ns=(mtime, mtime))
+    assert next_counter() == 51
+    assert next_counter("other") == 1
+
 
 def test_base_path_changes(set_base_dir):
     test_dir = os.path.abspath("/test/dir")
@@ -0,0 +1,62 @@
+import os
+import subprocess
+import sys
+import pytest
+
+pytest.importorskip("torch")
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# only needed by some model families, importing nodes shouldn't import them
+DEFERRED_MODULES = [
+    "comfy.ldm.flux.model",
+    "comfy.ldm.wan.model",
+    "comfy.ldm.wan.vae",
+    "comfy.ldm.cosmos.model",
+    "comfy.ldm.hunyuan_video.model",
+    "comfy.ldm.hunyuan3d.model",
+    "comfy.ldm.ace.model",
+    "comfy.ldm.audio.dit",
+    "comfy.ldm.cascade.stage_c",
+    "comfy.text_encoders.flux",
+    "comfy.text_encoders.wan",
+    "comfy.text_encoders.hunyuan_video",
+    "comfy.ldm.flux.controlnet",
+]
+
+# ComfyUI modules (not third party ones) imported by "import nodes" and the time spent executing them
+MAX_LOCAL_MODULES = int(os.environ.get("COMFY_IMPORT_MODULE_BUDGET", 120))
+MAX_LOCAL_SECONDS = float(os.environ.get("COMFY_IMPORT_TIME_BUDGET", 1.5))
+
+
+def is_local(module):
+    top_level = module.split(".")[0]
+    return os.path.isdir(os.path.join(ROOT, top_level)) or os.path.isfile(os.path.join(ROOT, top_level + ".py"))
+
+
+def import_times(module):
+    """Returns {module: (self seconds, cumulative seconds)} from python -X importtime."""
+    code = "import comfy.options; comfy.options.enable_args_parsing(); import {}".format(module)
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", code, "--cpu"], cwd=ROOT, capture_output=True, text=True)
+    assert result.returncode == 0, result.stderr[-2000:]
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        times[name.strip()] = (int(self_us) / 1e6, int(cumulative_us) / 1e6)
+    return times
+
+
+def test_nodes_import_budget():
+    times = import_times("nodes")
+    assert "nodes" in times
+
+    imported = [m for m in DEFERRED_MODULES if m in times]
+    assert imported == [], "model family modules imported eagerly: {}".format(imported)
+
+    local = {m: t for m, t in times.items() if is_local(m)}
+    slowest = sorted(local.items(), key=lambda a: a[1][0], reverse=True)[:10]
+    assert len(local) <= MAX_LOCAL_MODULES, "{} ComfyUI modules imported".format(len(local))
+    seconds = sum(t[0] for t in local.values())
+    assert seconds <= MAX_LOCAL_SECONDS, "{:.2f}s importing ComfyUI modules, slowest: {}".format(seconds, slowest)
@@ -0,0 +1,42 @@
+import sys
+
+from comfy.lazy_import import LazyModule, lazy_import
+
+
+def test_lazy_import(tmp_path, monkeypatch):
+    package = tmp_path / "lazy_test_package"
+    package.mkdir()
+    (package / "heavy.py").write_text("VALUE = 42\n")
+    monkeypatch.syspath_prepend(str(tmp_path))
+    try:
+        module = lazy_import("lazy_test_package.heavy")
+        assert isinstance(module, LazyModule)
+        assert "lazy_test_package.heavy" not in sys.modules
+
+        import lazy_test_package
+        assert lazy_test_package.heavy.VALUE == 42
+        assert "lazy_test_package.heavy" in sys.modules
+        # the placeholder got replaced by the real module
+        assert lazy_test_package.heavy is sys.modules["lazy_test_package.heavy"]
+        assert lazy_import("lazy_test_package.heavy") is sys.modules["lazy_test_package.heavy"]
+    finally:
+        sys.modules.pop("lazy_test_package.heavy", None)
+        sys.modules.pop("lazy_test_package", None)
+
+
+def test_patch_through_placeholder(tmp_path, monkeypatch):
+    package = tmp_path / "lazy_patch_package"
+    package.mkdir()
+    (package / "heavy.py").write_text("def f():\n    return 1\n\ndef call_f():\n    return f()\n")
+    monkeypatch.syspath_prepend(str(tmp_path))
+    try:
+        placeholder = lazy_import("lazy_patch_package.heavy")
+        # custom nodes monkey patch module level functions
+        placeholder.f = lambda: 2
+        assert sys.modules["lazy_patch_package.heavy"].call_f() == 2
+        assert "call_f" in dir(placeholder)
+        del placeholder.f
+        assert not hasattr(sys.modules["lazy_patch_package.heavy"], "f")
+    finally:
+        sys.modules.pop("lazy_patch_package.heavy", None)
+        sys.modules.pop("lazy_patch_package", None)
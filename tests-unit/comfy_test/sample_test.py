@@ -0,0 +1,43 @@
+import pytest
+import torch
+
+import comfy.sample
+from comfy.cli_args import BatchNoiseMode
+
+
+def test_philox_known_answer():
+    # Random123 known answer test for philox4x32-10
+    counter = [torch.tensor([0x243f6a88]), torch.tensor([0x85a308d3]), torch.tensor([0x13198a2e]), torch.tensor([0x03707344])]
+    out = comfy.sample.philox4x32(counter, (0xa4093822, 0x299f31d0))
+    assert [int(x) for x in out] == [0xd16cfe09, 0x94fdcceb, 0x5001e420, 0x24126ea1]
+
+
+def test_legacy_noise_unchanged():
+    latent = torch.zeros([3, 4, 8, 8])
+    noise = comfy.sample.prepare_noise(latent, 42, [2, 0, 2], noise_mode=BatchNoiseMode.Legacy)
+    generator = torch.manual_seed(42)
+    expected = [torch.randn([1, 4, 8, 8], generator=generator) for _ in range(3)]
+    assert torch.equal(noise, torch.cat([expected[2], expected[0], expected[2]]))
+
+
+@pytest.mark.parametrize("shape", [[4, 8, 8], [16, 3, 5, 7]])
+def test_philox_batch_index_matches_full_batch(shape):
+    full = comfy.sample.prepare_noise(torch.zeros([6] + shape), 1234, noise_mode=BatchNoiseMode.Philox)
+    picked = comfy.sample.prepare_noise(torch.zeros([2] + shape), 1234, [5, 1], noise_mode=BatchNoiseMode.Philox)
+    assert picked.shape == torch.Size([2] + shape)
+    assert torch.equal(picked[0], full[5])
+    assert torch.equal(picked[1], full[1])
+
+
+def test_philox_large_index_and_seed():
+    latent = torch.zeros([1, 4, 16, 16], dtype=torch.float16)
+    noise = comfy.sample.prepare_noise(latent, 0xffffffffffffffff, [100000], noise_mode=BatchNoiseMode.Philox)
+    assert noise.dtype == torch.float16
+    other = comfy.sample.prepare_noise(latent, 0xffffffffffffffff, [100001], noise_mode=BatchNoiseMode.Philox)
+    assert not torch.equal(noise, other)
+
+
+def test_philox_is_gaussian():
+    noise = comfy.sample.philox_randn(7, [0, 1], [64, 64, 16])
+    assert abs(noise.mean().item()) < 0.02
+    assert abs(noise.std().item() - 1.0) < 0.02
@@ -0,0 +1,36 @@
+import torch
+
+import comfy.samplers
+
+
+def area_cond(area, uuid):
+    return {"area": area, "strength": 1.0, "model_conds": {}, "uuid": uuid}
+
+
+def test_bucket_cond_areas_shares_shapes():
+    x_in = torch.randn([1, 4, 64, 64])
+    timestep = torch.tensor([1.0])
+    conds = [area_cond((24, 20, 8, 4), 0), area_cond((32, 32, 0, 30), 1), area_cond((8, 8, 56, 56), 2)]
+    area_conds = []
+    for i, c in enumerate(conds):
+        area_conds.append((c, comfy.samplers.get_area_and_mult(c, x_in, timestep), i))
+
+    out = comfy.samplers.bucket_cond_areas(area_conds, x_in, timestep, granularity=8, min_fill=0.4)
+    assert [i for _, i in out] == [0, 1, 2]
+    assert out[0][0].input_x.shape == out[1][0].input_x.shape == torch.Size([1, 4, 32, 32])
+    assert comfy.samplers.can_concat_cond(out[0][0], out[1][0])
+    # too small to fill the big bucket, stays in its own
+    assert out[2][0].input_x.shape == torch.Size([1, 4, 8, 8])
+
+    # the original area keeps the same mult and the padding around it is zero
+    for (_, original, _), (bucketed, _) in zip(area_conds, out):
+        dims = len(bucketed.area) // 2
+        inner = bucketed.mult
+        for d in range(dims):
+            inner = inner.narrow(d + 2, original.area[dims + d] - bucketed.area[dims + d], original.area[d])
+        assert torch.equal(inner, original.mult)
+        assert torch.isclose(bucketed.mult.sum(), original.mult.sum())
+        bucket_x = x_in
+        for d in range(dims):
+            bucket_x = bucket_x.narrow(d + 2, bucketed.area[dims + d], bucketed.area[d])
+        assert torch.equal(bucketed.input_x, bucket_x)
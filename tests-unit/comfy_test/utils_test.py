@@ -0,0 +1,41 @@
+import pytest
+import torch
+
+import comfy.utils
+
+
+def reference_feather_mask(shape, feathers):
+    mask = torch.ones([1, 1] + list(shape))
+    for d in range(2, len(shape) + 2):
+        feather = feathers[d - 2]
+        if feather >= mask.shape[d]:
+            continue
+        for t in range(feather):
+            a = (t + 1) / feather
+            mask.narrow(d, t, 1).mul_(a)
+            mask.narrow(d, mask.shape[d] - 1 - t, 1).mul_(a)
+    return mask
+
+
+@pytest.mark.parametrize("shape,feathers", [((16, 24), (4, 4)), ((5, 6), (3, 3)), ((3, 8, 8), (1, 2, 0)), ((4, 4), (4, 2))])
+def test_feather_mask_matches_reference(shape, feathers):
+    mask = comfy.utils.get_feather_mask(shape, feathers)
+    assert torch.allclose(mask, reference_feather_mask(shape, feathers))
+
+
+@pytest.mark.parametrize("tile_batch_size", [3, 64, lambda shape: 2])
+def test_tiled_scale_batched_matches_unbatched(tile_batch_size):
+    samples = torch.randn([2, 4, 40, 56], generator=torch.Generator().manual_seed(0))
+    conv = torch.nn.Conv2d(4, 3, 3, padding=1)
+    batch_sizes = []
+
+    def function(x):
+        batch_sizes.append(x.shape[0])
+        return torch.nn.functional.interpolate(conv(x), scale_factor=2, mode="nearest")
+
+    expected = comfy.utils.tiled_scale(samples, function, tile_x=16, tile_y=16, overlap=4, upscale_amount=2)
+    assert max(batch_sizes) == 1
+    batch_sizes.clear()
+    out = comfy.utils.tiled_scale(samples, function, tile_x=16, tile_y=16, overlap=4, upscale_amount=2, tile_batch_size=tile_batch_size)
+    assert max(batch_sizes) > 1
+    assert torch.allclose(out, expected, atol=1e-5)
@@ -0,0 +1,143 @@
+import copy
+
+import pytest
+
+pytest.importorskip("torch")
+
+import nodes  # noqa: E402
+from comfy_execution.graph_optimizer import optimize_prompt  # noqa: E402
+
+
+class IsChangedCache:
+    def get(self, node_id):
+        return False
+
+
+class Loader:
+    RETURN_TYPES = ("MODEL",)
+
+    @classmethod
+    def INPUT_TYPES(cls):
+        return {"required": {"name": ("STRING", {})}}
+
+
+class Random(Loader):
+    NOT_IDEMPOTENT = True
+
+
+class Encode:
+    RETURN_TYPES = ("CONDITIONING",)
+
+    @classmethod
+    def INPUT_TYPES(cls):
+        return {"required": {"model": ("MODEL",), "text": ("STRING", {})}}
+
+
+class Output:
+    RETURN_TYPES = ()
+    OUTPUT_NODE = True
+
+    @classmethod
+    def INPUT_TYPES(cls):
+        return {"required": {"a": ("CONDITIONING",), "b": ("CONDITIONING",)}}
+
+
+@pytest.fixture(autouse=True)
+def node_classes(monkeypatch):
+    for class_ in (Loader, Random, Encode, Output):
+        monkeypatch.setitem(nodes.NODE_CLASS_MAPPINGS, "Test" + class_.__name__, class_)
+
+
+def node(class_type, **inputs):
+    return {"class_type": "Test" + class_type, "inputs": inputs}
+
+
+def test_identical_branches_are_merged():
+    prompt = {"1": node("Loader", name="a"),
+              "2": node("Encode", model=["1", 0], text="cat"),
+              "3": node("Loader", name="a"),
+              "4": node("Encode", model=["3", 0], text="cat"),
+              "5": node("Output", a=["2", 0], b=["4", 0]),
+              "6": node("Encode", model=["1", 0], text="unused")}
+    optimization = optimize_prompt(prompt, ["5"], IsChangedCache())
+    assert optimization.merged == {"3": "1", "4": "2"}
+    assert optimization.removed == ["6"]
+    assert list(optimization.prompt) == ["1", "2", "5"]
+    assert optimization.prompt["5"]["inputs"] == {"a": ["2", 0], "b": ["2", 0]}
+    # the submitted prompt isn't modified
+    assert prompt["5"]["inputs"] == {"a": ["2", 0], "b": ["4", 0]}
+
+
+def test_different_inputs_and_not_idempotent_nodes_are_kept():
+    prompt = {"1": node("Random", name="a"),
+              "2": node("Random", name="a"),
+              "3": node("Encode", model=["1", 0], text="cat"),
+              "4": node("Encode", model=["2", 0], text="cat"),
+              "5": node("Output", a=["3", 0], b=["4", 0])}
+    optimization = optimize_prompt(prompt, ["5"], IsChangedCache())
+    assert optimization.merged == {}
+    assert optimization.removed == []
+    assert optimization.prompt is prompt
+
+
+def test_output_nodes_are_kept():
+    prompt = {"1": node("Loader", name="a"),
+              "2": node("Encode", model=["1", 0], text="cat"),
+              "3": node("Output", a=["2", 0], b=["2", 0]),
+              "4": node("Output", a=["2", 0], b=["2", 0])}
+    optimization = optimize_prompt(prompt, ["3"], IsChangedCache())
+    assert optimization.merged == {}
+    assert list(optimization.prompt) == ["1", "2", "3", "4"]
+
+
+class Value:
+    RETURN_TYPES = ("INT",)
+    FUNCTION = "run"
+
+    @classmethod
+    def INPUT_TYPES(cls):
+        return {"required": {"value": ("INT", {})}}
+
+    def run(self, value):
+        return (value,)
+
+
+class Save:
+    RETURN_TYPES = ()
+    FUNCTION = "run"
+    OUTPUT_NODE = True
+    saved_prompts = []
+
+    @classmethod
+    def INPUT_TYPES(cls):
+        return {"required": {"a": ("INT",), "b": ("INT",)}, "hidden": {"prompt": "PROMPT"}}
+
+    def run(self, a, b, prompt=None):
+        Save.saved_prompts.append(prompt)
+        return ()
+
+
+class MockServer:
+    client_id = None
+    last_node_id = None
+
+    def send_sync(self, event, data, sid=None):
+        pass
+
+
+def test_nodes_get_the_submitted_prompt(monkeypatch):
+    from execution import PromptExecutor
+
+    monkeypatch.setitem(nodes.NODE_CLASS_MAPPINGS, "TestValue", Value)
+    monkeypatch.setitem(nodes.NODE_CLASS_MAPPINGS, "TestSave", Save)
+    prompt = {"1": node("Value", value=1),
+              "2": node("Value", value=1),
+              "3": node("Save", a=["1", 0], b=["2", 0]),
+              "4": node("Value", value=2)}
+    submitted = copy.deepcopy(prompt)
+    Save.saved_prompts.clear()
+    executor = PromptExecutor(MockServer())
+    executor.execute(prompt, "a", {}, ["3"])
+    assert executor.success
+    # "2" was merged into "1" and "4" removed, the saved prompt is still the one that was submitted
+    assert Save.saved_prompts == [submitted]
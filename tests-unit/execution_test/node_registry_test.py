@@ -0,0 +1,115 @@
+import os
+import pytest
+from unittest.mock import patch
+
+import folder_paths
+from comfy_execution.node_registry import NodeClassMappings, NodeRegistry
+
+
+class NodeA:
+    pass
+
+
+class NodeB:
+    pass
+
+
+@pytest.fixture
+def module_path(tmp_path):
+    path = tmp_path / "nodes_test.py"
+    path.write_text("NODE_CLASS_MAPPINGS = {}\n")
+    return str(path)
+
+
+def test_lazy_node_class_is_loaded_on_lookup():
+    mappings = NodeClassMappings({"NodeA": NodeA})
+    loads = []
+
+    def load():
+        loads.append(1)
+        mappings["NodeB"] = NodeB
+        return True
+
+    mappings.add_lazy("NodeB", load)
+    mappings.add_lazy("Missing", load)
+    assert "NodeB" in mappings
+    assert len(mappings) == 3
+    assert list(mappings.keys()) == ["NodeA", "NodeB", "Missing"]
+    # a view like dict.keys(), lookups and set operations don't load anything
+    assert "NodeB" in mappings.keys()
+    assert mappings.keys() - {"NodeA"} == {"NodeB", "Missing"}
+    assert loads == []
+
+    assert mappings["NodeB"] is NodeB
+    assert loads == [1]
+    # the module didn't define Missing
+    assert "Missing" not in mappings
+    assert mappings.get("Missing") is None
+    assert dict(mappings.items()) == {"NodeA": NodeA, "NodeB": NodeB}
+    assert loads == [1]
+
+
+def test_pop_and_setdefault_load_lazy_classes():
+    mappings = NodeClassMappings()
+
+    def load():
+        dict.__setitem__(mappings, "NodeA", NodeA)
+        dict.__setitem__(mappings, "NodeB", NodeB)
+        return True
+
+    mappings.add_lazy("NodeA", load)
+    mappings.add_lazy("NodeB", load)
+    assert mappings.setdefault("NodeA", NodeB) is NodeA
+    assert mappings.pop("NodeB") is NodeB
+    assert "NodeB" not in mappings
+    assert mappings.pop("NodeB", None) is None
+    assert mappings.setdefault("NodeC", NodeB) is NodeB
+    assert list(mappings) == ["NodeA", "NodeC"]
+
+
+def test_failed_import():
+    mappings = NodeClassMappings()
+    mappings.add_lazy("NodeB", lambda: False)
+    with pytest.raises(KeyError):
+        mappings["NodeB"]
+    assert len(mappings) == 0
+
+
+def test_registry_round_trip(tmp_path, module_path):
+    registry_path = str(tmp_path / "registry.json")
+    info = {"name": "NodeB", "display_name": "Node B", "input": {"required": {}}}
+    dependencies = [("filename_list", "test_models")]
+
+    with patch.dict(folder_paths.folder_names_and_paths, {"test_models": ([str(tmp_path / "models")], {".safetensors"})}):
+        os.makedirs(tmp_path / "models")
+        registry = NodeRegistry(registry_path)
+        registry.imported(module_path, ["NodeB"])
+        registry.save(lambda node_class: (info, dependencies), {"NodeB": "Node B"})
+
+        registry = NodeRegistry(registry_path)
+        mappings = NodeClassMappings()
+        display_names = {}
+        assert registry.register_module(module_path, lambda: False, mappings, display_names)
+        assert mappings.is_lazy("NodeB")
+        assert display_names == {"NodeB": "Node B"}
+        assert registry.get_info("NodeB") == info
+
+        # a new model changes what INPUT_TYPES would return
+        (tmp_path / "models" / "model.safetensors").write_bytes(b"")
+        assert registry.get_info("NodeB") is None
+
+    # the module changed
+    with open(module_path, "a") as f:
+        f.write("# changed\n")
+    registry = NodeRegistry(registry_path)
+    assert not registry.register_module(module_path, lambda: False, NodeClassMappings(), {})
+
+
+def test_volatile_node_is_not_stored(tmp_path, module_path):
+    registry_path = str(tmp_path / "registry.json")
+    registry = NodeRegistry(registry_path)
+    registry.imported(module_path, ["NodeB"])
+    registry.save(lambda node_class: ({"name": "NodeB"}, [("volatile", None)]), {})
+
+    registry = NodeRegistry(registry_path)
+    assert not registry.register_module(module_path, lambda: False, NodeClassMappings(), {})
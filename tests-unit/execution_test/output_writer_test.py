@@ -0,0 +1,91 @@
+import asyncio
+import os
+import threading
+
+from comfy_execution.output_writer import OutputWriter
+
+
+def write_text(text, event=None):
+    def write(path):
+        if event is not None:
+            event.wait(5)
+        with open(path, "w") as f:
+            f.write(text)
+    return write
+
+
+def test_submit_reserves_file_and_flush_waits(tmp_path):
+    writer = OutputWriter(2)
+    release = threading.Event()
+    path = str(tmp_path / "image_00001_.png")
+    future = writer.submit(path, write_text("done", release))
+
+    # the file exists right away so the next save path counter skips it
+    assert os.path.exists(path)
+    assert writer.wait(path) is future
+    release.set()
+    assert writer.flush() == []
+    assert writer.wait(path) is None
+    with open(path) as f:
+        assert f.read() == "done"
+
+
+def test_back_pressure_limits_pending_writes(tmp_path):
+    writer = OutputWriter(1, max_pending=2)
+    release = threading.Event()
+    writer.submit(str(tmp_path / "a"), write_text("a", release))
+    writer.submit(str(tmp_path / "b"), write_text("b", release))
+
+    third = threading.Thread(target=writer.submit, args=(str(tmp_path / "c"), write_text("c")))
+    third.start()
+    third.join(0.2)
+    assert third.is_alive()
+    release.set()
+    third.join(5)
+    assert not third.is_alive()
+    writer.flush()
+    assert sorted(os.listdir(tmp_path)) == ["a", "b", "c"]
+
+
+def test_flush_reports_errors(tmp_path):
+    writer = OutputWriter(1)
+
+    def fail(path):
+        raise OSError("disk full")
+
+    writer.set_node("9")
+    # the error is recorded before the write is reported as done, every flush sees it
+    for i in range(50):
+        path = str(tmp_path / str(i))
+        writer.submit(path, fail)
+        errors = writer.flush()
+        assert len(errors) == 1
+        assert isinstance(errors[0][1], OSError)
+        assert errors[0][2] == "9"
+        assert writer.wait(path) is None
+    assert writer.flush() == []
+    # the files created when the writes were submitted are removed
+    assert os.listdir(tmp_path) == []
+
+
+def test_wait_async(tmp_path):
+    writer = OutputWriter(1)
+    release = threading.Event()
+    path = str(tmp_path / "a")
+    writer.submit(path, write_text("a", release))
+
+    async def read():
+        release.set()
+        await writer.wait_async(path)
+        with open(path) as f:
+            return f.read()
+
+    assert asyncio.run(read()) == "a"
+
+
+def test_synchronous_writer(tmp_path):
+    writer = OutputWriter(0)
+    path = str(tmp_path / "a")
+    assert writer.submit(path, write_text("a")).result() == os.path.abspath(path)
+    with open(path) as f:
+        assert f.read() == "a"
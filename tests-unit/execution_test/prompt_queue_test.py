@@ -0,0 +1,79 @@
+import pytest
+
+pytest.importorskip("torch")
+
+from execution import PromptQueue  # noqa: E402
+
+
+class MockServer:
+    def __init__(self):
+        self.queue_updates = 0
+        self.finished = []
+
+    def queue_updated(self):
+        self.queue_updates += 1
+
+    def history_updated(self, prompt_id):
+        self.finished.append(prompt_id)
+
+
+def item(number, prompt_id, batch_id=None):
+    extra_data = {} if batch_id is None else {"batch_id": batch_id}
+    return (number, prompt_id, {}, extra_data, [])
+
+
+def run_all(queue):
+    while queue.get_tasks_remaining() > 0:
+        _, item_id = queue.get()
+        queue.task_done(item_id, {}, None)
+
+
+def test_put_many_updates_status_once():
+    server = MockServer()
+    queue = PromptQueue(server)
+    queue.put_many([item(1, "b", "x"), item(0, "a", "x"), item(2, "c")])
+    assert server.queue_updates == 1
+    assert sorted(queue.get_prompt_ids(batch_id="x")) == ["a", "b"]
+    run_all(queue)
+    assert server.finished == ["a", "b", "c"]
+
+
+def test_history_filters():
+    queue = PromptQueue(MockServer())
+    queue.put_many([item(0, "a", "x"), item(1, "b", "y"), item(2, "c", "x")])
+    run_all(queue)
+    assert list(queue.get_history(batch_id="x")) == ["a", "c"]
+    assert list(queue.get_history(prompt_ids=["c", "b", "missing"])) == ["c", "b"]
+    assert list(queue.get_history(prompt_ids=["a", "b", "c"], batch_id="y")) == ["b"]
+    assert list(queue.get_history(batch_id="x", max_items=1)) == ["c"]
+
+
+def test_history_pagination():
+    queue = PromptQueue(MockServer())
+    queue.put_many([item(i, str(i)) for i in range(10)])
+    run_all(queue)
+    assert list(queue.get_history(max_items=3)) == ["7", "8", "9"]
+    assert list(queue.get_history(max_items=3, offset=2)) == ["2", "3", "4"]
+    assert list(queue.get_history(max_items=3, offset=8)) == ["8", "9"]
+    assert list(queue.get_history(offset=6)) == ["6", "7", "8", "9"]
+    assert len(queue.get_history(max_items=20)) == 10
+
+
+def test_queue_snapshot_is_shared_until_changed():
+    queue = PromptQueue(MockServer())
+    queue.put(item(0, "a"))
+    snapshot = queue.get_queue_snapshot()
+    assert queue.get_queue_snapshot() is snapshot
+    queued = snapshot[2][0]
+    queue_item, item_id = queue.get()
+    version, running, pending = queue.get_queue_snapshot()
+    assert version > snapshot[0]
+    # the running items are shared by reference, not copied
+    assert running[0] is queued and pending == []
+
+    # the executor gets its own copy of the prompt and extra_data, the nodes can modify it
+    assert queue_item[2] is not queued[2] and queue_item[3] is not queued[3]
+    queue_item[3]["workflow"] = "modified"
+    queue.task_done(item_id, {}, None)
+    assert queue.get_history(prompt_id="a")["a"]["prompt"] is queued
+    assert "workflow" not in queued[3]
@@ -0,0 +1,107 @@
+import os
+
+import pytest
+
+pytest.importorskip("torch")
+
+import folder_paths  # noqa: E402
+import nodes  # noqa: E402
+from execution import ValidationCache  # noqa: E402
+
+
+# classes whose INPUT_TYPES were called
+input_types_calls = []
+
+
+class LoaderNode:
+    RETURN_TYPES = ("MODEL",)
+
+    @classmethod
+    def INPUT_TYPES(cls):
+        input_types_calls.append(cls)
+        # like a loader listing a models folder through folder_paths
+        folder_paths.record_dependency("directory", os.path.dirname(__file__))
+        return {"required": {"name": (["a.safetensors", "b.safetensors"],),
+                             "seed": ("INT", {"default": 0, "min": 0, "max": 10})}}
+
+
+class OutputNode:
+    RETURN_TYPES = ()
+    OUTPUT_NODE = True
+
+    @classmethod
+    def INPUT_TYPES(cls):
+        return {"required": {"model": ("MODEL",), "text": ("STRING", {})}}
+
+
+@pytest.fixture
+def cache(monkeypatch):
+    monkeypatch.setitem(nodes.NODE_CLASS_MAPPINGS, "TestLoader", LoaderNode)
+    monkeypatch.setitem(nodes.NODE_CLASS_MAPPINGS, "TestOutput", OutputNode)
+    input_types_calls.clear()
+    return ValidationCache()
+
+
+def make_prompt(name="a.safetensors", seed=1, text="cat"):
+    return {"1": {"class_type": "TestLoader", "inputs": {"name": name, "seed": seed}},
+            "2": {"class_type": "TestOutput", "inputs": {"model": ["1", 0], "text": text}}}
+
+
+def test_same_shape_is_not_validated_again(cache):
+    assert cache.validate(make_prompt())[0]
+    assert len(input_types_calls) == 1
+
+    prompt = make_prompt(seed="3", text="dog")
+    assert cache.validate(prompt) == (True, None, ["2"], {})
+    assert len(input_types_calls) == 1
+    # the widget values are still converted
+    assert prompt["1"]["inputs"]["seed"] == 3
+
+
+def test_values_are_checked_on_a_hit(cache):
+    assert cache.validate(make_prompt())[0]
+    result = cache.validate(make_prompt(seed=11))
+    assert not result[0]
+    assert result[3]["1"]["errors"][0]["type"] == "value_bigger_than_max"
+
+
+def test_combo_values_are_part_of_the_key(cache):
+    assert cache.validate(make_prompt())[0]
+    assert cache.validate(make_prompt(name="b.safetensors"))[0]
+    assert len(input_types_calls) == 2
+    assert not cache.validate(make_prompt(name="c.safetensors"))[0]
+
+
+def test_replaced_class_invalidates(cache, monkeypatch):
+    assert cache.validate(make_prompt())[0]
+
+    class OtherLoader(LoaderNode):
+        pass
+
+    monkeypatch.setitem(nodes.NODE_CLASS_MAPPINGS, "TestLoader", OtherLoader)
+    assert cache.validate(make_prompt())[0]
+    assert input_types_calls == [LoaderNode, OtherLoader]
+
+
+class ListingLoaderNode:
+    RETURN_TYPES = ("MODEL",)
+    # lists its files without going through folder_paths
+    directory = None
+
+    @classmethod
+    def INPUT_TYPES(cls):
+        input_types_calls.append(cls)
+        return {"required": {"name": (sorted(os.listdir(cls.directory)),)}}
+
+
+def test_untracked_combo_choices_are_checked_on_a_hit(cache, monkeypatch, tmp_path):
+    monkeypatch.setitem(nodes.NODE_CLASS_MAPPINGS, "TestLoader", ListingLoaderNode)
+    monkeypatch.setattr(ListingLoaderNode, "directory", str(tmp_path))
+    (tmp_path / "a.safetensors").write_bytes(b"")
+    assert cache.validate(make_prompt())[0]
+    assert cache.validate(make_prompt())[0]
+
+    os.remove(tmp_path / "a.safetensors")
+    result = cache.validate(make_prompt())
+    assert not result[0]
+    assert result[3]["1"]["errors"][0]["type"] == "value_not_in_list"
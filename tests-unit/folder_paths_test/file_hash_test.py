@@ -0,0 +1,63 @@
+import builtins
+import hashlib
+import os
+import pytest
+from unittest.mock import patch
+
+import folder_paths
+from folder_paths import get_file_hash
+
+
+@pytest.fixture
+def image_file(tmp_path):
+    folder_paths.file_hash_cache.clear()
+    path = tmp_path / "image.png"
+    path.write_bytes(b"first")
+    yield str(path)
+    folder_paths.file_hash_cache.clear()
+
+
+def test_hash_matches_hashlib(image_file):
+    assert get_file_hash(image_file, "sha256") == hashlib.sha256(b"first").hexdigest()
+    assert get_file_hash(image_file, "md5") == hashlib.md5(b"first").hexdigest()
+
+
+def test_unchanged_file_is_not_read_again(image_file):
+    digest = get_file_hash(image_file, "sha256")
+    with patch.object(builtins, "open", side_effect=AssertionError("file was read")):
+        assert get_file_hash(image_file, "sha256") == digest
+
+
+def test_changed_file_is_hashed_again(image_file):
+    get_file_hash(image_file, "sha256")
+    mtime = os.stat(image_file).st_mtime_ns
+    with open(image_file, "wb") as f:
+        f.write(b"other")
+    # same size, make sure the mtime differs on filesystems with a coarse resolution
+    os.utime(image_file, ns=(mtime + 1_000_000_000, mtime + 1_000_000_000))
+    assert get_file_hash(image_file, "sha256") == hashlib.sha256(b"other").hexdigest()
+
+
+def test_xxh3_falls_back_without_xxhash(image_file):
+    with patch.dict("sys.modules", {"xxhash": None}):
+        assert get_file_hash(image_file, "xxh3") == hashlib.blake2b(b"first").hexdigest()
+
+
+def test_directory_hash_index(tmp_path):
+    (tmp_path / "a.png").write_bytes(b"a")
+    (tmp_path / "b.png").write_bytes(b"b")
+    index = folder_paths.DirectoryHashIndex(str(tmp_path))
+    digest = hashlib.sha256(b"b").hexdigest()
+    with patch.object(folder_paths.args, "default_hashing_function", "sha256"):
+        assert index.find(digest) == "b.png"
+        assert index.get_hash("a.png") == hashlib.sha256(b"a").hexdigest()
+        assert index.find(hashlib.sha256(b"c").hexdigest()) is None
+
+        # a file written by an upload is indexed without being read
+        (tmp_path / "c.png").write_bytes(b"c")
+        index.add("c.png", "uploaded")
+        with patch.object(builtins, "open", side_effect=AssertionError("file was read")):
+            assert index.find("uploaded") == "c.png"
+
+        os.remove(tmp_path / "b.png")
+        assert index.find(digest) is None
@@ -0,0 +1,90 @@
+import os
+import pytest
+from unittest.mock import patch
+
+from folder_paths import FolderIndex
+
+
+def touch(*parts):
+    path = os.path.join(*parts)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    open(path, "w").close()
+
+
+def bump_mtime(path):
+    mtime = os.stat(path).st_mtime_ns + 1_000_000_000
+    os.utime(path, ns=(mtime, mtime))
+
+
+@pytest.fixture
+def model_dir(tmp_path):
+    touch(str(tmp_path), "a.safetensors")
+    touch(str(tmp_path), "sdxl", "b.safetensors")
+    touch(str(tmp_path), "sd15", "nested", "c.ckpt")
+    touch(str(tmp_path), ".git", "HEAD")
+    return str(tmp_path)
+
+
+def test_lists_all_files(model_dir):
+    index = FolderIndex(model_dir)
+    assert sorted(index.get_files()) == sorted(["a.safetensors", os.path.join("sdxl", "b.safetensors"), os.path.join("sd15", "nested", "c.ckpt")])
+
+
+def test_only_changed_directories_are_listed_again(model_dir):
+    index = FolderIndex(model_dir)
+    version = index.refresh()
+    assert index.refresh() == version
+
+    touch(model_dir, "sd15", "nested", "d.ckpt")
+    bump_mtime(os.path.join(model_dir, "sd15", "nested"))
+    listed = []
+    list_directory = index.list_directory
+    with patch.object(index, "list_directory", side_effect=lambda path: listed.append(path) or list_directory(path)):
+        assert index.refresh() != version
+    assert listed == [os.path.join(model_dir, "sd15", "nested")]
+    assert os.path.join("sd15", "nested", "d.ckpt") in index.get_files()
+
+
+def test_removed_directory(model_dir):
+    index = FolderIndex(model_dir)
+    index.refresh()
+    os.remove(os.path.join(model_dir, "sdxl", "b.safetensors"))
+    os.rmdir(os.path.join(model_dir, "sdxl"))
+    bump_mtime(model_dir)
+    assert os.path.join("sdxl", "b.safetensors") not in index.get_files()
+
+
+def test_poll_interval(model_dir):
+    index = FolderIndex(model_dir)
+    version = index.refresh()
+    touch(model_dir, "e.safetensors")
+    bump_mtime(model_dir)
+    with patch("folder_paths.args.model_folder_poll_interval", 3600):
+        assert index.refresh() == version
+        index.dirty = True
+        assert index.refresh() != version
+
+
+@pytest.mark.skipif(not hasattr(os, "symlink"), reason="symlinks not supported")
+def test_symlink_loop(model_dir):
+    try:
+        os.symlink(model_dir, os.path.join(model_dir, "sdxl", "loop"))
+    except OSError:
+        pytest.skip("symlinks not supported")
+    index = FolderIndex(model_dir)
+    assert "a.safetensors" in index.get_files()
+    assert index.has_links
+
+
+@pytest.mark.skipif(not hasattr(os, "symlink"), reason="symlinks not supported")
+def test_several_links_to_the_same_directory(model_dir, tmp_path_factory):
+    shared = str(tmp_path_factory.mktemp("shared"))
+    touch(shared, "d.safetensors")
+    try:
+        os.symlink(shared, os.path.join(model_dir, "first"))
+        os.symlink(shared, os.path.join(model_dir, "second"))
+    except OSError:
+        pytest.skip("symlinks not supported")
+    files = FolderIndex(model_dir).get_files()
+    assert os.path.join("first", "d.safetensors") in files
+    assert os.path.join("second", "d.safetensors") in files
@@ -0,0 +1,160 @@
+"""
+Measures the per step overhead of the samplers independently of the model cost.
+
+Every registered sampler is driven through comfy.samplers.KSampler (and so KSAMPLER, CFGGuider,
+process_conds and the callback glue) on the CPU with a tiny deterministic stand-in model. The time
+spent inside the model is subtracted from the wall time so what is left is the cost of the sampler
+code itself.
+
+Usage:
+    python -m tests.benchmark.samplers --steps 20 --samplers euler dpmpp_2m_sde uni_pc
+"""
+import argparse
+import logging
+import time
+import tracemalloc
+
+import torch
+
+import comfy.latent_formats
+import comfy.model_base
+import comfy.model_patcher
+import comfy.samplers
+import comfy.supported_models_base
+
+
+class TinyDiffusionModel(torch.nn.Module):
+    """Deterministic stand-in for a diffusion model: a 1x1 conv mixed with the timestep and the context."""
+    def __init__(self, in_channels=4, context_dim=8, device=None, operations=None, **kwargs):
+        super().__init__()
+        self.dtype = torch.float32
+        self.proj = operations.Conv2d(in_channels, in_channels, 1, device=device)
+        self.context_proj = operations.Linear(context_dim, in_channels, device=device)
+        generator = torch.Generator().manual_seed(0)
+        with torch.no_grad():
+            for p in self.parameters():
+                p.copy_(torch.randn(p.shape, generator=generator) * 0.05)
+        self.calls = 0
+        self.model_time = 0.0
+
+    def forward(self, x, timesteps, context=None, control=None, transformer_options={}, **kwargs):
+        start = time.perf_counter()
+        out = self.proj(x) * (timesteps.reshape(-1, 1, 1, 1) / 1000.0)
+        if context is not None:
+            out = out + self.context_proj(context.mean(dim=1)).reshape(x.shape[0], -1, 1, 1)
+        self.calls += 1
+        self.model_time += time.perf_counter() - start
+        return out
+
+
+class TinyModelConfig(comfy.supported_models_base.BASE):
+    unet_config = {"in_channels": 4}
+    unet_extra_config = {}
+    latent_format = comfy.latent_formats.SD15
+    memory_usage_factor = 0.0
+
+
+def tiny_model_patcher(device=torch.device("cpu")):
+    model_config = TinyModelConfig({"in_channels": 4, "context_dim": 8})
+    model = comfy.model_base.BaseModel(model_config, device=device, unet_model=TinyDiffusionModel)
+    return comfy.model_patcher.ModelPatcher(model, load_device=device, offload_device=device)
+
+
+def count_allocations(fn):
+    """Runs fn under the torch profiler and tracemalloc, returns (tensor allocations, python peak bytes)."""
+    tracemalloc.start()
+    with torch.profiler.profile(activities=[torch.profiler.ProfilerActivity.CPU], profile_memory=True) as prof:
+        fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    allocations = 0
+    for e in prof.events():
+        if e.name == "[memory]" and e.cpu_memory_usage > 0:
+            allocations += 1
+    return allocations, peak
+
+
+def benchmark_sampler(model_patcher, sampler_name, steps=20, scheduler="karras", cfg=3.0, batch_size=1, size=(16, 16), allocations=False):
+    device = model_patcher.load_device
+    diffusion_model = model_patcher.model.diffusion_model
+    positive = [[torch.ones([1, 4, 8]), {}]]
+    negative = [[torch.zeros([1, 4, 8]), {}]]
+    latent_image = torch.zeros([batch_size, 4] + list(size))
+    noise = torch.randn(latent_image.shape, generator=torch.Generator().manual_seed(0))
+    callback_steps = []
+
+    def callback(step, x0, x, total_steps):
+        callback_steps.append(step)
+
+    def run():
+        sampler = comfy.samplers.KSampler(model_patcher, steps=steps, device=device, sampler=sampler_name, scheduler=scheduler, denoise=1.0, model_options=model_patcher.model_options)
+        return sampler.sample(noise, positive, negative, cfg=cfg, latent_image=latent_image, callback=callback, disable_pbar=True, seed=0)
+
+    run() # warmup
+    diffusion_model.calls = 0
+    diffusion_model.model_time = 0.0
+    callback_steps.clear()
+
+    start = time.perf_counter()
+    samples = run()
+    wall_time = time.perf_counter() - start
+
+    nfe = diffusion_model.calls
+    overhead = wall_time - diffusion_model.model_time
+    out = {"sampler": sampler_name,
+           "steps": steps,
+           "callback_steps": len(callback_steps),
+           "nfe": nfe,
+           "wall_time": wall_time,
+           "model_time": diffusion_model.model_time,
+           "overhead_per_step": overhead / max(1, steps),
+           "overhead_per_nfe": overhead / max(1, nfe),
+           "finite": bool(torch.isfinite(samples).all()),
+           }
+
+    if allocations:
+        out["tensor_allocations"], out["python_peak_bytes"] = count_allocations(run)
+    return out
+
+
+def run_benchmarks(sampler_names=None, **kwargs):
+    if sampler_names is None:
+        sampler_names = comfy.samplers.KSampler.SAMPLERS
+    model_patcher = tiny_model_patcher()
+    results = []
+    for name in sampler_names:
+        results.append(benchmark_sampler(model_patcher, name, **kwargs))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the sampler overhead with a tiny model on the CPU.")
+    parser.add_argument("--samplers", nargs="*", default=None, help="Samplers to benchmark (default: all registered samplers).")
+    parser.add_argument("--steps", type=int, default=20)
+    parser.add_argument("--scheduler", type=str, default="karras", choices=comfy.samplers.KSampler.SCHEDULERS)
+    parser.add_argument("--cfg", type=float, default=3.0)
+    parser.add_argument("--batch-size", type=int, default=1)
+    parser.add_argument("--allocations", action="store_true", help="Also count tensor allocations with the torch profiler (slower).")
+    parser.add_argument("--max-overhead-ms", type=float, default=None, help="Exit with an error if the overhead per step of any sampler is above this.")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    torch.set_num_threads(1)
+    results = run_benchmarks(args.samplers, steps=args.steps, scheduler=args.scheduler, cfg=args.cfg, batch_size=args.batch_size, allocations=args.allocations)
+
+    logging.info("{:<32} {:>5} {:>10} {:>16} {:>15} {:>12}".format("sampler", "nfe", "wall ms", "overhead ms/step", "overhead ms/nfe", "allocations"))
+    failed = []
+    for r in results:
+        logging.info("{:<32} {:>5} {:>10.2f} {:>16.3f} {:>15.3f} {:>12}".format(r["sampler"], r["nfe"], r["wall_time"] * 1000, r["overhead_per_step"] * 1000, r["overhead_per_nfe"] * 1000, r.get("tensor_allocations", "-")))
+        if not r["finite"]:
+            failed.append("{} produced non finite samples".format(r["sampler"]))
+        if args.max_overhead_ms is not None and r["overhead_per_step"] * 1000 > args.max_overhead_ms:
+            failed.append("{} overhead {:.3f} ms/step is above {} ms".format(r["sampler"], r["overhead_per_step"] * 1000, args.max_overhead_ms))
+
+    for f in failed:
+        logging.error(f)
+    return 1 if len(failed) > 0 else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,83 @@
+"""
+Measures the cold start time of the server: from launching main.py to the first accepted POST /prompt.
+
+Every configuration is started once to warm the OS file cache (and, with --lazy-node-loading, to write the node
+registry cache by requesting /object_info) before the timed runs. The prompt only uses core nodes so no model is needed.
+
+Usage:
+    python -m tests.benchmark.startup --runs 3 --configs "" "--lazy-node-loading"
+"""
+import argparse
+import json
+import logging
+import os
+import shlex
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.request
+
+PROMPT = {
+    "1": {"class_type": "EmptyImage", "inputs": {"width": 64, "height": 64, "batch_size": 1, "color": 0}},
+    "2": {"class_type": "PreviewImage", "inputs": {"images": ["1", 0]}},
+}
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def post_prompt(port):
+    data = json.dumps({"prompt": PROMPT}).encode("utf-8")
+    request = urllib.request.Request("http://127.0.0.1:{}/prompt".format(port), data=data, headers={"Content-Type": "application/json"})
+    with urllib.request.urlopen(request, timeout=5) as response:
+        return response.status == 200
+
+
+def start(extra_args, user_dir, fetch_object_info=False, timeout=300):
+    port = free_port()
+    main = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.realpath(__file__)))), "main.py")
+    command = [sys.executable, main, "--cpu", "--port", str(port), "--user-directory", user_dir, "--disable-auto-launch"] + extra_args
+    start_time = time.perf_counter()
+    process = subprocess.Popen(command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        while time.perf_counter() - start_time < timeout:
+            if process.poll() is not None:
+                raise RuntimeError("server exited with code {}: {}".format(process.returncode, shlex.join(command)))
+            try:
+                if post_prompt(port):
+                    elapsed = time.perf_counter() - start_time
+                    if fetch_object_info:
+                        urllib.request.urlopen("http://127.0.0.1:{}/object_info".format(port), timeout=60).read()
+                    return elapsed
+            except (urllib.error.URLError, ConnectionError, TimeoutError):
+                pass
+            time.sleep(0.05)
+        raise TimeoutError("server didn't accept a prompt after {} seconds".format(timeout))
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the time from starting the server to the first accepted prompt.")
+    parser.add_argument("--configs", nargs="+", default=["", "--lazy-node-loading"], help="Extra command line arguments of each configuration.")
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    for config in args.configs:
+        extra_args = shlex.split(config)
+        with tempfile.TemporaryDirectory() as user_dir:
+            start(extra_args, user_dir, fetch_object_info=True)
+            times = [start(extra_args, user_dir) for _ in range(args.runs)]
+        logging.info("{:30} best {:6.2f}s  mean {:6.2f}s".format(config or "(default)", min(times), sum(times) / len(times)))
+
+
+if __name__ == "__main__":
+    main()
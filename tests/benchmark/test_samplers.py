@@ -0,0 +1,18 @@
+import pytest
+
+import comfy.samplers
+from tests.benchmark.samplers import benchmark_sampler, tiny_model_patcher
+
+
+@pytest.fixture(scope="module")
+def model_patcher():
+    return tiny_model_patcher()
+
+
+@pytest.mark.parametrize("sampler_name", comfy.samplers.KSampler.SAMPLERS)
+def test_sampler_runs_with_tiny_model(model_patcher, sampler_name):
+    result = benchmark_sampler(model_patcher, sampler_name, steps=4, size=(8, 8))
+    assert result["finite"]
+    assert result["nfe"] > 0
+    assert result["callback_steps"] > 0
+    assert result["overhead_per_step"] >= 0
@@ -0,0 +1,71 @@
+"""
+Measures the speedup of batching equally shaped tiles in comfy.utils.tiled_scale_multidim on the CPU.
+
+A cheap randomly initialized conv + nearest upscale stands in for the VAE decoder / upscale model so the
+time is dominated by the per tile overhead (slicing, feather masks, blending and the function calls).
+
+Usage:
+    python -m tests.benchmark.tiled_scale --size 1024 --tile 64 --batch-size 1 4 16
+"""
+import argparse
+import logging
+import time
+
+import torch
+
+import comfy.utils
+
+
+class CheapUpscaler(torch.nn.Module):
+    def __init__(self, channels=4, out_channels=3, scale=8):
+        super().__init__()
+        self.conv = torch.nn.Conv2d(channels, out_channels, 3, padding=1)
+        self.scale = scale
+
+    def forward(self, x):
+        return torch.nn.functional.interpolate(self.conv(x), scale_factor=self.scale, mode="nearest")
+
+
+def time_tiled_scale(function, samples, tile, overlap, scale, tile_batch_size, runs):
+    calls = [0]
+
+    def counted(x):
+        calls[0] += 1
+        return function(x)
+
+    kwargs = {"tile_x": tile, "tile_y": tile, "overlap": overlap, "upscale_amount": scale, "out_channels": 3, "tile_batch_size": tile_batch_size}
+    out = comfy.utils.tiled_scale(samples, counted, **kwargs) # warmup
+    calls[0] = 0
+    start = time.perf_counter()
+    for _ in range(runs):
+        comfy.utils.tiled_scale(samples, counted, **kwargs)
+    return (time.perf_counter() - start) / runs, calls[0] // runs, out
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark batched tiled_scale on the CPU.")
+    parser.add_argument("--size", type=int, default=1024, help="Output image size, the latent is size / 8.")
+    parser.add_argument("--tile", type=int, default=32)
+    parser.add_argument("--overlap", type=int, default=8)
+    parser.add_argument("--batch-size", type=int, nargs="+", default=[1, 4, 16, 64])
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    torch.manual_seed(0)
+    model = CheapUpscaler().eval()
+    samples = torch.randn([1, 4, args.size // 8, args.size // 8])
+
+    with torch.no_grad():
+        base_time, base_calls, base_out = time_tiled_scale(model, samples, args.tile, args.overlap, model.scale, 1, args.runs)
+        logging.info("tile batch 1: {:.3f} s {} calls".format(base_time, base_calls))
+        for batch_size in args.batch_size:
+            if batch_size == 1:
+                continue
+            t, calls, out = time_tiled_scale(model, samples, args.tile, args.overlap, model.scale, batch_size, args.runs)
+            error = (out - base_out).abs().max().item()
+            logging.info("tile batch {}: {:.3f} s {} calls speedup {:.2f}x max difference {:.2e}".format(batch_size, t, calls, base_time / t, error))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""
+Measures the speedup of DiT token merging (TomePatchDiT) on the CPU.
+
+A randomly initialized, reduced width Flux model is run on a 1024x1024 latent and a reduced Wan model on a
+video latent, with and without token merging on the double/single stream blocks.
+
+Usage:
+    python -m tests.benchmark.token_merging --ratio 0.5
+"""
+import argparse
+import logging
+import time
+
+import torch
+
+import comfy.ops
+import comfy.ldm.flux.model
+import comfy.ldm.wan.model
+from comfy_extras.nodes_tomesd import DiTTokenMerging
+
+
+def init_weights(model):
+    generator = torch.Generator().manual_seed(0)
+    with torch.no_grad():
+        for p in model.parameters():
+            p.copy_(torch.randn(p.shape, generator=generator) * 0.02)
+    return model.eval()
+
+
+def tiny_flux(hidden_size=256, depth=2, depth_single_blocks=4):
+    return init_weights(comfy.ldm.flux.model.Flux(in_channels=16, out_channels=16, vec_in_dim=64, context_in_dim=64, hidden_size=hidden_size, mlp_ratio=4.0,
+                                                  num_heads=hidden_size // 64, depth=depth, depth_single_blocks=depth_single_blocks, axes_dim=[16, 24, 24],
+                                                  theta=10000, patch_size=2, qkv_bias=True, guidance_embed=False, operations=comfy.ops.disable_weight_init))
+
+
+def tiny_wan(dim=256, num_layers=4):
+    return init_weights(comfy.ldm.wan.model.WanModel(dim=dim, ffn_dim=dim * 4, num_heads=dim // 64, num_layers=num_layers, text_dim=64, in_dim=16, out_dim=16,
+                                                     operations=comfy.ops.disable_weight_init))
+
+
+def token_merging_patches(tome):
+    patches = {}
+    for i in range(tome.double_blocks):
+        patches[("double_block", i)] = lambda args, extra_options, i=i: tome.double_block(i, args, extra_options)
+    for i in range(tome.single_blocks):
+        patches[("single_block", i)] = lambda args, extra_options, i=i: tome.single_block(i, args, extra_options)
+    return {"patches_replace": {"dit": patches}}
+
+
+def time_forward(model, x, timestep, context, ratio, runs, **kwargs):
+    transformer_options = {}
+    if ratio > 0:
+        tome = DiTTokenMerging(model, ratio, ratio)
+        transformer_options = token_merging_patches(tome)
+
+    def forward():
+        if ratio > 0:
+            tome.prepare(x, timestep, transformer_options)
+        return model(x, timestep, context, transformer_options=transformer_options, **kwargs)
+
+    with torch.no_grad():
+        out = forward() # warmup
+        start = time.perf_counter()
+        for _ in range(runs):
+            forward()
+    return (time.perf_counter() - start) / runs, out
+
+
+def benchmark(name, model, x, context, ratios, runs, **kwargs):
+    timestep = torch.full([x.shape[0]], 0.5)
+    base_time, base_out = time_forward(model, x, timestep, context, 0.0, runs, **kwargs)
+    logging.info("{}: latent {} baseline {:.3f} s".format(name, list(x.shape), base_time))
+    for ratio in ratios:
+        t, out = time_forward(model, x, timestep, context, ratio, runs, **kwargs)
+        error = ((out - base_out).abs().mean() / base_out.abs().mean()).item()
+        logging.info("{}: ratio {:.2f} {:.3f} s speedup {:.2f}x relative error {:.4f}".format(name, ratio, t, base_time / t, error))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark DiT token merging on the CPU.")
+    parser.add_argument("--ratio", type=float, nargs="+", default=[0.25, 0.5])
+    parser.add_argument("--runs", type=int, default=2)
+    parser.add_argument("--image-size", type=int, default=1024)
+    parser.add_argument("--video-frames", type=int, default=17)
+    parser.add_argument("--video-size", type=int, nargs=2, default=[480, 832])
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    generator = torch.Generator().manual_seed(0)
+
+    x = torch.randn([1, 16, args.image_size // 8, args.image_size // 8], generator=generator)
+    context = torch.randn([1, 256, 64], generator=generator)
+    benchmark("flux", tiny_flux(), x, context, args.ratio, args.runs, y=torch.zeros([1, 64]))
+
+    frames = (args.video_frames - 1) // 4 + 1
+    x = torch.randn([1, 16, frames, args.video_size[0] // 8, args.video_size[1] // 8], generator=generator)
+    benchmark("wan", tiny_wan(), x, context, args.ratio, args.runs)
+
+
+if __name__ == "__main__":
+    main()